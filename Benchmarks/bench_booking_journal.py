@@ -0,0 +1,110 @@
+import os
+import sys
+import time
+import tempfile
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from FlightAssistantUsingTools.booking_journal import BookingJournal
+
+#Durable bookings per second from many concurrent sessions: group commit (one fsync
+#per batch) against one fsync per booking, then a check that every confirmation
+#can be read back and survives a reopen. --check also fails one batch halfway
+#through its write and corrupts a line in the middle of the file, and exits 1 unless
+#every confirmed booking is still there after a reopen.
+
+
+#The second batch gets half written and then fails, like on a full disk
+class FailingJournal(BookingJournal):
+    batches = 0
+
+    def _write(self, data, offset):
+        self.batches += 1
+        if self.batches != 2:
+            return super()._write(data, offset)
+        real_write, calls = os.write, []
+
+        def half_write(fd, view):
+            calls.append(fd)
+            if len(calls) > 1:
+                raise OSError(28, "No space left on device")
+            return real_write(fd, view[:len(view) // 2])
+
+        os.write = half_write
+        try:
+            super()._write(data, offset)
+        finally:
+            os.write = real_write
+
+
+def run(path, bookings, threads, max_batch, max_wait):
+    journal = BookingJournal(path, max_batch=max_batch, max_wait=max_wait)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        ids = list(executor.map(lambda i: journal.book(city="tokyo", date="2025-10-11 11:15", seat=i), range(bookings)))
+    elapsed = time.perf_counter() - start
+    stats = journal.stats()
+    journal.close()
+    reopened = BookingJournal(path)
+    missing = sum(1 for booking_id in ids if reopened.lookup(booking_id) is None)
+    reopened.close()
+    return elapsed, stats, missing
+
+
+def check_recovery(path):
+    problems = []
+    journal = FailingJournal(path, max_batch=1)
+    first = journal.book(city="paris", date="2025-10-10 02:00")
+    try:
+        journal.book(city="paris", date="2025-10-12 15:30")
+        problems.append("failed write was confirmed")
+    except OSError:
+        pass
+    last = journal.book(city="paris", date="2025-10-15 20:00")
+    journal.close()
+    reopened = BookingJournal(path)
+    if reopened.lookup(first) is None or reopened.lookup(last) is None:
+        problems.append("a confirmed booking was lost after a failed write")
+    if len(reopened) != 2:
+        problems.append(f"{len(reopened)} bookings after a failed write, expected 2")
+    if reopened.skipped:
+        problems.append(f"{reopened.skipped} unreadable lines after a failed write")
+    reopened.close()
+
+    #A damaged line in the middle is skipped; the bookings after it are kept
+    with open(path, "r+b") as f:
+        lines = f.readlines()
+        f.seek(0)
+        f.write(lines[0][:-10] + b"#garbled\n" + b"".join(lines[1:]))
+        f.truncate()
+    reopened = BookingJournal(path)
+    if reopened.lookup(last) is None or reopened.skipped != 1:
+        problems.append("a damaged line in the middle dropped the bookings after it")
+    reopened.close()
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the booking journal")
+    parser.add_argument("--bookings", type=int, default=5000)
+    parser.add_argument("--threads", type=int, default=64)
+    parser.add_argument("--dir", default=None, help="directory for the journal files (default: a temp dir)")
+    parser.add_argument("--check", action="store_true", help="exit 1 unless bookings survive a failed write and a damaged line")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as folder:
+        modes = [("fsync per booking", 1, 0.0), ("group commit", 512, 0.0), ("group commit 2ms", 512, 0.002)]
+        print(f"{'mode':<20}{'bookings/s':>12}{'per fsync':>11}{'missing':>9}")
+        for i, (name, max_batch, max_wait) in enumerate(modes):
+            elapsed, stats, missing = run(os.path.join(folder, f"journal{i}.jsonl"), args.bookings, args.threads, max_batch, max_wait)
+            print(f"{name:<20}{args.bookings / elapsed:>12.0f}{stats['records_per_commit']:>11.1f}{missing:>9}")
+        if args.check:
+            problems = check_recovery(os.path.join(folder, "recovery.jsonl"))
+            print("recovery: " + ("; ".join(problems) if problems else "ok"))
+            if problems:
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import urllib.request
+
+from fake_servers import spawn
+
+#Whole-site crawl over many hosts at once. Every stand-in server is its own host
+#with the generated /site/ tree, a robots.txt disallowing /private/ and a sitemap
+#with one page nothing links to. After the crawl each server reports what it saw,
+#so politeness is checked from the host's side: requests in flight never above the
+#per-host limit, starts never closer than the per-host delay (less --jitter of
+#arrival noise), nothing disallowed fetched. --check exits 1 when any host was
+#treated badly or a sitemap page was missed.
+#
+#  python Benchmarks/bench_crawl.py --hosts 8 --pages 30 --check
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+
+def server_stats(base_url):
+    with urllib.request.urlopen(f"{base_url}/_stats") as response:
+        return json.loads(response.read())["crawl"]
+
+
+async def crawl(urls, args, max_sites):
+    from Common.crawler import Crawler
+    from Common.fetcher import aclose
+    crawler = Crawler(max_pages=args.pages, max_depth=args.depth, host_concurrency=args.host_concurrency, host_delay=args.host_delay)
+    sites = {}
+    try:
+        async for url, pages in crawler.crawl_sites(urls, max_sites=max_sites):
+            sites[url] = pages
+    finally:
+        await aclose()
+    return sites, crawler.stats
+
+
+def run(args, max_sites):
+    servers = [spawn(0.0, 0.0, 10, 10_000, args.page_delay) for _ in range(args.hosts)]
+    try:
+        urls = [f"{base_url}/site/" for _, base_url in servers]
+        start = time.perf_counter()
+        sites, stats = asyncio.run(crawl(urls, args, max_sites))
+        wall = time.perf_counter() - start
+        hosts = [dict(server_stats(base_url), host=base_url) for _, base_url in servers]
+    finally:
+        for process, _ in servers:
+            process.kill()
+    pages = sum(len(p) for p in sites.values() if isinstance(p, list))
+    problems = []
+    for url, found in sites.items():
+        if not isinstance(found, list):
+            problems.append(f"{url}: {type(found).__name__}: {found}")
+        elif not any(page["url"].rstrip("/").endswith("/our-story") for page in found):
+            problems.append(f"{url}: sitemap-only page not found")
+    for host in hosts:
+        if host["max_in_flight"] > args.host_concurrency:
+            problems.append(f"{host['host']}: {host['max_in_flight']} requests in flight")
+        #Requests are spaced exactly when they leave the crawler; on arrival a GIL or
+        #connection setup hiccup can shift one of them by a few milliseconds
+        if host["min_gap"] is not None and host["min_gap"] < args.host_delay - args.jitter:
+            problems.append(f"{host['host']}: requests {host['min_gap'] * 1000:.1f} ms apart")
+        if host["disallowed"]:
+            problems.append(f"{host['host']}: {host['disallowed']} disallowed pages fetched")
+    return {
+        "sites_in_parallel": max_sites, "hosts": args.hosts, "pages": pages, "wall_s": wall,
+        "pages_per_s": pages / wall if wall else None, "crawler": stats,
+        "max_in_flight_per_host": max(h["max_in_flight"] for h in hosts),
+        "min_gap_ms": min((h["min_gap"] for h in hosts if h["min_gap"] is not None), default=0) * 1000,
+        "problems": problems,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Polite whole-site crawl over many local stand-in hosts")
+    parser.add_argument("--hosts", type=int, default=8)
+    parser.add_argument("--pages", type=int, default=20, help="pages per site")
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--host-concurrency", type=int, default=2)
+    parser.add_argument("--host-delay", type=float, default=0.1)
+    parser.add_argument("--jitter", type=float, default=0.03, help="seconds a gap may fall short of --host-delay on arrival")
+    parser.add_argument("--page-delay", type=float, default=0.02, help="server latency of every page")
+    parser.add_argument("--check", action="store_true", help="exit 1 on a politeness violation or a missed sitemap page")
+    parser.add_argument("--output", default=None, help="write the results JSON here (default: stdout)")
+    args = parser.parse_args()
+
+    sys.path.append(ROOT)
+    results = []
+    #One site at a time against all of them at once: the per-host limits are the same
+    for max_sites in (1, args.hosts):
+        result = run(args, max_sites)
+        results.append(result)
+        print(f"{max_sites:>3} sites at once{result['pages']:>6} pages{result['wall_s']:>8.2f} s{result['pages_per_s']:>9.1f} pages/s"
+              f"  max in flight/host {result['max_in_flight_per_host']}, min gap {result['min_gap_ms']:.1f} ms"
+              + (f"  {len(result['problems'])} problems" if result["problems"] else ""), file=sys.stderr)
+        for problem in result["problems"]:
+            print(f"  {problem}", file=sys.stderr)
+
+    text = json.dumps({"python": sys.version.split()[0], "results": results}, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    if args.check and any(r["problems"] for r in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import sys
+import json
+import time
+import asyncio
+import tempfile
+import argparse
+
+from fake_servers import spawn
+from run_benchmarks import configure_env
+
+#Many independent debates on one event loop. Every debate has three speakers on the
+#three backends (OpenAI, Anthropic, Ollama stand-ins) and streams every turn; they
+#run one at a time and then --concurrency at a time. Each turn waits for the first
+#token, so the sequential run is bound by latency and the concurrent one should be
+#close to a single debate's time. --check exits 1 when a debate failed or a turn
+#came back empty.
+#
+#  python Benchmarks/bench_debates.py --debates 200 --rounds 2 --concurrency 200 --check
+
+
+async def run_all(n, rounds, concurrency):
+    from ContextWindow.debate_engine import Debate, Participant
+    semaphore = asyncio.Semaphore(concurrency)
+    first_tokens = []
+
+    #Same as run_debates, plus the time to first token of every turn seen by the caller
+    async def one(i):
+        debate = Debate([Participant("gpt", "Disagree.", "openai"), Participant("claude", "Agree.", "anthropic"),
+                         Participant("llama", "Summarize.", "ollama")], opening=[("gpt", f"Topic {i}")])
+        async with semaphore:
+            started, waiting = time.perf_counter(), True
+            async for speaker, delta in debate.stream(rounds):
+                if delta is None:
+                    started, waiting = time.perf_counter(), True
+                elif waiting and delta:
+                    first_tokens.append(time.perf_counter() - started)
+                    waiting = False
+        return debate.transcript
+
+    start = time.perf_counter()
+    transcripts = await asyncio.gather(*(one(i) for i in range(n)), return_exceptions=True)
+    return transcripts, time.perf_counter() - start, sorted(first_tokens)
+
+
+def run(args, concurrency):
+    transcripts, wall, first_tokens = asyncio.run(run_all(args.debates, args.rounds, concurrency))
+    failed = [t for t in transcripts if isinstance(t, Exception)]
+    empty = sum(1 for t in transcripts if not isinstance(t, Exception) for _, text in t.turns if not text)
+    pick = lambda q: first_tokens[min(len(first_tokens) - 1, int(q * len(first_tokens)))] * 1000 if first_tokens else None
+    return {
+        "concurrency": concurrency, "debates": args.debates, "rounds": args.rounds, "wall_s": wall,
+        "turns_per_s": (args.debates - len(failed)) * args.rounds * 3 / wall if wall else None,
+        "failed": len(failed), "empty_turns": empty, "first_token_p50_ms": pick(0.5), "first_token_p95_ms": pick(0.95),
+        "errors": sorted({f"{type(e).__name__}: {e}" for e in failed})[:5],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Many concurrent three-way streamed debates against the stand-in backends")
+    parser.add_argument("--debates", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=100, help="debates in flight in the concurrent run")
+    parser.add_argument("--first-token-delay", type=float, default=0.05)
+    parser.add_argument("--token-delay", type=float, default=0.002)
+    parser.add_argument("--sequential", type=int, default=10, help="debates in the one-at-a-time run")
+    parser.add_argument("--check", action="store_true", help="exit 1 when a debate failed or a turn was empty")
+    parser.add_argument("--output", default=None, help="write the results JSON here (default: stdout)")
+    args = parser.parse_args()
+
+    process, base_url = spawn(args.first_token_delay, args.token_delay, 30, 10_000)
+    results = []
+    try:
+        configure_env(base_url, tempfile.mkdtemp())
+        #The sequential run only needs a few debates to show the per-debate time
+        for debates, concurrency in ((args.sequential, 1), (args.debates, args.concurrency)):
+            result = run(argparse.Namespace(debates=debates, rounds=args.rounds), concurrency)
+            results.append(result)
+            print(f"{concurrency:>4} at once{debates:>6} debates{result['wall_s']:>8.2f} s{result['turns_per_s']:>9.1f} turns/s"
+                  f"  first token p50 {result['first_token_p50_ms']:.0f} ms p95 {result['first_token_p95_ms']:.0f} ms"
+                  + (f"  {result['failed']} failed" if result["failed"] else "")
+                  + (f"  {result['empty_turns']} empty turns" if result["empty_turns"] else ""), file=sys.stderr)
+            for error in result["errors"]:
+                print(f"  {error}", file=sys.stderr)
+    finally:
+        process.kill()
+
+    text = json.dumps({"python": sys.version.split()[0], "settings": vars(args), "results": results}, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    if args.check and any(r["failed"] or r["empty_turns"] for r in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
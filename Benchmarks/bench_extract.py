@@ -0,0 +1,52 @@
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Common.extract import ENGINES
+from fixtures import SIZES, fixture_pages
+
+#Compares the extraction engines on large fixture pages: best wall time over a few
+#runs, peak Python memory while extracting, and whether the outputs agree
+
+
+def chunked(body, size=64 * 1024):
+    return (body[i:i + size] for i in range(0, len(body), size))
+
+
+def bench(engine, body, repeat, streamed):
+    fn = ENGINES[engine]
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(chunked(body) if streamed else body)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    fn(chunked(body) if streamed else body)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark HTML extraction engines")
+    parser.add_argument("--engines", nargs="+", default=["soup", "stream"])
+    parser.add_argument("--sizes", nargs="+", default=list(SIZES), choices=list(SIZES))
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    pages = fixture_pages({name: SIZES[name] for name in args.sizes})
+    print(f"{'page':>6} {'engine':>8} {'best s':>9} {'MB/s':>8} {'peak MB':>9}  same as first")
+    for name, body in pages.items():
+        reference = None
+        for engine in args.engines:
+            best, peak, result = bench(engine, body, args.repeat, streamed=engine == "stream")
+            reference = reference or result
+            same = result == reference
+            print(f"{name:>6} {engine:>8} {best:9.3f} {len(body) / best / 1e6:8.1f} {peak / 1e6:9.1f}  {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+import os
+import sys
+import json
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+#Cold start of every module in the repo: each import runs in a fresh interpreter,
+#timed around the import statement itself. The child also reports which heavy
+#libraries got pulled in, how many threads are running and whether anything was
+#written to the cache directory, so --check fails the run when a module goes back
+#to doing work at import time.
+#
+#  python Benchmarks/bench_import_time.py --repeat 5 --check
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = [
+    "Common.providers",
+    "Common.page_cache",
+    "Common.context_window",
+    "Common.crawler",
+    "Common.rate_limit",
+    "WebScraping.summarizer",
+    "WebScraping.openai_website_brochure",
+    "WebScraping.batch_summarize",
+    "WebScraping.site_ingest",
+    "Gradio.web_scraping_ui_gradio",
+    "ContextWindow.openai_chatbot",
+    "ContextWindow.multiple_llms_chat",
+    "ContextWindow.debate_engine",
+    "FlightAssistantUsingTools.openai_flight_assistant",
+    "FlightAssistantUsingTools.openai_flightai_multi_modal",
+    "FlightAssistantUsingTools.image_cache",
+]
+#Libraries that only the code paths needing them may import
+HEAVY = ("gradio", "PIL", "anthropic", "bs4", "lxml", "tiktoken", "ollama")
+
+CHILD = """
+import sys, json, time, threading
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "threads": threading.active_count(),
+                  "heavy": [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+
+def import_once(module, cache_dir):
+    env = dict(os.environ, AI_CACHE_DIR=cache_dir, PYTHONDONTWRITEBYTECODE="1")
+    code = CHILD.format(module=module, heavy=HEAVY)
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else f"exit {result.returncode}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def measure(module, repeat):
+    times = []
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for _ in range(repeat):
+            sample = import_once(module, cache_dir)
+            times.append(sample["seconds"])
+        written = sorted(os.listdir(cache_dir))
+    return {
+        "module": module,
+        "median_ms": statistics.median(times) * 1000,
+        "min_ms": min(times) * 1000,
+        "threads": sample["threads"],
+        "heavy_imports": sample["heavy"],
+        "files_written": written,
+    }
+
+
+def problems(result):
+    found = []
+    if result["heavy_imports"]:
+        found.append("imports " + ", ".join(result["heavy_imports"]))
+    if result["threads"] > 1:
+        found.append(f"{result['threads'] - 1} extra threads")
+    if result["files_written"]:
+        found.append("writes " + ", ".join(result["files_written"]))
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import time and import side effects of every module")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--modules", default=None, help="comma separated subset (default: all)")
+    parser.add_argument("--reference", action="store_true", help="also time the heavy libraries themselves")
+    parser.add_argument("--check", action="store_true", help="exit 1 if a module imports heavy libraries, starts threads or writes files")
+    parser.add_argument("--output", default=None, help="write the results JSON here (default: stdout)")
+    args = parser.parse_args()
+
+    modules = [m.strip() for m in args.modules.split(",")] if args.modules else list(MODULES)
+    if args.reference:
+        modules += list(HEAVY)
+    results = []
+    for module in modules:
+        try:
+            result = measure(module, args.repeat)
+        except RuntimeError as e:
+            results.append({"module": module, "skipped": str(e)})
+            print(f"{module:<56}skipped: {e}", file=sys.stderr)
+            continue
+        result["problems"] = problems(result) if module not in HEAVY else []
+        results.append(result)
+        print(f"{module:<56}{result['median_ms']:>9.1f} ms" + (f"  {'; '.join(result['problems'])}" if result["problems"] else ""),
+              file=sys.stderr)
+
+    text = json.dumps({"python": sys.version.split()[0], "repeat": args.repeat, "results": results}, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    if args.check and any(r.get("problems") for r in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import os
+import sys
+import json
+import argparse
+import subprocess
+import urllib.request
+
+from fake_servers import spawn
+
+#Model calls under a rate-limited, flaky API. The stand-in server refills a budget
+#of --rate-limit requests per second, answers 429 (with Retry-After and x-ratelimit
+#headers) when it is empty or more than --max-model-concurrency calls are in flight,
+#and fails --error-rate of the rest with a 503. The same workload - summarize,
+#get_links, the GPT/Claude debate and the FlightAI tool loop - runs once with the
+#shared rate controller (Common/rate_limit.py) and once with only the SDKs' own
+#retries (RATE_LIMIT=0), each in a fresh interpreter.
+#
+#  python Benchmarks/bench_rate_limit.py --requests 60 --concurrency 32 --rate-limit 20
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MODES = {"controller": "1", "sdk_retries": "0"}
+
+CHILD = """
+import os, sys, json, tempfile
+sys.path.insert(0, {here!r})
+from run_benchmarks import configure_env, measure
+configure_env({base_url!r}, tempfile.mkdtemp())
+from WebScraping.summarizer import summarize
+from WebScraping import openai_website_brochure as brochure
+from ContextWindow import multiple_llms_chat as chat
+from FlightAssistantUsingTools import openai_flight_assistant as flight
+from Common.rate_limit import get_controller
+page = {base_url!r} + "/pages/10kb"
+workloads = {{
+    "summarize": lambda i: summarize(page, "openai"),
+    "get_links": lambda i: brochure.get_links(page),
+    "debate": lambda i: chat.debate(1, echo=False),
+    "flight_tools": lambda i: flight.answer_with_tools("How much is a ticket to Paris?", []),
+}}
+results = [measure(name, fn, {requests}, {concurrency}) for name, fn in workloads.items()]
+print(json.dumps({{"results": results, "limiters": get_controller().snapshot()}}))
+"""
+
+
+def run_mode(mode, args):
+    process, base_url = spawn(0.05, 0.001, 20, 10_000, rate_limit=args.rate_limit, rate_window=1.0,
+                              error_rate=args.error_rate, max_model_concurrency=args.max_model_concurrency)
+    try:
+        env = dict(os.environ, RATE_LIMIT=MODES[mode], RATE_LIMIT_BACKOFF=str(args.backoff), PYTHONDONTWRITEBYTECODE="1")
+        code = CHILD.format(here=HERE, base_url=base_url, requests=args.requests, concurrency=args.concurrency)
+        child = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True)
+        if child.returncode != 0:
+            raise RuntimeError(child.stderr.strip().splitlines()[-1] if child.stderr.strip() else f"exit {child.returncode}")
+        report = json.loads(child.stdout.strip().splitlines()[-1])
+        with urllib.request.urlopen(f"{base_url}/_stats") as response:
+            report["server"] = json.loads(response.read())["model"]
+    finally:
+        process.kill()
+    report["mode"] = mode
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Model calls against a rate-limited, flaky stand-in API")
+    parser.add_argument("--requests", type=int, default=40, help="runs of each workload")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--rate-limit", type=int, default=40, help="model requests per second the server allows")
+    parser.add_argument("--max-model-concurrency", type=int, default=24)
+    parser.add_argument("--error-rate", type=float, default=0.05, help="share of requests failed with a 503")
+    parser.add_argument("--backoff", type=float, default=0.2, help="RATE_LIMIT_BACKOFF for the controller")
+    parser.add_argument("--output", default=None, help="write the results JSON here (default: stdout)")
+    args = parser.parse_args()
+
+    reports = []
+    for mode in MODES:
+        print(f"-- {mode}", file=sys.stderr)
+        report = run_mode(mode, args)
+        server = report["server"]
+        ok = sum(r["ok"] for r in report["results"])
+        total = sum(r["n"] for r in report["results"])
+        print(f"{mode}: {ok}/{total} workload runs succeeded; server saw {server['requests']} requests, "
+              f"{server['rate_limited']} rate limited, {server['overloaded']} 503s", file=sys.stderr)
+        reports.append(report)
+
+    text = json.dumps({"python": sys.version.split()[0], "settings": vars(args), "reports": reports}, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,439 @@
+import os
+import re
+import sys
+import json
+import math
+import time
+import random
+import asyncio
+import argparse
+import threading
+import subprocess
+from urllib.parse import urlsplit
+
+#Local stand-in for the model APIs so pipelines can be benchmarked offline. Speaks
+#the OpenAI chat-completions protocol (plain, streaming and tool calls), Anthropic
+#messages (plain and streaming) and Ollama chat (plain and NDJSON streaming), and
+#serves fixture HTML pages under /pages/<name>. Time to first token, per-token delay
+#and answer length are configurable, and so are rate limits, concurrency limits and
+#random 503s on the model endpoints, so retries and backoff can be exercised.
+#
+#  python Benchmarks/fake_servers.py --port 8900 --token-delay 0.01
+#  OPENAI_BASE_URL=http://127.0.0.1:8900/v1 ANTHROPIC_BASE_URL=http://127.0.0.1:8900 \
+#  OLLAMA_HOST=http://127.0.0.1:8900 OPENAI_API_KEY=fake ANTHROPIC_API_KEY=fake python ...
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PROMPT_TOKENS = 100
+#JSON-mode answers (get_links) point back at these fixture pages on the same server
+LINKED_PAGES = (("about page", "about"), ("careers page", "careers"))
+
+ANSWER_WORDS = ("Example Corp builds friendly tools for teams. Customers love the product, "
+                "the culture is open and the careers page lists remote roles. ").split()
+
+
+class FakeModelServer:
+    def __init__(self, host="127.0.0.1", port=0, first_token_delay=0.2, token_delay=0.01, answer_tokens=200, pages=None,
+                 page_delay=0.0, rate_limit=0, rate_window=1.0, error_rate=0.0, max_model_concurrency=0):
+        self.host = host
+        self.port = port
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        self.answer_tokens = answer_tokens
+        self.pages = pages or {}
+        #Seconds before a page is served, standing in for a remote site's latency
+        self.page_delay = page_delay
+        #Politeness as seen from the server side for the crawlable /site/ pages
+        self.crawl = {"requests": 0, "in_flight": 0, "max_in_flight": 0, "min_gap": None, "last_start": None, "disallowed": 0}
+        self.requests = 0
+        #Model endpoints can be rate limited like the real APIs: a budget of rate_limit
+        #requests that refills continuously over rate_window seconds (429 with
+        #Retry-After when empty), at most max_model_concurrency in flight (429 too) and
+        #error_rate random 503s
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.error_rate = error_rate
+        self.max_model_concurrency = max_model_concurrency
+        self.budget = {"level": float(rate_limit), "updated": time.monotonic()}
+        self.model = {"requests": 0, "ok": 0, "rate_limited": 0, "overloaded": 0, "in_flight": 0, "max_in_flight": 0}
+        self._random = random.Random(0)
+        self._server = None
+
+    def answer_tokens_list(self):
+        return [ANSWER_WORDS[i % len(ANSWER_WORDS)] + " " for i in range(self.answer_tokens)]
+
+    #---- HTTP plumbing (HTTP/1.1 with keep-alive, chunked bodies for streams) ----
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                lines = head.decode("latin-1").split("\r\n")
+                method, target, _ = lines[0].split(" ", 2)
+                headers = {}
+                for line in lines[1:]:
+                    if ":" in line:
+                        name, value = line.split(":", 1)
+                        headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", "0"))
+                body = await reader.readexactly(length) if length else b""
+                self.requests += 1
+                await self.route(method, urlsplit(target).path, headers, body, writer)
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def send(writer, status, body, content_type="application/json", extra_headers=None):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode()
+        head = f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\nContent-Length: {len(body)}\r\n"
+        #Headers of the model request being answered on this connection (rate limits)
+        for name, value in dict(getattr(writer, "extra_headers", None) or {}, **(extra_headers or {})).items():
+            head += f"{name}: {value}\r\n"
+        writer.write(head.encode() + b"\r\n" + body)
+        await writer.drain()
+
+    @staticmethod
+    async def start_chunked(writer, content_type="text/event-stream"):
+        head = f"HTTP/1.1 200 OK\r\nContent-Type: {content_type}\r\nTransfer-Encoding: chunked\r\n"
+        for name, value in (getattr(writer, "extra_headers", None) or {}).items():
+            head += f"{name}: {value}\r\n"
+        writer.write(head.encode() + b"\r\n")
+        await writer.drain()
+
+    @staticmethod
+    async def send_chunk(writer, data):
+        if isinstance(data, str):
+            data = data.encode()
+        writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        await writer.drain()
+
+    @staticmethod
+    async def end_chunked(writer):
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    #---- routes ----
+
+    async def site(self, path, headers, writer):
+        from fixtures import robots_txt, site_page, sitemap_xml
+        base = f"http://{headers.get('host') or f'{self.host}:{self.port}'}"
+        if path == "/robots.txt":
+            await self.send(writer, "200 OK", robots_txt(base), "text/plain")
+            return
+        if path == "/sitemap.xml":
+            await self.send(writer, "200 OK", sitemap_xml(base), "application/xml")
+            return
+        crawl = self.crawl
+        now = time.monotonic()
+        if crawl["last_start"] is not None:
+            gap = now - crawl["last_start"]
+            crawl["min_gap"] = gap if crawl["min_gap"] is None else min(crawl["min_gap"], gap)
+        crawl["last_start"] = now
+        crawl["requests"] += 1
+        crawl["disallowed"] += path.startswith("/private/")
+        crawl["in_flight"] += 1
+        crawl["max_in_flight"] = max(crawl["max_in_flight"], crawl["in_flight"])
+        try:
+            await asyncio.sleep(self.page_delay)
+            await self.send(writer, "200 OK", site_page(path[len("/site"):]), "text/html; charset=utf-8")
+        finally:
+            crawl["in_flight"] -= 1
+
+    async def route(self, method, path, headers, body, writer):
+        if method == "GET" and (path.startswith(("/site/", "/private/")) or path in ("/site", "/robots.txt", "/sitemap.xml")):
+            await self.site(path, headers, writer)
+        elif method == "GET" and path == "/_stats":
+            await self.send(writer, "200 OK", {"crawl": {k: v for k, v in self.crawl.items() if k != "last_start"}, "model": self.model})
+        elif method == "GET" and path.startswith("/pages/"):
+            page = self.pages.get(path[len("/pages/"):])
+            if page is None:
+                await self.send(writer, "404 Not Found", b"not found", "text/plain")
+            else:
+                await asyncio.sleep(self.page_delay)
+                await self.send(writer, "200 OK", page, "text/html; charset=utf-8")
+        elif method == "POST" and (path.endswith(("/chat/completions", "/messages")) or path == "/api/chat"):
+            await self.model_route(path, body, headers, writer)
+        else:
+            await self.send(writer, "404 Not Found", {"error": {"message": f"no route {method} {path}"}})
+
+    def refill(self, now):
+        budget = self.budget
+        budget["level"] = min(self.rate_limit, budget["level"] + (now - budget["updated"]) * self.rate_limit / self.rate_window)
+        budget["updated"] = now
+
+    #Rate-limit headers in both APIs' spelling: what is left and how long until full again
+    def limit_headers(self, now):
+        if not self.rate_limit:
+            return {}
+        remaining = int(self.budget["level"])
+        reset = (self.rate_limit - self.budget["level"]) * self.rate_window / self.rate_limit
+        reset_at = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() + reset))
+        return {"x-ratelimit-limit-requests": self.rate_limit, "x-ratelimit-remaining-requests": remaining,
+                "x-ratelimit-reset-requests": f"{int(reset * 1000)}ms", "anthropic-ratelimit-requests-limit": self.rate_limit,
+                "anthropic-ratelimit-requests-remaining": remaining, "anthropic-ratelimit-requests-reset": reset_at}
+
+    #429 / 503 instead of an answer when the caller is over its limits
+    def reject(self, now):
+        if self.rate_limit:
+            self.refill(now)
+            if self.budget["level"] < 1:
+                retry = (1 - self.budget["level"]) * self.rate_window / self.rate_limit
+                return "429 Too Many Requests", {"retry-after-ms": int(retry * 1000) + 1, "retry-after": max(1, math.ceil(retry))}
+            self.budget["level"] -= 1
+        if self.max_model_concurrency and self.model["in_flight"] >= self.max_model_concurrency:
+            return "429 Too Many Requests", {}
+        if self.error_rate and self._random.random() < self.error_rate:
+            return "503 Service Unavailable", {}
+        return None
+
+    async def model_route(self, path, body, headers, writer):
+        now = time.monotonic()
+        stats = self.model
+        stats["requests"] += 1
+        rejected = self.reject(now)
+        if rejected:
+            status, extra = rejected
+            stats["rate_limited" if status.startswith("429") else "overloaded"] += 1
+            kind = "rate_limit_error" if status.startswith("429") else "overloaded_error"
+            await self.send(writer, status, {"type": "error", "error": {"type": kind, "message": status}},
+                            extra_headers=dict(self.limit_headers(now), **extra))
+            return
+        stats["in_flight"] += 1
+        stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+        writer.extra_headers = self.limit_headers(now)
+        try:
+            request = json.loads(body or b"{}")
+            if path.endswith("/chat/completions"):
+                await self.openai_chat(request, headers, writer)
+            elif path.endswith("/messages"):
+                await self.anthropic_messages(request, writer)
+            else:
+                await self.ollama_chat(request, writer)
+            stats["ok"] += 1
+        finally:
+            writer.extra_headers = {}
+            stats["in_flight"] -= 1
+
+    #Cut into token-sized pieces, so JSON answers take as long to generate (and
+    #stream in as many deltas) as they would from a real model
+    def links_answer(self, headers, token_chars=4):
+        base = f"http://{headers.get('host') or f'{self.host}:{self.port}'}"
+        text = json.dumps({"links": [{"type": kind, "url": f"{base}/pages/{name}"} for kind, name in LINKED_PAGES]}, indent=2)
+        return [text[i:i + token_chars] for i in range(0, len(text), token_chars)]
+
+    #A turn that offers tools and has no tool results yet gets tool calls: one per
+    #tool whose only required argument is destination_city, for the city named at
+    #the end of the last user message
+    @staticmethod
+    def planned_tool_calls(request):
+        tools = request.get("tools") or []
+        messages = request.get("messages") or []
+        if not tools or not messages or messages[-1].get("role") == "tool":
+            return []
+        user = next((m for m in reversed(messages) if m.get("role") == "user"), {})
+        text = user.get("content") if isinstance(user.get("content"), str) else ""
+        match = re.search(r"\bto ([A-Za-z ]+?)[?.!]*$", text.strip())
+        city = match.group(1) if match else "London"
+        calls = []
+        for tool in tools:
+            function = tool.get("function", {})
+            if function.get("parameters", {}).get("required") == ["destination_city"]:
+                calls.append({"id": f"call_{len(calls)}", "type": "function",
+                              "function": {"name": function["name"], "arguments": json.dumps({"destination_city": city})}})
+        return calls
+
+    async def openai_chat(self, request, headers, writer):
+        model = request.get("model", "fake-model")
+        created = int(time.time())
+        tokens = self.answer_tokens_list()
+        if (request.get("response_format") or {}).get("type") == "json_object":
+            tokens = self.links_answer(headers)
+        tool_calls = self.planned_tool_calls(request)
+        await asyncio.sleep(self.first_token_delay)
+        if tool_calls:
+            await self.openai_tool_calls(request, model, created, tool_calls, writer)
+            return
+        if not request.get("stream"):
+            await asyncio.sleep(self.token_delay * len(tokens))
+            await self.send(writer, "200 OK", {
+                "id": "chatcmpl-fake", "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens)}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 100, "completion_tokens": len(tokens), "total_tokens": 100 + len(tokens)},
+            })
+            return
+        await self.start_chunked(writer)
+        for i, token in enumerate(tokens):
+            chunk = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": created, "model": model,
+                     "choices": [{"index": 0, "delta": {"role": "assistant", "content": token} if i == 0 else {"content": token}, "finish_reason": None}]}
+            await self.send_chunk(writer, f"data: {json.dumps(chunk)}\n\n")
+            await asyncio.sleep(self.token_delay)
+        done = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+        await self.send_chunk(writer, f"data: {json.dumps(done)}\n\n")
+        if (request.get("stream_options") or {}).get("include_usage"):
+            usage = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": created, "model": model, "choices": [],
+                     "usage": {"prompt_tokens": 100, "completion_tokens": len(tokens), "total_tokens": 100 + len(tokens)}}
+            await self.send_chunk(writer, f"data: {json.dumps(usage)}\n\n")
+        await self.send_chunk(writer, "data: [DONE]\n\n")
+        await self.end_chunked(writer)
+
+    async def openai_tool_calls(self, request, model, created, tool_calls, writer):
+        usage = {"prompt_tokens": PROMPT_TOKENS, "completion_tokens": 20 * len(tool_calls), "total_tokens": PROMPT_TOKENS + 20 * len(tool_calls)}
+        if not request.get("stream"):
+            await self.send(writer, "200 OK", {
+                "id": "chatcmpl-fake", "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": None, "tool_calls": tool_calls}, "finish_reason": "tool_calls"}],
+                "usage": usage,
+            })
+            return
+        await self.start_chunked(writer)
+        for index, call in enumerate(tool_calls):
+            #Arguments arrive in two fragments, like the real API splits them
+            arguments = call["function"]["arguments"]
+            half = len(arguments) // 2
+            fragments = [{"index": index, "id": call["id"], "type": "function", "function": {"name": call["function"]["name"], "arguments": arguments[:half]}},
+                         {"index": index, "function": {"arguments": arguments[half:]}}]
+            for fragment in fragments:
+                chunk = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": created, "model": model,
+                         "choices": [{"index": 0, "delta": {"tool_calls": [fragment]}, "finish_reason": None}]}
+                await self.send_chunk(writer, f"data: {json.dumps(chunk)}\n\n")
+                await asyncio.sleep(self.token_delay)
+        done = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "tool_calls"}]}
+        await self.send_chunk(writer, f"data: {json.dumps(done)}\n\n")
+        if (request.get("stream_options") or {}).get("include_usage"):
+            chunk = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": created, "model": model, "choices": [], "usage": usage}
+            await self.send_chunk(writer, f"data: {json.dumps(chunk)}\n\n")
+        await self.send_chunk(writer, "data: [DONE]\n\n")
+        await self.end_chunked(writer)
+
+    async def anthropic_messages(self, request, writer):
+        model = request.get("model", "fake-claude")
+        tokens = self.answer_tokens_list()[:request.get("max_tokens") or self.answer_tokens]
+        await asyncio.sleep(self.first_token_delay)
+        if not request.get("stream"):
+            await asyncio.sleep(self.token_delay * len(tokens))
+            await self.send(writer, "200 OK", {
+                "id": "msg_fake", "type": "message", "role": "assistant", "model": model,
+                "content": [{"type": "text", "text": "".join(tokens)}],
+                "stop_reason": "end_turn", "stop_sequence": None,
+                "usage": {"input_tokens": PROMPT_TOKENS, "output_tokens": len(tokens)},
+            })
+            return
+
+        async def event(name, data):
+            await self.send_chunk(writer, f"event: {name}\ndata: {json.dumps(data)}\n\n")
+
+        await self.start_chunked(writer)
+        await event("message_start", {"type": "message_start", "message": {
+            "id": "msg_fake", "type": "message", "role": "assistant", "model": model, "content": [],
+            "stop_reason": None, "stop_sequence": None, "usage": {"input_tokens": PROMPT_TOKENS, "output_tokens": 1}}})
+        await event("content_block_start", {"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}})
+        for token in tokens:
+            await event("content_block_delta", {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": token}})
+            await asyncio.sleep(self.token_delay)
+        await event("content_block_stop", {"type": "content_block_stop", "index": 0})
+        await event("message_delta", {"type": "message_delta", "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                                      "usage": {"output_tokens": len(tokens)}})
+        await event("message_stop", {"type": "message_stop"})
+        await self.end_chunked(writer)
+
+    async def ollama_chat(self, request, writer):
+        model = request.get("model", "fake-llama")
+        tokens = self.answer_tokens_list()
+        if request.get("format") == "json":
+            tokens = [json.dumps({"links": []})]
+        await asyncio.sleep(self.first_token_delay)
+        created_at = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        final = {"model": model, "created_at": created_at, "done": True, "done_reason": "stop",
+                 "prompt_eval_count": PROMPT_TOKENS, "eval_count": len(tokens)}
+        if not request.get("stream", True):
+            await asyncio.sleep(self.token_delay * len(tokens))
+            await self.send(writer, "200 OK", dict(final, message={"role": "assistant", "content": "".join(tokens)}))
+            return
+        await self.start_chunked(writer, "application/x-ndjson")
+        for token in tokens:
+            line = {"model": model, "created_at": created_at, "message": {"role": "assistant", "content": token}, "done": False}
+            await self.send_chunk(writer, json.dumps(line) + "\n")
+            await asyncio.sleep(self.token_delay)
+        await self.send_chunk(writer, json.dumps(dict(final, message={"role": "assistant", "content": ""})) + "\n")
+        await self.end_chunked(writer)
+
+    #---- lifecycle ----
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port, backlog=1024)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}"
+
+    #Runs the server on its own loop in a daemon thread; returns once it is listening
+    def start_in_thread(self):
+        ready = threading.Event()
+
+        def run():
+            loop = asyncio.new_event_loop()
+            loop.run_until_complete(self.start())
+            ready.set()
+            loop.run_forever()
+
+        threading.Thread(target=run, daemon=True, name="fake-model-server").start()
+        ready.wait()
+        return self
+
+
+#Starts the server in a child process (so it does not compete with the code under
+#test for the GIL) and returns (process, base_url)
+def spawn(first_token_delay=0.2, token_delay=0.01, answer_tokens=200, page_size=100_000, page_delay=0.0,
+          rate_limit=0, rate_window=1.0, error_rate=0.0, max_model_concurrency=0):
+    cmd = [sys.executable, os.path.join(HERE, "fake_servers.py"), "--port", "0",
+           "--first-token-delay", str(first_token_delay), "--token-delay", str(token_delay),
+           "--answer-tokens", str(answer_tokens), "--page-size", str(page_size), "--page-delay", str(page_delay),
+           "--rate-limit", str(rate_limit), "--rate-window", str(rate_window), "--error-rate", str(error_rate),
+           "--max-model-concurrency", str(max_model_concurrency)]
+    process = subprocess.Popen(cmd, stderr=subprocess.PIPE, text=True)
+    line = process.stderr.readline()
+    if not line.startswith("listening on "):
+        process.kill()
+        raise RuntimeError(f"fake server did not start: {line}")
+    return process, line.split("listening on ", 1)[1].strip()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the local stand-in model server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--first-token-delay", type=float, default=0.2)
+    parser.add_argument("--token-delay", type=float, default=0.01)
+    parser.add_argument("--answer-tokens", type=int, default=200)
+    parser.add_argument("--page-size", type=int, default=100_000, help="size of the fixture served at /pages/landing")
+    parser.add_argument("--page-delay", type=float, default=0.0, help="seconds before each /pages/ response")
+    parser.add_argument("--rate-limit", type=int, default=0, help="model requests per --rate-window before 429s (0 = unlimited)")
+    parser.add_argument("--rate-window", type=float, default=1.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of model requests answered with a 503")
+    parser.add_argument("--max-model-concurrency", type=int, default=0, help="model requests in flight before 429s (0 = unlimited)")
+    args = parser.parse_args()
+
+    from fixtures import corpus, site_pages
+    pages = dict(corpus(), **site_pages(args.page_size))
+    server = FakeModelServer(args.host, args.port, args.first_token_delay, args.token_delay, args.answer_tokens, pages=pages,
+                             page_delay=args.page_delay, rate_limit=args.rate_limit, rate_window=args.rate_window,
+                             error_rate=args.error_rate, max_model_concurrency=args.max_model_concurrency)
+
+    async def serve():
+        await server.start()
+        print(f"listening on {server.base_url}", file=sys.stderr, flush=True)
+        await asyncio.Event().wait()
+
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import os
+import sys
+import random
+import argparse
+
+#Synthetic company pages of a given size: nav, inline scripts/styles, images,
+#forms, paragraphs and lots of links, roughly the mix seen on real landing pages
+
+WORDS = ("company customers platform careers culture product team open source model "
+         "research community enterprise security pricing about blog news hiring remote").split()
+
+
+def _sentence(rng, n=14):
+    return " ".join(rng.choice(WORDS) for _ in range(n)).capitalize() + "."
+
+
+def make_page(size_bytes, seed=0):
+    rng = random.Random(seed)
+    head = [
+        "<!DOCTYPE html><html lang='en'><head><meta charset='utf-8'>",
+        "<title>Example Corp &amp; Friends — Home</title>",
+        "<style>body{font-family:sans-serif}.nav a{margin:0 4px}</style>",
+        "<script>window.dataLayer=[];function gtag(){dataLayer.push(arguments)}</script>",
+        "</head><body>",
+        "<nav class='nav'>" + "".join(f"<a href='/section/{i}'>Section {i}</a>" for i in range(20)) + "</nav>",
+    ]
+    parts = list(head)
+    size = sum(len(p) for p in parts)
+    i = 0
+    while size < size_bytes:
+        block = (
+            f"<section id='s{i}'><h2>{_sentence(rng, 4)}</h2>"
+            f"<p>{_sentence(rng)} <a href='/about/{i}'>about</a> {_sentence(rng)}</p>"
+            f"<img src='/img/{i}.png' alt='image {i}'>"
+            f"<script>var block{i} = {{id: {i}, text: '{_sentence(rng, 6)}'}};</script>"
+            f"<ul>" + "".join(f"<li><a href='https://example.com/p/{i}/{j}'>{rng.choice(WORDS)}</a></li>" for j in range(5)) + "</ul>"
+            f"<form><input type='text' name='q{i}'><!-- comment {i} --></form>"
+            f"<style>.s{i}{{color:#{i % 999:03d}}}</style></section>\n"
+        )
+        parts.append(block)
+        size += len(block)
+        i += 1
+    parts.append("<footer><a href='mailto:hi@example.com'>Contact</a> <a href='/privacy'>Privacy</a></footer></body></html>")
+    return "".join(parts).encode("utf-8")
+
+
+#Name -> size used by the benchmarks
+SIZES = {"100kb": 100_000, "1mb": 1_000_000, "5mb": 5_000_000}
+#Recorded pages (python fixtures.py record NAME URL) are kept here as NAME.html.
+#None are committed: real landing pages are third-party content and drift between
+#recordings, so the shared numbers come from the synthetic pages above and a
+#recorded set stays local to whoever wants to compare against live sites.
+RECORDED_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "html")
+
+
+def fixture_pages(sizes=SIZES):
+    return {name: make_page(size, seed=len(name)) for name, size in sizes.items()}
+
+
+def recorded_pages(directory=RECORDED_DIR):
+    pages = {}
+    if os.path.isdir(directory):
+        for filename in sorted(os.listdir(directory)):
+            if filename.endswith(".html"):
+                with open(os.path.join(directory, filename), "rb") as f:
+                    pages[filename[:-5]] = f.read()
+    return pages
+
+
+#Benchmark corpus: every recorded page plus synthetic pages from 10 KB to 5 MB, so
+#runs are comparable on machines without any recordings
+def corpus(sizes=None):
+    pages = fixture_pages(sizes or dict({"10kb": 10_000}, **SIZES))
+    pages.update(recorded_pages())
+    return pages
+
+
+#A small company site for the brochure: the landing page plus the pages its links point to
+def site_pages(landing_size=100_000):
+    return {
+        "landing": make_page(landing_size),
+        "about": make_page(max(landing_size // 4, 5_000), seed=1),
+        "careers": make_page(max(landing_size // 4, 5_000), seed=2),
+    }
+
+
+#A crawlable company site served under /site/: a tree of pages (five children per
+#page down to SITE_DEPTH), the usual about/careers/team pages, one page that is
+#only listed in the sitemap, and links the crawler must not follow
+SITE_DEPTH = 3
+SITE_SECTIONS = ("about", "careers", "team", "customers", "blog")
+SITEMAP_ONLY = "our-story"
+
+
+def site_page(path, size=3_000):
+    rng = random.Random(path)
+    segments = [s for s in path.strip("/").split("/") if s]
+    children = [f"/site/{'/'.join(segments + [str(i)])}" for i in range(5)] if len(segments) < SITE_DEPTH else []
+    nav = [f"/site/{name}" for name in SITE_SECTIONS] + ["/private/admin", "mailto:hi@example.com",
+                                                          "https://elsewhere.example/partner", "/site/about#team"]
+    links = "".join(f"<a href='{href}'>{href.rsplit('/', 1)[-1]}</a> " for href in nav + children)
+    body = "".join(f"<p>{_sentence(rng)}</p>" for _ in range(max(1, size // 100)))
+    title = " / ".join(segments) or "home"
+    return f"<html><head><title>Example Corp - {title}</title></head><body><nav>{links}</nav>{body}</body></html>".encode("utf-8")
+
+
+def robots_txt(base_url):
+    return f"User-agent: *\nDisallow: /private/\n\nSitemap: {base_url}/sitemap.xml\n".encode()
+
+
+def sitemap_xml(base_url):
+    paths = [f"/site/{name}" for name in SITE_SECTIONS + (SITEMAP_ONLY,)]
+    urls = "".join(f"<url><loc>{base_url}{path}</loc></url>" for path in paths)
+    return f'<?xml version="1.0" encoding="UTF-8"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>'.encode()
+
+
+def record(name, url, directory=RECORDED_DIR):
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from Common.fetcher import fetch_page_sync
+    response = fetch_page_sync(url)
+    response.raise_for_status()
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{name}.html")
+    with open(path, "wb") as f:
+        f.write(response.content)
+    return path, len(response.content)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark HTML fixtures")
+    commands = parser.add_subparsers(dest="command", required=True)
+    record_cmd = commands.add_parser("record", help="download a page into the recorded corpus")
+    record_cmd.add_argument("name")
+    record_cmd.add_argument("url")
+    commands.add_parser("list", help="show the corpus")
+    args = parser.parse_args()
+    if args.command == "record":
+        path, size = record(args.name, args.url)
+        print(f"saved {size} bytes to {path}")
+    else:
+        for name, body in corpus().items():
+            print(f"{name:<20}{len(body):>10}")
+
+
+if __name__ == "__main__":
+    main()
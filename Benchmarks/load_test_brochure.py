@@ -0,0 +1,127 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from fake_servers import spawn
+
+#Load test for the brochure Gradio handlers. Starts the local stand-in model server
+#in a subprocess, points the OpenAI backend at it and runs N brochure requests with
+#C in flight at once, then reports latency percentiles.
+#
+#  python Benchmarks/load_test_brochure.py --requests 500 --concurrency 200 --mode async
+#  python Benchmarks/load_test_brochure.py --requests 500 --concurrency 200 --mode sync --threads 40
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(pct / 100 * len(values) + 0.5) - 1))
+    return values[index]
+
+
+def load_app(base_url, page_cache):
+    env = {
+        "OPENAI_BASE_URL": base_url + "/v1", "OPENAI_API_KEY": "fake", "BROCHURE_PROVIDER": "openai",
+        "BROCHURE_MODEL": "fake-model", "PAGE_CACHE": "1" if page_cache else "0",
+    }
+    #Set before the import: the env file only fills in what is not set already
+    os.environ.update(env)
+    sys.path.append(ROOT)
+    from Gradio import web_scraping_ui_gradio as app
+    return app
+
+
+async def run_async(app, url, args):
+    semaphore = asyncio.Semaphore(args.concurrency)
+    results = []
+
+    async def one():
+        start = time.perf_counter()
+        async with semaphore:
+            first = None
+            try:
+                async for text in app.stream_brochure_async("Example Corp", url):
+                    if text and first is None:
+                        first = time.perf_counter() - start
+                results.append({"ok": True, "latency": time.perf_counter() - start, "ttft": first})
+            except Exception as e:
+                results.append({"ok": False, "error": f"{type(e).__name__}: {e}"})
+
+    await asyncio.gather(*(one() for _ in range(args.requests)))
+    return results
+
+
+def run_sync(app, url, args):
+    #Timed from submission so requests waiting for a free thread count their queueing delay
+    submitted = time.perf_counter()
+
+    def one():
+        start = submitted
+        first = None
+        try:
+            for text in app.stream_brochure("Example Corp", url):
+                if text and first is None:
+                    first = time.perf_counter() - start
+            return {"ok": True, "latency": time.perf_counter() - start, "ttft": first}
+        except Exception as e:
+            return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+
+    #Mirrors the thread-per-request model: at most --threads brochures make progress at once
+    with ThreadPoolExecutor(max_workers=min(args.threads, args.concurrency)) as executor:
+        return list(executor.map(lambda _: one(), range(args.requests)))
+
+
+def summarize(results, wall, args):
+    ok = [r for r in results if r["ok"]]
+    latencies = [r["latency"] for r in ok]
+    ttfts = [r["ttft"] for r in ok if r["ttft"] is not None]
+    return {
+        "mode": args.mode, "requests": args.requests, "concurrency": args.concurrency,
+        "ok": len(ok), "errors": len(results) - len(ok), "wall_s": wall,
+        "throughput_rps": len(ok) / wall if wall else None,
+        "latency_p50_s": percentile(latencies, 50), "latency_p99_s": percentile(latencies, 99),
+        "ttft_p50_s": percentile(ttfts, 50), "ttft_p99_s": percentile(ttfts, 99),
+        "sample_errors": sorted({r["error"] for r in results if not r["ok"]})[:5],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the brochure handlers against a local stand-in model")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--mode", choices=["async", "sync"], default="async")
+    parser.add_argument("--threads", type=int, default=40, help="worker threads for --mode sync (Gradio's default is 40)")
+    parser.add_argument("--first-token-delay", type=float, default=0.2)
+    parser.add_argument("--token-delay", type=float, default=0.01)
+    parser.add_argument("--answer-tokens", type=int, default=200)
+    parser.add_argument("--page-size", type=int, default=100_000)
+    parser.add_argument("--page-cache", action="store_true", help="serve the landing page from the page cache")
+    parser.add_argument("--json", action="store_true", help="print the report as one JSON object")
+    args = parser.parse_args()
+
+    process, base_url = spawn(args.first_token_delay, args.token_delay, args.answer_tokens, args.page_size)
+    try:
+        app = load_app(base_url, args.page_cache)
+        url = base_url + "/pages/landing"
+        start = time.perf_counter()
+        results = asyncio.run(run_async(app, url, args)) if args.mode == "async" else run_sync(app, url, args)
+        report = summarize(results, time.perf_counter() - start, args)
+    finally:
+        process.kill()
+    if args.json:
+        print(json.dumps(report))
+    else:
+        for key, value in report.items():
+            print(f"{key:>16}: {value:.3f}" if isinstance(value, float) else f"{key:>16}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from fake_servers import spawn
+from fixtures import corpus
+
+#Offline benchmark suite. Starts the stand-in model server (OpenAI, Anthropic and
+#Ollama protocols plus the HTML fixture corpus), points every backend at it and
+#times the real pipelines end to end. Results are written as one JSON document so
+#runs can be diffed; --baseline flags anything slower than the given tolerance.
+#
+#  python Benchmarks/run_benchmarks.py --output results.json
+#  python Benchmarks/run_benchmarks.py --only parse,summarize --baseline results.json
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+PROVIDERS = ("openai", "anthropic", "ollama")
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(pct / 100 * len(values) + 0.5) - 1))
+    return values[index]
+
+
+#Calls fn n times over `concurrency` threads and summarizes per-call latency
+def measure(name, fn, n, concurrency=1, **extra):
+    latencies = []
+    errors = []
+
+    def one(i):
+        start = time.perf_counter()
+        try:
+            fn(i)
+        except Exception as e:
+            errors.append(f"{type(e).__name__}: {e}")
+            return
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(one, range(n)))
+    else:
+        for i in range(n):
+            one(i)
+    wall = time.perf_counter() - start
+    result = dict(
+        name=name, n=n, concurrency=concurrency, ok=len(latencies), errors=len(errors),
+        wall_s=wall, throughput_per_s=len(latencies) / wall if wall else None, **extra,
+    )
+    if latencies:
+        result.update(
+            mean_ms=sum(latencies) / len(latencies) * 1000,
+            p50_ms=percentile(latencies, 50) * 1000,
+            p90_ms=percentile(latencies, 90) * 1000,
+            p99_ms=percentile(latencies, 99) * 1000,
+        )
+    if errors:
+        result["sample_errors"] = sorted(set(errors))[:3]
+    print(f"{name:<36}{result.get('p50_ms', float('nan')):>10.2f} ms p50{result['throughput_per_s'] or 0:>10.1f}/s"
+          + (f"  {len(errors)} errors" if errors else ""), file=sys.stderr)
+    return result
+
+
+#---- benchmarks ----
+
+def bench_parse(args, base_url):
+    from Common.extract import extract
+    results = []
+    for name, body in corpus().items():
+        n = max(3, min(args.iterations, 2_000_000 // max(len(body), 1)))
+        results.append(measure(f"parse/{name}", lambda i: extract(body), n, bytes=len(body)))
+    return results
+
+
+def bench_links(args, base_url):
+    from Common.extract import extract
+    from Common.links import rank_links
+    results = []
+    for name, body in corpus().items():
+        hrefs = extract(body)["links"]
+        candidates = rank_links("https://example.com/", hrefs)
+        results.append(measure(f"links/{name}", lambda i: rank_links("https://example.com/", hrefs), args.iterations,
+                               raw_links=len(hrefs), raw_chars=len("\n".join(hrefs)), prompt_chars=len("\n".join(candidates))))
+    return results
+
+
+def bench_website(args, base_url):
+    from WebScraping.summarizer import Website
+    return [measure(f"website/{name}", lambda i: Website(f"{base_url}/pages/{name}"), args.iterations)
+            for name in ("10kb", "100kb", "1mb")]
+
+
+def bench_summarize(args, base_url):
+    from WebScraping.summarizer import summarize
+    url = f"{base_url}/pages/100kb"
+    return [measure(f"summarize/{provider}", lambda i: summarize(url, provider), args.iterations, args.concurrency, provider=provider)
+            for provider in PROVIDERS]
+
+
+def bench_brochure(args, base_url):
+    from WebScraping import openai_website_brochure as brochure
+    url = f"{base_url}/pages/landing"
+    return [
+        measure("brochure/concurrent", lambda i: brochure.create_brochure("Example Corp", url), args.iterations, args.concurrency),
+        measure("brochure/sequential", lambda i: brochure.create_brochure("Example Corp", url, concurrent=False), args.iterations, args.concurrency),
+        #Landing page, link selection and linked pages only: whole JSON answer first vs pages fetched while it streams
+        measure("brochure/details_whole_json", lambda i: brochure.get_all_details(url, pipelined=False), args.iterations, args.concurrency),
+        measure("brochure/details_streamed_json", lambda i: brochure.get_all_details(url, pipelined=True), args.iterations, args.concurrency),
+    ]
+
+
+def bench_debate(args, base_url):
+    from ContextWindow import multiple_llms_chat as chat
+    rounds = 3
+    return [measure("debate/3_rounds", lambda i: chat.debate(rounds, echo=False), max(1, args.iterations // 4), args.concurrency,
+                    requests_per_run=2 * rounds)]
+
+
+def bench_flight(args, base_url):
+    from FlightAssistantUsingTools import openai_flight_assistant as flight
+    question = "How much is a ticket to Paris?"
+    router = flight.get_router()
+    results = [measure("flight/tool_loop", lambda i: flight.answer_with_tools(question, []), args.iterations, args.concurrency)]
+    if router:
+        results.append(measure("flight/fast_path", lambda i: flight.chat(question, []), args.iterations * 10))
+    return results
+
+
+BENCHMARKS = {
+    "parse": bench_parse,
+    "links": bench_links,
+    "website": bench_website,
+    "summarize": bench_summarize,
+    "brochure": bench_brochure,
+    "debate": bench_debate,
+    "flight": bench_flight,
+}
+
+
+#---- setup and reporting ----
+
+def configure_env(base_url, workdir):
+    env = {
+        "OPENAI_BASE_URL": f"{base_url}/v1", "OPENAI_API_KEY": "fake",
+        "ANTHROPIC_BASE_URL": base_url, "ANTHROPIC_API_KEY": "fake", "CLAUDE_API_KEY": "fake",
+        "OLLAMA_HOST": base_url, "GPT_MODEL": "gpt-4o-mini",
+        #Every call should reach the (fake) network, not a cache from an earlier iteration
+        "PAGE_CACHE": "0", "LLM_CACHE": "0", "LINK_CACHE_TTL": "0",
+        "AI_CACHE_DIR": workdir, "INVENTORY_DB": os.path.join(workdir, "flights.db"),
+        "BOOKING_JOURNAL": os.path.join(workdir, "bookings.jsonl"),
+        "SUMMARIZE_PROVIDER": "openai", "BROCHURE_PROVIDER": "openai", "LLM_PROVIDER": "openai",
+        #Opt-in in the app; on here so flight/fast_path is measured
+        "FLIGHT_FAST_PATH": "1",
+    }
+    #Set before anything from the repo is imported; the env file only fills in what is not set
+    os.environ.update(env)
+    sys.path.append(ROOT)
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+#Benchmarks whose p50 grew by more than tolerance against the baseline file
+def regressions(results, baseline_path, tolerance):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {r["name"]: r for r in json.load(f)["results"]}
+    found = []
+    for result in results:
+        before = baseline.get(result["name"])
+        if before and before.get("p50_ms") and result.get("p50_ms"):
+            change = result["p50_ms"] / before["p50_ms"] - 1
+            if change > tolerance:
+                found.append({"name": result["name"], "baseline_p50_ms": before["p50_ms"], "p50_ms": result["p50_ms"], "change": change})
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks against local stand-in model servers")
+    parser.add_argument("--only", default=",".join(BENCHMARKS), help=f"comma separated subset of: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--first-token-delay", type=float, default=0.05)
+    parser.add_argument("--token-delay", type=float, default=0.002)
+    parser.add_argument("--answer-tokens", type=int, default=100)
+    parser.add_argument("--page-size", type=int, default=100_000, help="size of the brochure landing page")
+    parser.add_argument("--page-delay", type=float, default=0.0, help="latency of every fixture page")
+    parser.add_argument("--output", default=None, help="write the results JSON here (default: stdout)")
+    parser.add_argument("--baseline", default=None, help="earlier results JSON to compare p50 latencies against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p50 slowdown against the baseline")
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.only.split(",") if name.strip()]
+    unknown = set(names) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    process, base_url = spawn(args.first_token_delay, args.token_delay, args.answer_tokens, args.page_size, args.page_delay)
+    results = []
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            configure_env(base_url, workdir)
+            for name in names:
+                try:
+                    results.extend(BENCHMARKS[name](args, base_url))
+                except Exception as e:
+                    results.append({"name": name, "skipped": f"{type(e).__name__}: {e}"})
+                    print(f"{name:<36}skipped: {type(e).__name__}: {e}", file=sys.stderr)
+    finally:
+        process.kill()
+
+    report = {
+        "meta": {
+            "timestamp": time.time(), "git": git_revision(), "python": platform.python_version(),
+            "platform": platform.platform(), "server": {"first_token_delay": args.first_token_delay,
+            "token_delay": args.token_delay, "answer_tokens": args.answer_tokens, "page_delay": args.page_delay},
+            "iterations": args.iterations, "concurrency": args.concurrency,
+        },
+        "results": results,
+    }
+    status = 0
+    if args.baseline:
+        report["regressions"] = regressions(results, args.baseline, args.tolerance)
+        for found in report["regressions"]:
+            print(f"REGRESSION {found['name']}: {found['baseline_p50_ms']:.2f} -> {found['p50_ms']:.2f} ms p50", file=sys.stderr)
+        status = 1 if report["regressions"] else 0
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
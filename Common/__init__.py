@@ -0,0 +1,10 @@
+#Shared helpers used by the scripts in the topic folders (scraping, chat, flight assistant)
+
+#Settings in these modules are read from the environment when they are imported,
+#so the env file has to be loaded before any of them. Values already set in the
+#process environment win, so importing the package never changes a host's settings.
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
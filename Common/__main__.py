@@ -0,0 +1,51 @@
+import os
+import sys
+import importlib
+
+#One launcher for every script in the repo. Only the module behind the chosen
+#command is imported, so `python -m Common` itself starts instantly.
+#
+#  python -m Common summarize https://example.com --provider ollama
+#  python -m Common flightai
+#
+#Every command is also runnable on its own, e.g. python -m WebScraping.summarizer URL
+
+ENTRY_POINTS = {
+    "summarize": ("WebScraping.summarizer", "Summarize a website on any backend"),
+    "summarize-openai": ("WebScraping.openai_summarize", "Summarize a website with OpenAI"),
+    "summarize-ollama": ("WebScraping.ollama_summarize", "Summarize a website with a local Ollama model"),
+    "batch": ("WebScraping.batch_summarize", "Summarize a file of URLs into resumable JSONL"),
+    "brochure": ("WebScraping.openai_website_brochure", "Write a company brochure from its website"),
+    "ingest": ("WebScraping.site_ingest", "Crawl whole sites politely into resumable JSONL"),
+    "brochure-ui": ("Gradio.web_scraping_ui_gradio", "Gradio app streaming brochures"),
+    "chatbot": ("ContextWindow.openai_chatbot", "StrideBot shoe store assistant (Gradio)"),
+    "debate": ("ContextWindow.multiple_llms_chat", "GPT and Claude arguing for a few rounds"),
+    "flight": ("FlightAssistantUsingTools.openai_flight_assistant", "FlightAI text assistant (Gradio)"),
+    "flightai": ("FlightAssistantUsingTools.openai_flightai_multi_modal", "FlightAI with booking and images (Gradio)"),
+    "image-prewarm": ("FlightAssistantUsingTools.image_cache", "Draw destination images for every city"),
+}
+
+
+def usage():
+    lines = ["usage: python -m Common <command> [args...]", "", "commands:"]
+    lines += [f"  {name:<18}{description}" for name, (_, description) in ENTRY_POINTS.items()]
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] not in ENTRY_POINTS:
+        asked = bool(argv) and argv[0] in ("-h", "--help")
+        print(usage(), file=sys.stdout if asked else sys.stderr)
+        return 0 if asked else 2
+    module_name = ENTRY_POINTS[argv[0]][0]
+    #The scripts import each other as packages from the repo root
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if root not in sys.path:
+        sys.path.insert(0, root)
+    sys.argv = [f"python -m Common {argv[0]}"] + argv[1:]
+    return importlib.import_module(module_name).main()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+#Token counting, budget-sized chunking and parallel map-reduce summarization for
+#page text that is too long to send in one request
+
+#Fallback when tiktoken is missing or cannot load its encoding (offline machines)
+CHARS_PER_TOKEN = 4
+
+#Per-model chunk size (tokens of page text per request) and parallel requests
+MODEL_BUDGETS = {
+    "gpt-4o-mini": {"chunk_tokens": 12_000, "parallelism": 8},
+    "gpt-4o": {"chunk_tokens": 12_000, "parallelism": 4},
+    "gemma3:4b": {"chunk_tokens": 3_000, "parallelism": 2},
+}
+DEFAULT_BUDGET = {
+    "chunk_tokens": int(os.getenv("CHUNK_TOKENS", "4000")),
+    "parallelism": int(os.getenv("CHUNK_PARALLELISM", "4")),
+}
+
+_encoders = {}
+
+
+def _encoder(model):
+    if model not in _encoders:
+        try:
+            import tiktoken
+            try:
+                _encoders[model] = tiktoken.encoding_for_model(model)
+            except KeyError:
+                _encoders[model] = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            _encoders[model] = None
+    return _encoders[model]
+
+
+def count_tokens(text, model=None):
+    encoder = _encoder(model)
+    if encoder is None:
+        return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+    return len(encoder.encode(text, disallowed_special=()))
+
+
+def set_budget(model, chunk_tokens=None, parallelism=None):
+    budget = dict(budget_for(model))
+    if chunk_tokens is not None:
+        budget["chunk_tokens"] = chunk_tokens
+    if parallelism is not None:
+        budget["parallelism"] = parallelism
+    MODEL_BUDGETS[model] = budget
+
+
+def budget_for(model, chunk_tokens=None, parallelism=None):
+    budget = MODEL_BUDGETS.get(model, DEFAULT_BUDGET)
+    return {
+        "chunk_tokens": chunk_tokens or budget["chunk_tokens"],
+        "parallelism": parallelism or budget["parallelism"],
+    }
+
+
+#Start index of each piece of a line cut into runs of at most limit tokens; starts[i]
+#is where token i begins in the line. A piece ends before a token that starts a new
+#word when there is one in its second half, otherwise mid-word.
+def _cut_points(line, starts, limit):
+    cuts, i, n = [0], 0, len(starts) - 1
+    while i + limit < n:
+        end = i + limit
+        for j in range(end, i + limit // 2, -1):
+            if line[starts[j]].isspace():
+                end = j
+                break
+        #A token that starts inside a multi-byte character shares its offset; cutting
+        #there would move the character's first tokens into the next piece
+        while end > i + 1 and starts[end] == starts[end - 1]:
+            end -= 1
+        cuts.append(end)
+        i = end
+    return [starts[i] for i in cuts] + [len(line)]
+
+
+def _split_long_line(line, max_tokens, model):
+    #A single line over budget is encoded once and cut on word boundaries where it
+    #can be, so space-free (minified) text is still split to fit; one token is left
+    #for the newline it is joined with
+    limit = max(1, max_tokens - 1)
+    encoder = _encoder(model)
+    if encoder is None:
+        #count_tokens estimates by characters here, so cut by characters
+        starts, limit = list(range(len(line) + 1)), limit * CHARS_PER_TOKEN
+    else:
+        _, offsets = encoder.decode_with_offsets(encoder.encode(line, disallowed_special=()))
+        starts = offsets + [len(line)]
+    cuts = _cut_points(line, starts, limit)
+    return [piece for piece in (line[a:b].strip() for a, b in zip(cuts, cuts[1:])) if piece]
+
+
+#Greedy packing of whole lines (the extractor emits one text node per line)
+def split_text(text, max_tokens, model=None):
+    chunks, current, current_tokens = [], [], 0
+    for line in text.split("\n"):
+        tokens = count_tokens(line + "\n", model)
+        parts = [line] if tokens <= max_tokens else _split_long_line(line, max_tokens, model)
+        for part in parts:
+            part_tokens = tokens if len(parts) == 1 else count_tokens(part + "\n", model)
+            if current and current_tokens + part_tokens > max_tokens:
+                chunks.append("\n".join(current))
+                current, current_tokens = [], 0
+            current.append(part)
+            current_tokens += part_tokens
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def fits(text, model, chunk_tokens=None):
+    return count_tokens(text, model) <= budget_for(model, chunk_tokens)["chunk_tokens"]
+
+
+#map_fn(chunk, index, total) -> partial summary, run in parallel and kept in order.
+#reduce_fn(partials) -> final answer. Partials that together still exceed the budget
+#are mapped again before the final reduce.
+def map_reduce(text, model, map_fn, reduce_fn, chunk_tokens=None, parallelism=None):
+    budget = budget_for(model, chunk_tokens, parallelism)
+    chunks = split_text(text, budget["chunk_tokens"], model)
+    previous_tokens = count_tokens(text, model)
+    with ThreadPoolExecutor(max_workers=budget["parallelism"]) as executor:
+        while True:
+            total = len(chunks)
+            partials = list(executor.map(lambda args: map_fn(args[1], args[0], total), enumerate(chunks)))
+            combined = "\n\n".join(partials)
+            combined_tokens = count_tokens(combined, model)
+            #Stop when it fits, or when another round would not make it any shorter
+            if total == 1 or combined_tokens <= budget["chunk_tokens"] or combined_tokens >= previous_tokens:
+                return reduce_fn(partials)
+            chunks = split_text(combined, budget["chunk_tokens"], model)
+            previous_tokens = combined_tokens
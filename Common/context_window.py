@@ -0,0 +1,124 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from .chunking import count_tokens
+from .providers import complete
+
+#Keeps chat requests a constant size however long a session runs: the system prompt
+#and the most recent turns (up to recent_tokens) go out word for word, everything
+#older is folded into a rolling summary. Folding runs on a background thread; until
+#it finishes, the turns waiting to be folded are still sent verbatim, so nothing is lost.
+#
+#  window = ContextWindow(recent_tokens=2000)
+#  messages = window.build(system_prompt, history, message, session_id)
+
+CONTEXT_RECENT_TOKENS = int(os.getenv("CONTEXT_RECENT_TOKENS", "2000"))
+CONTEXT_SUMMARY_WORDS = int(os.getenv("CONTEXT_SUMMARY_WORDS", "200"))
+
+summary_system_prompt = "You maintain a running summary of a conversation between a user and an assistant. \
+Update the summary with the new messages. Keep names, preferences, requirements, decisions and open questions; \
+drop small talk. Reply with the updated summary only."
+
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv("CONTEXT_SUMMARY_WORKERS", "2")), thread_name_prefix="context-summary")
+
+
+def _text(message):
+    content = message.get("content")
+    return content if isinstance(content, str) else str(content or "")
+
+
+class _Session:
+    def __init__(self):
+        self.summary = ""
+        self.summarized = 0  # history[:summarized] is covered by summary
+        self.pending = None
+
+
+class ContextWindow:
+    def __init__(self, recent_tokens=CONTEXT_RECENT_TOKENS, model=None, summary_model=None, summary_provider=None,
+                 summary_words=CONTEXT_SUMMARY_WORDS, max_sessions=10_000):
+        self.recent_tokens = recent_tokens
+        self.model = model
+        self.summary_model = summary_model
+        self.summary_provider = summary_provider
+        self.summary_words = summary_words
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    #Override or pass a different callable to change how turns are folded
+    def summarize(self, summary, messages):
+        transcript = "\n".join(f"{m['role']}: {_text(m)}" for m in messages)
+        user_prompt = f"Current summary:\n{summary or '(empty)'}\n\nNew messages:\n{transcript}\n\n"
+        user_prompt += f"Keep the summary under {self.summary_words} words."
+        return complete(
+            [{"role": "system", "content": summary_system_prompt}, {"role": "user", "content": user_prompt}],
+            self.summary_model, self.summary_provider,
+        )
+
+    def _session(self, session_id, history):
+        with self._lock:
+            session = self._sessions.get(session_id)
+            #A shorter history means the conversation was cleared or edited
+            if session is None or len(history) < session.summarized:
+                session = _Session()
+                self._sessions[session_id] = session
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return session
+
+    #Index where the verbatim tail starts; only the tail is counted, so the cost per
+    #turn does not grow with the session. The newest message is always kept verbatim,
+    #even when it alone is over recent_tokens.
+    def _cut(self, history):
+        used = 0
+        for i in range(len(history) - 1, -1, -1):
+            used += count_tokens(_text(history[i]), self.model) + 4
+            if used > self.recent_tokens:
+                return min(i + 1, len(history) - 1)
+        return 0
+
+    def _fold(self, session, history, cut):
+        with self._lock:
+            start, summary = session.summarized, session.summary
+        older = [{"role": m["role"], "content": _text(m)} for m in history[start:cut]]
+
+        def run():
+            new_summary = self.summarize(summary, older)
+            with self._lock:
+                if session.summarized == start:
+                    session.summary = new_summary
+                    session.summarized = cut
+
+        session.pending = _executor.submit(run)
+
+    def build(self, system_prompt, history, message=None, session_id="default", wait=False):
+        history = [{"role": m["role"], "content": m["content"]} for m in history]
+        if message is not None:
+            history.append({"role": "user", "content": message})
+        session = self._session(session_id, history)
+        cut = self._cut(history)
+        folding = session.pending is not None and not session.pending.done()
+        if cut > session.summarized and not folding:
+            self._fold(session, history, cut)
+        if wait and session.pending is not None:
+            session.pending.result()
+        #The fold can finish at any moment; summary and cut must come from the same state
+        with self._lock:
+            summary, summarized = session.summary, session.summarized
+        messages = [{"role": "system", "content": system_prompt}]
+        if summary:
+            messages.append({"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"})
+        return messages + history[summarized:]
+
+    def stats(self, session_id="default"):
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return {}
+            summary, summarized = session.summary, session.summarized
+        return {"summarized_messages": summarized, "summary_tokens": count_tokens(summary, self.model),
+                "folding": session.pending is not None and not session.pending.done()}
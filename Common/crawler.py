@@ -0,0 +1,282 @@
+import os
+import gzip
+import heapq
+import asyncio
+import weakref
+import itertools
+import urllib.robotparser
+import xml.etree.ElementTree as ET
+
+from .extract import extract
+from .fetcher import fetch_page
+from .links import _excluded, _join, _key, _score, _site, _split, site_key
+from .rate_limit import retry_after
+from .telemetry import registry, span
+
+#Whole-site crawling that stays polite however many sites run at once. Every host
+#gets its own small concurrency limit and a minimum spacing between requests
+#(robots.txt Crawl-delay wins when it asks for more, a 429/503 Retry-After pushes
+#the next request out); what the host's robots.txt disallows is never fetched. The
+#frontier starts from the seeds (e.g. the pages get_links picked), the landing
+#page and the sitemap, and grows breadth first, best scored links first, up to
+#max_depth links away from the start and max_pages pages per site.
+#
+#  crawler = Crawler()
+#  pages = asyncio.run(crawler.crawl_site("https://example.com"))
+#  async for site in crawler.crawl_sites(urls): ...
+
+ROBOTS_AGENT = os.getenv("CRAWL_ROBOTS_AGENT", "AIBrochureBot")
+USER_AGENT = f"Mozilla/5.0 (compatible; {ROBOTS_AGENT}/1.0)"
+#Requests in flight per host and seconds between two requests to it
+HOST_CONCURRENCY = int(os.getenv("CRAWL_HOST_CONCURRENCY", "2"))
+HOST_DELAY = float(os.getenv("CRAWL_HOST_DELAY", "1.0"))
+#Cap on Crawl-delay / Retry-After, so one host cannot stall a site for an hour
+MAX_DELAY = float(os.getenv("CRAWL_MAX_DELAY", "30"))
+MAX_PAGES = int(os.getenv("CRAWL_MAX_PAGES", "50"))
+MAX_DEPTH = int(os.getenv("CRAWL_MAX_DEPTH", "3"))
+#Page requests in flight over all hosts, and sites crawled at the same time
+CONCURRENCY = int(os.getenv("CRAWL_CONCURRENCY", "64"))
+SITE_CONCURRENCY = int(os.getenv("CRAWL_SITE_CONCURRENCY", "16"))
+SITEMAP_URLS = int(os.getenv("CRAWL_SITEMAP_URLS", "1000"))
+SITEMAP_FILES = 5
+RETRIES = 2
+HTML_TYPES = ("text/html", "application/xhtml+xml")
+SITEMAP_NS = "{http://www.sitemaps.org/schemas/sitemap/0.9}"
+
+
+#Politeness state of one scheme://host:port; its robots.txt is loaded once, by
+#whichever request gets there first
+class Host:
+    def __init__(self, scheme, netloc, concurrency, delay):
+        self.key = (scheme, netloc)
+        self.origin = f"{scheme}://{netloc}"
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.delay = delay
+        self.next_slot = 0.0
+        self.robots = None
+        self._robots_lock = asyncio.Lock()
+
+    #Waits until this host may get its next request. The slot is only taken once the
+    #request really goes out, so a busy loop waking one waiter late cannot squeeze
+    #the next request closer to it.
+    async def turn(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            now = loop.time()
+            if now >= self.next_slot:
+                self.next_slot = now + self.delay
+                return
+            await asyncio.sleep(self.next_slot - now)
+
+    def back_off(self, seconds):
+        loop = asyncio.get_running_loop()
+        self.next_slot = max(self.next_slot, loop.time() + min(seconds if seconds is not None else self.delay * 4, MAX_DELAY))
+
+    def allowed(self, url):
+        return self.robots is None or self.robots.can_fetch(ROBOTS_AGENT, url)
+
+
+class Crawler:
+    def __init__(self, max_pages=MAX_PAGES, max_depth=MAX_DEPTH, host_concurrency=HOST_CONCURRENCY,
+                 host_delay=HOST_DELAY, concurrency=CONCURRENCY, use_sitemap=True, respect_robots=True):
+        self.max_pages = max_pages
+        self.max_depth = max_depth
+        self.host_concurrency = host_concurrency
+        self.host_delay = host_delay
+        self.concurrency = concurrency
+        self.use_sitemap = use_sitemap
+        self.respect_robots = respect_robots
+        self.headers = {"User-Agent": USER_AGENT}
+        #Event loop -> (hosts, global request limit); robots.txt outlives the loop
+        self._loops = weakref.WeakKeyDictionary()
+        self._robots = {}
+        self.stats = {"pages": 0, "errors": 0, "disallowed": 0, "retries": 0, "skipped": 0, "sitemap_urls": 0}
+
+    #Semaphores and locks belong to the event loop they were created on, so every loop
+    #(e.g. each asyncio.run of get_site_details) gets its own hosts and global limit
+    def _state(self):
+        loop = asyncio.get_running_loop()
+        state = self._loops.get(loop)
+        if state is None:
+            state = self._loops[loop] = ({}, asyncio.Semaphore(self.concurrency))
+        return state
+
+    def _host(self, scheme, netloc):
+        hosts = self._state()[0]
+        origin = (scheme, netloc)
+        host = hosts.get(origin)
+        if host is None:
+            host = hosts[origin] = Host(scheme, netloc, self.host_concurrency, self.host_delay)
+            if origin in self._robots:
+                host.robots, host.delay = self._robots[origin]
+        return host
+
+    async def _get(self, host, url):
+        slots = self._state()[1]
+        for attempt in range(RETRIES + 1):
+            async with slots, host.semaphore:
+                await host.turn()
+                with span("crawl_fetch", url=url):
+                    response = await fetch_page(url, headers=self.headers)
+            registry.inc("crawl_requests_total", status=str(response.status_code))
+            if response.status_code not in (429, 503) or attempt == RETRIES:
+                return response
+            self.stats["retries"] += 1
+            host.back_off(retry_after(response.headers))
+        return response
+
+    #RFC 9309: a missing robots.txt (4xx) allows everything, an unreachable one
+    #(5xx, network error) is read as disallowing everything for now
+    async def _load_robots(self, host):
+        async with host._robots_lock:
+            if host.robots is not None or not self.respect_robots:
+                return host.robots
+            robots = urllib.robotparser.RobotFileParser(f"{host.origin}/robots.txt")
+            try:
+                response = await self._get(host, robots.url)
+                if response.status_code >= 500:
+                    robots.disallow_all = True
+                elif response.status_code >= 400:
+                    robots.allow_all = True
+                else:
+                    robots.parse(response.text.splitlines())
+            except Exception:
+                robots.disallow_all = True
+            delay = robots.crawl_delay(ROBOTS_AGENT)
+            if delay:
+                host.delay = max(host.delay, min(float(delay), MAX_DELAY))
+            host.robots = robots
+            self._robots[host.key] = (robots, host.delay)
+            return robots
+
+    #Page URLs listed in the sitemaps robots.txt names (or /sitemap.xml), following
+    #sitemap indexes for a few files
+    async def sitemap_urls(self, host):
+        robots = await self._load_robots(host)
+        pending = list((robots.site_maps() if robots else None) or [f"{host.origin}/sitemap.xml"])
+        urls, files = [], 0
+        while pending and files < SITEMAP_FILES and len(urls) < SITEMAP_URLS:
+            sitemap = pending.pop(0)
+            files += 1
+            try:
+                response = await self._get(host, sitemap)
+                if response.status_code != 200:
+                    continue
+                body = response.content
+                if body[:2] == b"\x1f\x8b":
+                    body = gzip.decompress(body)
+                root = ET.fromstring(body)
+            except Exception:
+                continue
+            locs = [loc.text.strip() for loc in root.iter(f"{SITEMAP_NS}loc") if loc.text]
+            if root.tag == f"{SITEMAP_NS}sitemapindex":
+                pending.extend(locs)
+            else:
+                urls.extend(locs[:SITEMAP_URLS - len(urls)])
+        self.stats["sitemap_urls"] += len(urls)
+        return urls
+
+    async def _fetch(self, parts):
+        host = self._host(parts[0], parts[1])
+        url = _join(parts)
+        await self._load_robots(host)
+        if not host.allowed(url):
+            self.stats["disallowed"] += 1
+            return None
+        response = await self._get(host, url)
+        content_type = response.headers.get("content-type", "text/html").split(";")[0].strip().lower()
+        if response.status_code != 200 or content_type not in HTML_TYPES:
+            self.stats["skipped"] += 1
+            return None
+        page = await asyncio.to_thread(extract, response.content, charset=response.charset_encoding)
+        self.stats["pages"] += 1
+        #Redirects count as the page they ended on
+        return dict(page, url=str(response.url))
+
+    #Pages of the site at url as {url, title, text, links, depth}, in the order they
+    #finished. seeds are crawled first (depth 1), start_page is an already fetched
+    #landing page that is then not downloaded again.
+    async def crawl_site(self, url, seeds=(), start_page=None, max_pages=None):
+        max_pages = self.max_pages if max_pages is None else max_pages
+        start = _split(url)
+        if start is None:
+            return []
+        site, home = site_key(url), _site(start[1])
+        visited, frontier, pages = set(), [], []
+        order = itertools.count()
+
+        def add(href, depth, base=start):
+            parts = _split(href, base)
+            if parts is None or depth > self.max_depth or _site(parts[1]) != home or _excluded(parts[2]):
+                return
+            if site_key(_join(parts)) != site:
+                return
+            key = _key(parts)
+            if key not in visited:
+                visited.add(key)
+                heapq.heappush(frontier, (depth, -_score(parts), next(order), parts))
+
+        def expand(page, depth):
+            base = _split(page["url"]) or start
+            for href in page["links"]:
+                add(href, depth + 1, base)
+
+        with span("crawl_site", url=url) as current:
+            visited.add(_key(start))
+            if start_page is not None:
+                page = dict(start_page, url=start_page.get("url") or url, depth=0)
+                pages.append(page)
+                expand(page, 0)
+            else:
+                heapq.heappush(frontier, (0, 0.0, next(order), start))
+            for seed in seeds:
+                add(seed, 1)
+            if self.use_sitemap:
+                for found in await self.sitemap_urls(self._host(start[0], start[1])):
+                    add(found, 1)
+
+            running = {}
+            while (frontier or running) and len(pages) < max_pages:
+                #Only as many requests as could still become pages are started
+                while frontier and len(running) < min(self.host_concurrency * 2, max_pages - len(pages)):
+                    depth, _, _, parts = heapq.heappop(frontier)
+                    running[asyncio.ensure_future(self._fetch(parts))] = depth
+                done, _ = await asyncio.wait(list(running), return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    depth = running.pop(task)
+                    try:
+                        page = task.result()
+                    except Exception:
+                        self.stats["errors"] += 1
+                        continue
+                    if page is None or len(pages) >= max_pages:
+                        continue
+                    page["depth"] = depth
+                    pages.append(page)
+                    expand(page, depth)
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+            current.set(pages=len(pages), frontier=len(frontier))
+        return pages
+
+    #Crawls many sites at once and yields (url, pages or exception) as each finishes.
+    #Sites are independent; per-host limits keep any one of them from being hammered.
+    async def crawl_sites(self, urls, max_sites=SITE_CONCURRENCY):
+        semaphore = asyncio.Semaphore(max_sites)
+
+        async def one(site_url):
+            async with semaphore:
+                try:
+                    return site_url, await self.crawl_site(site_url)
+                except Exception as e:
+                    return site_url, e
+
+        tasks = [asyncio.ensure_future(one(site_url)) for site_url in urls]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield await finished
+        finally:
+            for task in tasks:
+                task.cancel()
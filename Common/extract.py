@@ -0,0 +1,193 @@
+import os
+import re
+import codecs
+from html.parser import HTMLParser
+
+#Pluggable HTML -> {title, text, links} extraction. "stream" parses in a single
+#pass without building a tree and accepts the page as an iterable of byte chunks,
+#"soup" is the original BeautifulSoup path kept for comparison.
+
+EXTRACT_ENGINE = os.getenv("EXTRACT_ENGINE", "stream")
+IGNORED_TAGS = ("script", "style", "img", "input")
+#img and input never have content, so only script and style open a skipped region
+SKIPPED_CONTENT = frozenset(("script", "style"))
+NO_TITLE = "No title found"
+
+_META_CHARSET = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?\s*([a-zA-Z0-9_\-:.]+)""", re.I)
+
+
+def _lookup(name):
+    try:
+        return codecs.lookup(name).name
+    except LookupError:
+        return None
+
+
+#Same order as browsers: byte order mark, then the HTTP Content-Type charset, then
+#<meta charset>. An undeclared page that is not valid UTF-8 is read as windows-1252,
+#which is what BeautifulSoup falls back to for old Latin-1 sites.
+def sniff_encoding(head, charset=None):
+    if head.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+    declared = _lookup(charset) if charset else None
+    if declared:
+        return declared
+    match = _META_CHARSET.search(head[:4096])
+    if match:
+        declared = _lookup(match.group(1).decode("ascii"))
+        if declared:
+            return declared
+    try:
+        #Incremental, so a character cut off at the end of head is not an error
+        codecs.getincrementaldecoder("utf-8")().decode(head)
+    except UnicodeDecodeError:
+        return "cp1252"
+    return "utf-8"
+
+
+def _chunks(source):
+    if isinstance(source, (bytes, bytearray, memoryview, str)):
+        yield source
+    else:
+        yield from source
+
+
+class _StreamExtractor(HTMLParser):
+    #Text is buffered per text node so get_text(strip=True) semantics survive chunk boundaries
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = None
+        self.saw_title = False
+        self.text = []
+        self.links = []
+        self._title_parts = None
+        self._in_body = False
+        self._skip_depth = 0
+        self._pending = []
+
+    def _flush(self):
+        if not self._pending:
+            return
+        data = "".join(self._pending)
+        self._pending.clear()
+        if self._title_parts is not None:
+            self._title_parts.append(data)
+        if self._in_body and not self._skip_depth:
+            data = data.strip()
+            if data:
+                self.text.append(data)
+
+    def handle_starttag(self, tag, attrs):
+        self._flush()
+        if tag == "a":
+            for name, value in attrs:
+                if name == "href":
+                    if value:
+                        self.links.append(value)
+                    break
+        elif tag == "title" and not self.saw_title:
+            self.saw_title = True
+            self._title_parts = []
+        elif tag == "body":
+            self._in_body = True
+        elif tag in SKIPPED_CONTENT:
+            self._skip_depth += 1
+
+    def handle_startendtag(self, tag, attrs):
+        #<a href=.../> still counts as a link; void tags carry no text
+        if tag == "a":
+            self.handle_starttag(tag, attrs)
+        else:
+            self._flush()
+
+    def handle_endtag(self, tag):
+        self._flush()
+        if tag == "title" and self._title_parts is not None:
+            self.title = "".join(self._title_parts) or None
+            self._title_parts = None
+        elif tag == "body":
+            self._in_body = False
+        elif tag in SKIPPED_CONTENT and self._skip_depth:
+            self._skip_depth -= 1
+
+    def handle_data(self, data):
+        self._pending.append(data)
+
+    def handle_comment(self, data):
+        self._flush()
+
+    def close(self):
+        super().close()
+        self._flush()
+        if self._title_parts is not None:
+            self.title = "".join(self._title_parts) or None
+            self._title_parts = None
+
+
+#charset is the one from the response's Content-Type header, if any
+def extract_stream(source, charset=None):
+    parser = _StreamExtractor()
+    decoder = None
+    #The first few KB are held back until the charset can be sniffed from them
+    head = b""
+    for chunk in _chunks(source):
+        if isinstance(chunk, str):
+            parser.feed(chunk)
+            continue
+        if decoder is None:
+            head += chunk
+            if len(head) < 4096:
+                continue
+            decoder = codecs.getincrementaldecoder(sniff_encoding(head, charset))(errors="replace")
+            chunk, head = head, b""
+        parser.feed(decoder.decode(chunk))
+    if decoder is None and head:
+        decoder = codecs.getincrementaldecoder(sniff_encoding(head, charset))(errors="replace")
+        parser.feed(decoder.decode(head))
+    if decoder is not None:
+        parser.feed(decoder.decode(b"", final=True))
+    parser.close()
+    return {
+        "title": parser.title if parser.saw_title else NO_TITLE,
+        "text": "\n".join(parser.text),
+        "links": parser.links,
+    }
+
+
+def extract_soup(source, charset=None):
+    from bs4 import BeautifulSoup
+
+    if not isinstance(source, (bytes, bytearray, str)):
+        source = b"".join(_chunks(source))
+    #from_encoding only applies to bytes; BeautifulSoup still prefers a BOM
+    kwargs = {"from_encoding": charset} if charset and not isinstance(source, str) else {}
+    soup = BeautifulSoup(source, "html.parser", **kwargs)
+    title = soup.title.string if soup.title else NO_TITLE
+    if soup.body:
+        for irrelevant in soup.body(list(IGNORED_TAGS)):
+            irrelevant.decompose()
+        text = soup.body.get_text(separator="\n", strip=True)
+    else:
+        text = ""
+    links = [link.get("href") for link in soup.find_all("a")]
+    return {
+        "title": None if title is None else str(title),
+        "text": text,
+        "links": [link for link in links if link],
+    }
+
+
+ENGINES = {"stream": extract_stream, "soup": extract_soup}
+
+
+#fn(source, charset) -> {title, text, links}
+def register_engine(name, fn):
+    ENGINES[name] = fn
+
+
+#source: page bytes/str or an iterable of byte chunks straight off the socket;
+#charset: the response's Content-Type charset (httpx's response.charset_encoding)
+def extract(source, engine=None, charset=None):
+    return ENGINES[engine or EXTRACT_ENGINE](source, charset)
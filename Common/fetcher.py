@@ -0,0 +1,124 @@
+import os
+import asyncio
+import contextlib
+import threading
+import weakref
+import httpx
+
+#One pooled HTTP client per process so repeated pages from the same host reuse
+#the keep-alive connection instead of paying DNS + TCP + TLS on every request
+
+DEFAULT_HEADERS = {
+ "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/117.0.0.0 Safari/537.36"
+}
+
+#Timeouts in seconds, overridable from the env file
+CONNECT_TIMEOUT = float(os.getenv("FETCH_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("FETCH_READ_TIMEOUT", "20"))
+MAX_CONNECTIONS = int(os.getenv("FETCH_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE_PER_HOST = int(os.getenv("FETCH_MAX_KEEPALIVE", "20"))
+
+_settings = {
+    "timeout": httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+    "limits": httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_KEEPALIVE_PER_HOST),
+}
+
+_lock = threading.Lock()
+_client = None
+#AsyncClient is bound to the event loop it was first used on, so keep one per loop
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def configure(timeout=None, connect_timeout=None, max_connections=None, max_keepalive=None):
+    """Change timeouts / pool sizes; clients created afterwards pick up the new values."""
+    global _client
+    if timeout is not None or connect_timeout is not None:
+        current = _settings["timeout"]
+        _settings["timeout"] = httpx.Timeout(
+            timeout if timeout is not None else current.read,
+            connect=connect_timeout if connect_timeout is not None else current.connect,
+        )
+    if max_connections is not None or max_keepalive is not None:
+        current = _settings["limits"]
+        _settings["limits"] = httpx.Limits(
+            max_connections=max_connections if max_connections is not None else current.max_connections,
+            max_keepalive_connections=max_keepalive if max_keepalive is not None else current.max_keepalive_connections,
+        )
+    with _lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+    #An async client can only be closed on its own loop, so the close is handed to it;
+    #one whose loop is already closed has nothing left to hand it to
+    for loop, client in list(_async_clients.items()):
+        if not loop.is_closed():
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+    _async_clients.clear()
+
+
+def _client_kwargs():
+    return dict(
+        headers=DEFAULT_HEADERS,
+        timeout=_settings["timeout"],
+        limits=_settings["limits"],
+        follow_redirects=True,
+    )
+
+
+def get_client():
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = httpx.Client(**_client_kwargs())
+    return _client
+
+
+def get_async_client():
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(**_client_kwargs())
+        _async_clients[loop] = client
+    return client
+
+
+def fetch_page_sync(url, headers=None, timeout=None):
+    kwargs = {"headers": headers} if headers else {}
+    if timeout is not None:
+        kwargs["timeout"] = timeout
+    return get_client().get(url, **kwargs)
+
+
+async def fetch_page(url, headers=None, timeout=None):
+    kwargs = {"headers": headers} if headers else {}
+    if timeout is not None:
+        kwargs["timeout"] = timeout
+    return await get_async_client().get(url, **kwargs)
+
+
+#Streaming variants hand the body over chunk by chunk instead of buffering the whole page
+@contextlib.contextmanager
+def stream_page_sync(url, headers=None):
+    with get_client().stream("GET", url, headers=headers) as response:
+        yield response
+
+
+@contextlib.asynccontextmanager
+async def stream_page(url, headers=None):
+    async with get_async_client().stream("GET", url, headers=headers) as response:
+        yield response
+
+
+def close():
+    global _client
+    with _lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+async def aclose():
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
@@ -0,0 +1,96 @@
+import json
+
+#Incremental parsing of JSON that arrives in pieces, e.g. a json_object completion
+#being streamed. Items of one array in the top-level object are handed out as soon
+#as each one is complete, long before the document is:
+#
+#  parser = JsonArrayStream("links")
+#  for text in stream:
+#      for link in parser.feed(text):
+#          ...                         # {"type": ..., "url": ...}
+#
+#Object, array and string items are supported (numbers and literals are skipped).
+#Text around the document, such as a ```json fence, is ignored; the document
+#itself is not validated, json.loads on the full text still decides that.
+
+
+class JsonArrayStream:
+    def __init__(self, key):
+        self.key = key
+        self._buffer = ""
+        self._offset = 0  # position of _buffer[0] in the whole stream
+        self._pos = 0  # next position to scan
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._string_start = None
+        self._last_string = None  # last complete string at depth 1, the key once ':' follows
+        self._current_key = None
+        self._in_array = False
+        self._item_start = None
+        self.items = 0
+
+    def feed(self, text):
+        self._buffer += text
+        found = []
+        buffer, offset = self._buffer, self._offset
+        for i in range(self._pos - offset, len(buffer)):
+            char = buffer[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    self._close_string(buffer, i, found)
+                continue
+            if char == '"':
+                self._in_string = True
+                self._string_start = i
+                if self._in_array and self._depth == 2 and self._item_start is None:
+                    self._item_start = i
+            elif char in "{[":
+                if self._in_array and self._depth == 2:
+                    self._item_start = i
+                elif char == "[" and self._depth == 1 and self._current_key == self.key:
+                    self._in_array = True
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._in_array and self._depth == 2 and self._item_start is not None:
+                    self._emit(buffer[self._item_start:i + 1], found)
+                elif self._in_array and self._depth == 1:
+                    self._in_array = False
+            elif char == ":" and self._depth == 1:
+                self._current_key = self._last_string
+            elif char == "," and self._depth == 1:
+                self._current_key = None
+        self._pos = offset + len(buffer)
+        self._trim()
+        return found
+
+    def _close_string(self, buffer, end, found):
+        if self._depth == 1:
+            self._last_string = json.loads(buffer[self._string_start:end + 1])
+        elif self._in_array and self._depth == 2 and self._item_start == self._string_start:
+            self._emit(buffer[self._item_start:end + 1], found)
+
+    def _emit(self, text, found):
+        self._item_start = None
+        try:
+            found.append(json.loads(text))
+            self.items += 1
+        except ValueError:
+            pass
+
+    #Only the unfinished item (or string) has to be kept
+    def _trim(self):
+        keep = self._item_start if self._item_start is not None else self._string_start if self._in_string else len(self._buffer)
+        if keep:
+            self._buffer = self._buffer[keep:]
+            self._offset += keep
+            if self._item_start is not None:
+                self._item_start -= keep
+            if self._string_start is not None:
+                self._string_start -= keep if self._in_string else 0
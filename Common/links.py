@@ -0,0 +1,274 @@
+import os
+import re
+import json
+import time
+import heapq
+import threading
+from functools import lru_cache
+from urllib.parse import urljoin, urlsplit, urlunsplit, parse_qsl, urlencode
+
+from .storage import cache_path, connect
+
+#Link processing for pages whose links go to a model: raw hrefs are resolved
+#against the page URL, normalized, de-duplicated and filtered (other sites,
+#mailto/tel/javascript, legal pages, files), then ranked by a cheap local score
+#so only the most promising few reach the prompt.
+#
+#  candidates = rank_links(page_url, raw_hrefs, top_k=30)
+
+LINK_TOP_K = int(os.getenv("LINK_TOP_K", "30"))
+LINK_CACHE_TTL = float(os.getenv("LINK_CACHE_TTL", str(24 * 3600)))
+
+#Query parameters that only track the visitor and never change the page
+TRACKING_PARAMS = re.compile(r"^(utm_\w+|gclid|fbclid|msclkid|mc_cid|mc_eid|ref|ref_src|_ga|_hs\w+)$", re.I)
+#Pages a company brochure never needs
+EXCLUDED_PATHS = re.compile(
+    r"(^|[/_.-])(privacy|terms|tos|legal|cookies?|gdpr|imprint|impressum|disclaimer|login|log-in|signin|sign-in|"
+    r"signup|sign-up|register|logout|account|cart|checkout|password|unsubscribe|cdn-cgi|wp-admin|wp-json|feed|rss)([/_.-]|$)",
+    re.I,
+)
+EXCLUDED_EXTENSIONS = (
+    ".pdf", ".jpg", ".jpeg", ".png", ".gif", ".svg", ".webp", ".ico", ".css", ".js", ".json", ".xml",
+    ".zip", ".gz", ".tar", ".dmg", ".exe", ".mp3", ".mp4", ".mov", ".avi", ".woff", ".woff2", ".ttf",
+)
+#Path words that usually mark a page worth reading for a brochure, with their weight
+KEYWORDS = {
+    "about": 10, "about-us": 10, "company": 8, "who-we-are": 8, "our-story": 8, "story": 4, "mission": 6,
+    "values": 5, "culture": 6, "careers": 9, "career": 9, "jobs": 8, "join": 5, "hiring": 5, "team": 6,
+    "people": 4, "leadership": 6, "founders": 5, "customers": 5, "case-studies": 5, "stories": 3,
+    "products": 4, "product": 4, "solutions": 3, "platform": 3, "enterprise": 3, "pricing": 3,
+    "investors": 5, "press": 3, "news": 2, "newsroom": 3, "blog": 1, "contact": 2,
+}
+WORD = re.compile(r"[a-z0-9]+(?:-[a-z0-9]+)*")
+#Second-level labels under which companies register (example.co.uk, example.com.au)
+SECOND_LEVEL = {"co", "com", "org", "net", "ac", "gov", "edu", "ne", "or"}
+
+
+#(scheme, netloc, path, query) of href resolved against base (itself such a tuple),
+#lower-cased, without default port, fragment or tracking parameters; None for links
+#that are not pages (fragments, mailto:, tel:, javascript:, data: ...)
+def _split(href, base=None):
+    href = (href or "").strip()
+    if not href or href[0] == "#":
+        return None
+    #Root-relative links are most of a page; they skip urljoin/urlsplit
+    if base is not None and href[0] == "/" and not href.startswith("//") and "/." not in href:
+        scheme, netloc = base[0], base[1]
+        path, _, query = href.split("#", 1)[0].partition("?")
+    else:
+        absolute = href[:8].lower().startswith(("http://", "https://"))
+        url = urljoin(_join(base), href) if base and not absolute else href
+        try:
+            parts = urlsplit(url)
+            port = parts.port
+        except ValueError:
+            return None
+        scheme = parts.scheme.lower()
+        if scheme not in ("http", "https") or not parts.hostname:
+            return None
+        netloc = parts.hostname.rstrip(".")
+        if port and (scheme, port) not in (("http", 80), ("https", 443)):
+            netloc = f"{netloc}:{port}"
+        path, query = parts.path, parts.query
+    if query:
+        query = urlencode([(k, v) for k, v in parse_qsl(query, keep_blank_values=True) if not TRACKING_PARAMS.match(k)])
+    if "//" in path:
+        path = re.sub(r"/{2,}", "/", path)
+    return scheme, netloc, path or "/", query
+
+
+def _join(parts):
+    return urlunsplit(parts + ("",))
+
+
+#Absolute, normalized http(s) URL for href on the page at base, or None
+def normalize_url(href, base=None):
+    parts = _split(href, _split(base) if base else None)
+    return _join(parts) if parts else None
+
+
+#Key two URLs share when they are the same page (www. and a trailing slash ignored)
+def _key(parts):
+    host = parts[1][4:] if parts[1].startswith("www.") else parts[1]
+    key = host + (parts[2].rstrip("/") or "/")
+    return f"{key}?{parts[3]}" if parts[3] else key
+
+
+def url_key(url):
+    parts = _split(url)
+    return _key(parts) if parts else url
+
+
+#Registrable domain, close enough without a public suffix list: example.com for
+#www.example.com and jobs.example.com, example.co.uk for shop.example.co.uk
+@lru_cache(maxsize=4096)
+def _site(netloc):
+    host = netloc.rsplit(":", 1)[0] if netloc.count(":") == 1 else netloc
+    labels = host.split(".")
+    if len(labels) <= 2 or re.fullmatch(r"[\d.]+", host):
+        return host
+    if len(labels[-1]) == 2 and labels[-2] in SECOND_LEVEL:
+        return ".".join(labels[-3:])
+    return ".".join(labels[-2:])
+
+
+def site_of(url):
+    parts = _split(url)
+    return _site(parts[1]) if parts else ""
+
+
+#Site plus a non-default port, so two servers on one host are two sites
+def site_key(url):
+    parts = _split(url)
+    if parts is None:
+        return url
+    site = _site(parts[1])
+    return f"{site}:{parts[1].rsplit(':', 1)[1]}" if ":" in parts[1] else site
+
+
+def _excluded(path):
+    path = path.lower()
+    return bool(EXCLUDED_PATHS.search(path)) or path.endswith(EXCLUDED_EXTENSIONS)
+
+
+def is_excluded(url):
+    parts = _split(url)
+    return parts is None or _excluded(parts[2])
+
+
+def _score(parts):
+    segments = [s for s in parts[2].lower().split("/") if s]
+    score = 0
+    for depth, segment in enumerate(segments):
+        weight = KEYWORDS.get(segment, 0)
+        if not weight:
+            weight = max((KEYWORDS.get(word, 0) for word in WORD.findall(segment)), default=0) * 0.8
+        #A keyword near the root ("/about") beats the same word deep down ("/blog/2021/about")
+        score += weight / (1 + depth)
+    #careers.example.com, jobs.example.com
+    label = parts[1].split(".")[0]
+    score += KEYWORDS.get(label, 0) if label != "www" else 0
+    if parts[3]:
+        score -= 2
+    return score - 0.5 * max(len(segments) - 1, 0)
+
+
+def score_link(url):
+    parts = _split(url)
+    return _score(parts) if parts else 0.0
+
+
+#Same-site page links of the page at base_url, best first. Links with no keyword
+#still fill the remaining slots, shallowest first, so an unusual "/enterprise"
+#page can be picked by the model too. top_k=0 keeps every candidate.
+def rank_links(base_url, hrefs, top_k=LINK_TOP_K):
+    base = _split(base_url)
+    if base is None:
+        return []
+    site = _site(base[1])
+    seen = {_key(base)}
+    ranked = []
+    #Pages repeat the same href in nav, body and footer; each is resolved once
+    for order, href in enumerate(dict.fromkeys(hrefs)):
+        parts = _split(href, base)
+        if parts is None or _site(parts[1]) != site or _excluded(parts[2]):
+            continue
+        key = _key(parts)
+        if key in seen:
+            continue
+        seen.add(key)
+        url = _join(parts)
+        ranked.append((-_score(parts), parts[2].count("/"), len(url), order, url))
+    ranked = heapq.nsmallest(top_k, ranked) if top_k else sorted(ranked)
+    return [entry[-1] for entry in ranked]
+
+
+#Checks a model's link answer one entry at a time, so a streamed answer can be acted
+#on entry by entry: accept() returns the entry with its URL normalized, or None for
+#anything that is not a usable page of the same site or repeats an earlier page
+class LinkFilter:
+    def __init__(self, base_url):
+        self.base = _split(base_url)
+        self.site = _site(self.base[1]) if self.base else None
+        self.seen = set()
+
+    def accept(self, link):
+        parts = _split(link.get("url"), self.base) if isinstance(link, dict) and isinstance(link.get("url"), str) else None
+        if parts is None or _site(parts[1]) != self.site or _excluded(parts[2]) or _key(parts) in self.seen:
+            return None
+        self.seen.add(_key(parts))
+        return dict(link, url=_join(parts))
+
+
+def clean_selection(base_url, links):
+    link_filter = LinkFilter(base_url)
+    return [link for link in map(link_filter.accept, links) if link is not None]
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS link_selections (
+    site TEXT NOT NULL,
+    model TEXT NOT NULL,
+    links TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (site, model)
+);
+"""
+
+
+#The model's pick of relevant pages per start page and model. Sites rarely move
+#their About or Careers pages, so a repeat brochure skips the link selection call
+#even when the landing page (and therefore the prompt) changed. The key is the
+#normalized start URL (host and path), not the registrable domain: companies that
+#live under one host (github.com/org-a, huggingface.co/x) must not share picks.
+#site_key stays what groups requests for politeness.
+class LinkSelectionCache:
+    def __init__(self, path=None, ttl=LINK_CACHE_TTL):
+        self.path = path or cache_path("links.sqlite")
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = connect(self.path)
+        self._conn.executescript(_SCHEMA)
+        self.hits = self.misses = 0
+
+    def get(self, url, model):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT links, expires_at FROM link_selections WHERE site = ? AND model = ?", (url_key(url), model or "")
+            ).fetchone()
+            if row is None or row[1] <= now:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, url, model, selection, ttl=None):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO link_selections VALUES (?, ?, ?, ?, ?)",
+                (url_key(url), model or "", json.dumps(selection, ensure_ascii=False), now, now + (self.ttl if ttl is None else ttl)),
+            )
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM link_selections")
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / lookups if lookups else 0.0}
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_link_cache():
+    global _default_cache
+    if _default_cache is None:
+        with _default_lock:
+            if _default_cache is None:
+                _default_cache = LinkSelectionCache()
+    return _default_cache
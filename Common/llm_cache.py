@@ -0,0 +1,183 @@
+import os
+import json
+import time
+import hashlib
+import threading
+
+from .storage import cache_path, connect
+
+#Content-addressed cache of chat completions stored in SQLite. The key is a hash of
+#model, messages and response_format, so an identical request never goes back out.
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE", "1") != "0"
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS completions (
+    key TEXT PRIMARY KEY,
+    model TEXT,
+    content TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS completions_accessed_at ON completions (accessed_at);
+"""
+
+
+#validate(content) raising or returning False keeps a completion out of the cache, so
+#e.g. a malformed JSON reply is asked for again instead of served until it expires
+def _valid(content, validate):
+    if validate is None:
+        return True
+    try:
+        return validate(content) is not False
+    except Exception:
+        return False
+
+
+def cache_key(model, messages, response_format=None):
+    payload = json.dumps(
+        {"model": model, "messages": messages, "response_format": response_format},
+        sort_keys=True, ensure_ascii=False, default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    def __init__(self, path=None, ttl=LLM_CACHE_TTL, max_bytes=LLM_CACHE_MAX_BYTES):
+        self.path = path or cache_path("completions.sqlite")
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = connect(self.path)
+        self._conn.executescript(_SCHEMA)
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content, expires_at, size FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+            if row and row[1] <= now:
+                self._conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE completions SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, model, content, ttl=None):
+        now = time.time()
+        size = len(content.encode("utf-8"))
+        with self._lock:
+            #One write transaction, so the size eviction reads includes every process's writes
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO completions VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, model, content, size, now, now + (self.ttl if ttl is None else ttl), now),
+                )
+                self._evict()
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+
+    #call() performs the real request and returns the completion text; an entry that
+    #fails validate is dropped and requested again
+    def cached(self, model, messages, call, response_format=None, ttl=None, validate=None):
+        key = cache_key(model, messages, response_format)
+        content = self.get(key)
+        if content is not None and not _valid(content, validate):
+            self.delete(key)
+            content = None
+        if content is None:
+            content = call()
+            if content is not None and _valid(content, validate):
+                self.put(key, model, content, ttl)
+        return content
+
+    def stats(self):
+        with self._lock:
+            entries, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM completions").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": total,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM completions")
+
+    #Least recently used entries go first. The file is shared by every process using
+    #it, so the size is read from it (inside put's transaction) rather than tracked here.
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()[0]
+        while total > self.max_bytes:
+            victims = self._conn.execute(
+                "SELECT key, size FROM completions ORDER BY accessed_at LIMIT 64"
+            ).fetchall()
+            if not victims:
+                return
+            for key, size in victims:
+                self._conn.execute("DELETE FROM completions WHERE key = ?", (key,))
+                total -= size
+                if total <= self.max_bytes:
+                    return
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_default_cache():
+    global _default_cache
+    if _default_cache is None:
+        with _default_lock:
+            if _default_cache is None:
+                _default_cache = LLMCache()
+    return _default_cache
+
+
+#Used by summarize / get_links / create_brochure; LLM_CACHE=0 always calls the model
+def cached_completion(model, messages, call, response_format=None, ttl=None, validate=None):
+    if not LLM_CACHE_ENABLED:
+        return call()
+    return get_default_cache().cached(model, messages, call, response_format, ttl, validate)
+
+
+#Streaming counterpart of cached_completion: stream() returns an iterator of text
+#deltas. Only a stream that ran to the end and passes validate is stored.
+def cached_stream(model, messages, stream, response_format=None, ttl=None, validate=None):
+    if not LLM_CACHE_ENABLED:
+        yield from stream()
+        return
+    cache = get_default_cache()
+    key = cache_key(model, messages, response_format)
+    content = cache.get(key)
+    if content is not None:
+        if _valid(content, validate):
+            yield content
+            return
+        cache.delete(key)
+    parts = []
+    for text in stream():
+        parts.append(text)
+        yield text
+    content = "".join(parts)
+    if _valid(content, validate):
+        cache.put(key, model, content, ttl)
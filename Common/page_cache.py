@@ -0,0 +1,219 @@
+import os
+import json
+import time
+import asyncio
+import threading
+
+from .fetcher import fetch_page, fetch_page_sync, stream_page_sync
+from .storage import cache_path, connect
+from .telemetry import registry, span
+
+#Disk cache of scraped pages keyed by URL. Stores the raw page and the extracted
+#title/text/links; fresh entries are served without touching the network, stale
+#ones are revalidated with ETag / Last-Modified and a 304 skips re-parsing.
+
+PAGE_CACHE_ENABLED = os.getenv("PAGE_CACHE", "1") != "0"
+PAGE_CACHE_TTL = float(os.getenv("PAGE_CACHE_TTL", "3600"))
+PAGE_CACHE_MAX_BYTES = int(os.getenv("PAGE_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+#Keeping the raw page lets it be re-extracted later; turn off to store only the extraction
+PAGE_CACHE_STORE_BODY = os.getenv("PAGE_CACHE_STORE_BODY", "1") != "0"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    body BLOB,
+    title TEXT,
+    text TEXT,
+    links TEXT,
+    size INTEGER NOT NULL,
+    fetched_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pages_accessed_at ON pages (accessed_at);
+"""
+
+
+class PageCache:
+    def __init__(self, path=None, max_bytes=PAGE_CACHE_MAX_BYTES, ttl=PAGE_CACHE_TTL, store_body=PAGE_CACHE_STORE_BODY):
+        self.path = path or cache_path("pages.sqlite")
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.store_body = store_body
+        self._lock = threading.Lock()
+        self._conn = connect(self.path)
+        self._conn.executescript(_SCHEMA)
+        self.hits = self.revalidated = self.misses = 0
+
+    #parse(body, charset=...) must return a dict with title, text and links; charset is
+    #the one from the Content-Type header
+    def get(self, url, parse, ttl=None):
+        row = self._lookup(url)
+        if row and row["expires_at"] > time.time():
+            self._count("hit")
+            return row
+        with span("fetch", url=url):
+            response = fetch_page_sync(url, headers=self._conditional_headers(row))
+        if row and response.status_code == 304:
+            return self._revalidated(row, response, ttl)
+        with span("parse", bytes=len(response.content)):
+            page = parse(response.content, charset=response.charset_encoding)
+        return self._store(url, response, page, ttl)
+
+    #SQLite work happens on a worker thread, like parsing, so a commit or an eviction
+    #never holds up the other requests on the event loop
+    async def aget(self, url, parse, ttl=None):
+        row = await asyncio.to_thread(self._lookup, url)
+        if row and row["expires_at"] > time.time():
+            self._count("hit")
+            return row
+        with span("fetch", url=url):
+            response = await fetch_page(url, headers=self._conditional_headers(row))
+        if row and response.status_code == 304:
+            return await asyncio.to_thread(self._revalidated, row, response, ttl)
+        with span("parse", bytes=len(response.content)):
+            page = await asyncio.to_thread(parse, response.content, charset=response.charset_encoding)
+        return await asyncio.to_thread(self._store, url, response, page, ttl)
+
+    #Raw page as last downloaded, or None when bodies are not stored
+    def get_body(self, url):
+        with self._lock:
+            row = self._conn.execute("SELECT body FROM pages WHERE url = ?", (url,)).fetchone()
+        return row[0] if row else None
+
+    def invalidate(self, url):
+        with self._lock:
+            self._conn.execute("DELETE FROM pages WHERE url = ?", (url,))
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM pages")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _count(self, result):
+        with self._lock:
+            if result == "hit":
+                self.hits += 1
+            elif result == "revalidated":
+                self.revalidated += 1
+            else:
+                self.misses += 1
+        registry.inc("page_cache_total", result=result)
+
+    def _lookup(self, url):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT url, etag, last_modified, title, text, links, expires_at FROM pages WHERE url = ?",
+                (url,),
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE pages SET accessed_at = ? WHERE url = ?", (time.time(), url))
+        return {
+            "url": row[0], "etag": row[1], "last_modified": row[2],
+            "title": row[3], "text": row[4], "links": json.loads(row[5]), "expires_at": row[6],
+        }
+
+    @staticmethod
+    def _conditional_headers(row):
+        headers = {}
+        if row and row["etag"]:
+            headers["If-None-Match"] = row["etag"]
+        if row and row["last_modified"]:
+            headers["If-Modified-Since"] = row["last_modified"]
+        return headers
+
+    def _revalidated(self, row, response, ttl):
+        self._count("revalidated")
+        now = time.time()
+        row["expires_at"] = now + (self.ttl if ttl is None else ttl)
+        #A 304 may carry a fresh validator
+        row["etag"] = response.headers.get("etag", row["etag"])
+        row["last_modified"] = response.headers.get("last-modified", row["last_modified"])
+        with self._lock:
+            self._conn.execute(
+                "UPDATE pages SET etag = ?, last_modified = ?, expires_at = ?, accessed_at = ? WHERE url = ?",
+                (row["etag"], row["last_modified"], row["expires_at"], now, row["url"]),
+            )
+        return row
+
+    def _store(self, url, response, page, ttl):
+        self._count("miss")
+        now = time.time()
+        body = response.content if self.store_body else None
+        entry = {
+            "url": url,
+            "etag": response.headers.get("etag"),
+            "last_modified": response.headers.get("last-modified"),
+            "title": None if page["title"] is None else str(page["title"]),
+            "text": page["text"],
+            "links": list(page.get("links") or []),
+            "expires_at": now + (self.ttl if ttl is None else ttl),
+        }
+        #Only successful pages are worth keeping; error pages are parsed and returned as before
+        if response.status_code != 200:
+            return entry
+        links = json.dumps(entry["links"])
+        size = len(body or b"") + len(entry["text"].encode()) + len(links)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, entry["etag"], entry["last_modified"], body, entry["title"], entry["text"],
+                 links, size, now, entry["expires_at"], now),
+            )
+            self._evict()
+        return entry
+
+    #Least recently used entries go first until the cache fits in max_bytes again. The
+    #database is shared by every process using it, so the size is read from it each
+    #time rather than tracked here.
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+        while total > self.max_bytes:
+            victims = self._conn.execute(
+                "SELECT url, size FROM pages ORDER BY accessed_at LIMIT 64"
+            ).fetchall()
+            if not victims:
+                return
+            for url, size in victims:
+                self._conn.execute("DELETE FROM pages WHERE url = ?", (url,))
+                total -= size
+                if total <= self.max_bytes:
+                    return
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_default_cache():
+    global _default_cache
+    if _default_cache is None:
+        with _default_lock:
+            if _default_cache is None:
+                _default_cache = PageCache()
+    return _default_cache
+
+
+#Module level helpers used by the Website classes; PAGE_CACHE=0 turns the cache off.
+#Without the cache the body is streamed straight into parse and never held whole.
+def get_page(url, parse, ttl=None):
+    if not PAGE_CACHE_ENABLED:
+        #Download and parse overlap here, so they are one stage
+        with span("fetch_parse", url=url), stream_page_sync(url) as response:
+            return dict(parse(response.iter_bytes(), charset=response.charset_encoding), url=url)
+    return get_default_cache().get(url, parse, ttl)
+
+
+async def aget_page(url, parse, ttl=None):
+    if not PAGE_CACHE_ENABLED:
+        with span("fetch", url=url):
+            response = await fetch_page(url)
+        with span("parse", bytes=len(response.content)):
+            return dict(await asyncio.to_thread(parse, response.content, charset=response.charset_encoding), url=url)
+    return await get_default_cache().aget(url, parse, ttl)
@@ -0,0 +1,360 @@
+import os
+import asyncio
+import threading
+import weakref
+
+from .llm_cache import cached_completion, cached_stream
+from .rate_limit import RATE_LIMIT, alimited, alimited_stream, estimate_tokens, get_controller, limited, limited_stream
+from .telemetry import record_response, span
+
+#One interface over OpenAI, Anthropic and Ollama: chat / achat return the reply text,
+#stream / astream yield text deltas. Clients are created lazily, once per process
+#(and per event loop for the async ones), so every call reuses pooled connections.
+#Every call goes through the shared rate limiter and its retries (Common/rate_limit.py).
+#
+#  provider = get_provider("ollama")      # or LLM_PROVIDER=ollama in the env file
+#  provider.chat(messages)
+
+
+class Provider:
+    name = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._client = None
+        self._pid = None
+        self._async_clients = weakref.WeakKeyDictionary()
+
+    @property
+    def default_model(self):
+        raise NotImplementedError
+
+    #Clients do not survive a fork, so worker processes build their own
+    @property
+    def client(self):
+        if self._client is None or self._pid != os.getpid():
+            with self._lock:
+                if self._client is None or self._pid != os.getpid():
+                    self._client = self._make_client()
+                    self._pid = os.getpid()
+                    self._async_clients = weakref.WeakKeyDictionary()
+        return self._client
+
+    @property
+    def async_client(self):
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = self._make_async_client()
+            self._async_clients[loop] = client
+        return client
+
+    def _make_client(self):
+        raise NotImplementedError
+
+    def _make_async_client(self):
+        raise NotImplementedError
+
+    def chat(self, messages, model=None, response_format=None, **kwargs):
+        raise NotImplementedError
+
+    async def achat(self, messages, model=None, response_format=None, **kwargs):
+        raise NotImplementedError
+
+    def stream(self, messages, model=None, response_format=None, **kwargs):
+        raise NotImplementedError
+
+    async def astream(self, messages, model=None, response_format=None, **kwargs):
+        raise NotImplementedError
+
+    #Retries are left to the rate limiter, which sees every error once
+    @property
+    def sdk_retries(self):
+        return 0 if RATE_LIMIT else 2
+
+    def _limited(self, model, messages, kwargs, fn):
+        return limited(self.name, model, fn, tokens=estimate_tokens(messages, kwargs.get("max_tokens")))
+
+    async def _alimited(self, model, messages, kwargs, fn):
+        return await alimited(self.name, model, fn, tokens=estimate_tokens(messages, kwargs.get("max_tokens")))
+
+    def _limited_stream(self, model, messages, kwargs, make_stream):
+        return limited_stream(self.name, model, make_stream, tokens=estimate_tokens(messages, kwargs.get("max_tokens")))
+
+    def _alimited_stream(self, model, messages, kwargs, make_stream):
+        return alimited_stream(self.name, model, make_stream, tokens=estimate_tokens(messages, kwargs.get("max_tokens")))
+
+    #Rate-limit headers of a successful response keep the limiter's budgets current
+    def _observe(self, model, headers):
+        if RATE_LIMIT:
+            get_controller().limiter(self.name, model).observe(headers)
+
+
+class OpenAIProvider(Provider):
+    name = "openai"
+
+    @property
+    def default_model(self):
+        return os.getenv("GPT_MODEL") or "gpt-4o-mini"
+
+    def _make_client(self):
+        from openai import OpenAI
+        return OpenAI(max_retries=self.sdk_retries)
+
+    def _make_async_client(self):
+        from openai import AsyncOpenAI
+        return AsyncOpenAI(max_retries=self.sdk_retries)
+
+    @staticmethod
+    def _kwargs(response_format, kwargs):
+        if response_format:
+            kwargs["response_format"] = response_format
+        return kwargs
+
+    #Streams end with a usage-only chunk so token counts are not lost
+    @staticmethod
+    def _stream_kwargs(kwargs):
+        if os.getenv("OPENAI_STREAM_USAGE", "1") != "0":
+            kwargs.setdefault("stream_options", {"include_usage": True})
+        return kwargs
+
+    #The raw response carries the x-ratelimit-* headers
+    def chat(self, messages, model=None, response_format=None, **kwargs):
+        model = model or self.default_model
+
+        def call():
+            raw = self.client.chat.completions.with_raw_response.create(
+                model=model, messages=messages, **self._kwargs(response_format, dict(kwargs))
+            )
+            self._observe(model, raw.headers)
+            return raw.parse()
+        response = self._limited(model, messages, kwargs, call)
+        record_response(model, response)
+        return response.choices[0].message.content
+
+    async def achat(self, messages, model=None, response_format=None, **kwargs):
+        model = model or self.default_model
+
+        async def call():
+            raw = await self.async_client.chat.completions.with_raw_response.create(
+                model=model, messages=messages, **self._kwargs(response_format, dict(kwargs))
+            )
+            self._observe(model, raw.headers)
+            return raw.parse()
+        response = await self._alimited(model, messages, kwargs, call)
+        record_response(model, response)
+        return response.choices[0].message.content
+
+    def stream(self, messages, model=None, response_format=None, **kwargs):
+        model = model or self.default_model
+
+        def deltas():
+            stream = self.client.chat.completions.create(
+                model=model, messages=messages, stream=True, **self._stream_kwargs(self._kwargs(response_format, dict(kwargs)))
+            )
+            self._observe(model, stream.response.headers)
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+                if getattr(chunk, "usage", None):
+                    record_response(model, chunk)
+        yield from self._limited_stream(model, messages, kwargs, deltas)
+
+    async def astream(self, messages, model=None, response_format=None, **kwargs):
+        model = model or self.default_model
+
+        async def deltas():
+            stream = await self.async_client.chat.completions.create(
+                model=model, messages=messages, stream=True, **self._stream_kwargs(self._kwargs(response_format, dict(kwargs)))
+            )
+            self._observe(model, stream.response.headers)
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+                if getattr(chunk, "usage", None):
+                    record_response(model, chunk)
+        async for text in self._alimited_stream(model, messages, kwargs, deltas):
+            yield text
+
+
+class AnthropicProvider(Provider):
+    name = "anthropic"
+    max_tokens = int(os.getenv("CLAUDE_MAX_TOKENS", "1024"))
+
+    @property
+    def default_model(self):
+        return os.getenv("CLAUDE_MODEL") or "claude-sonnet-4-20250514"
+
+    def _make_client(self):
+        import anthropic
+        return anthropic.Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY") or os.getenv("CLAUDE_API_KEY"), max_retries=self.sdk_retries)
+
+    def _make_async_client(self):
+        import anthropic
+        return anthropic.AsyncAnthropic(api_key=os.getenv("ANTHROPIC_API_KEY") or os.getenv("CLAUDE_API_KEY"), max_retries=self.sdk_retries)
+
+    #System messages move to the system parameter; JSON mode has no Anthropic
+    #equivalent, so response_format is left to the prompt
+    def _kwargs(self, messages, model, kwargs):
+        system = "\n\n".join(m["content"] for m in messages if m["role"] == "system")
+        kwargs.setdefault("max_tokens", self.max_tokens)
+        if system:
+            kwargs.setdefault("system", system)
+        kwargs["messages"] = [m for m in messages if m["role"] != "system"]
+        kwargs["model"] = model or self.default_model
+        return kwargs
+
+    def chat(self, messages, model=None, response_format=None, **kwargs):
+        kwargs = self._kwargs(messages, model, kwargs)
+
+        def call():
+            raw = self.client.messages.with_raw_response.create(**kwargs)
+            self._observe(kwargs["model"], raw.headers)
+            return raw.parse()
+        response = self._limited(kwargs["model"], messages, kwargs, call)
+        record_response(kwargs["model"], response)
+        return "".join(block.text for block in response.content if block.type == "text")
+
+    async def achat(self, messages, model=None, response_format=None, **kwargs):
+        kwargs = self._kwargs(messages, model, kwargs)
+
+        async def call():
+            raw = await self.async_client.messages.with_raw_response.create(**kwargs)
+            self._observe(kwargs["model"], raw.headers)
+            return await raw.parse()
+        response = await self._alimited(kwargs["model"], messages, kwargs, call)
+        record_response(kwargs["model"], response)
+        return "".join(block.text for block in response.content if block.type == "text")
+
+    def stream(self, messages, model=None, response_format=None, **kwargs):
+        kwargs = self._kwargs(messages, model, kwargs)
+
+        def deltas():
+            with self.client.messages.stream(**kwargs) as stream:
+                self._observe(kwargs["model"], stream.response.headers)
+                yield from stream.text_stream
+                record_response(kwargs["model"], stream.get_final_message())
+        yield from self._limited_stream(kwargs["model"], messages, kwargs, deltas)
+
+    async def astream(self, messages, model=None, response_format=None, **kwargs):
+        kwargs = self._kwargs(messages, model, kwargs)
+
+        async def deltas():
+            async with self.async_client.messages.stream(**kwargs) as stream:
+                self._observe(kwargs["model"], stream.response.headers)
+                async for text in stream.text_stream:
+                    yield text
+                record_response(kwargs["model"], await stream.get_final_message())
+        async for text in self._alimited_stream(kwargs["model"], messages, kwargs, deltas):
+            yield text
+
+
+class OllamaProvider(Provider):
+    name = "ollama"
+
+    @property
+    def default_model(self):
+        return os.getenv("OLLAMA_MODEL") or "gemma3:4b"
+
+    def _make_client(self):
+        import ollama
+        return ollama.Client(host=os.getenv("OLLAMA_HOST"))
+
+    def _make_async_client(self):
+        import ollama
+        return ollama.AsyncClient(host=os.getenv("OLLAMA_HOST"))
+
+    @staticmethod
+    def _kwargs(response_format, kwargs):
+        if response_format and response_format.get("type") == "json_object":
+            kwargs["format"] = "json"
+        return kwargs
+
+    #A local server has no rate-limit headers, but busy ones still answer 503
+    def chat(self, messages, model=None, response_format=None, **kwargs):
+        model = model or self.default_model
+        response = self._limited(model, messages, kwargs, lambda: self.client.chat(
+            model=model, messages=messages, **self._kwargs(response_format, dict(kwargs))))
+        record_response(model, response)
+        return response["message"]["content"]
+
+    async def achat(self, messages, model=None, response_format=None, **kwargs):
+        model = model or self.default_model
+        response = await self._alimited(model, messages, kwargs, lambda: self.async_client.chat(
+            model=model, messages=messages, **self._kwargs(response_format, dict(kwargs))))
+        record_response(model, response)
+        return response["message"]["content"]
+
+    #The final chunk (done=True) carries the token counts
+    def stream(self, messages, model=None, response_format=None, **kwargs):
+        model = model or self.default_model
+
+        def deltas():
+            for chunk in self.client.chat(model=model, messages=messages, stream=True, **self._kwargs(response_format, dict(kwargs))):
+                if chunk["message"]["content"]:
+                    yield chunk["message"]["content"]
+                if chunk.get("done"):
+                    record_response(model, chunk)
+        yield from self._limited_stream(model, messages, kwargs, deltas)
+
+    async def astream(self, messages, model=None, response_format=None, **kwargs):
+        model = model or self.default_model
+
+        async def deltas():
+            async for chunk in await self.async_client.chat(model=model, messages=messages, stream=True, **self._kwargs(response_format, dict(kwargs))):
+                if chunk["message"]["content"]:
+                    yield chunk["message"]["content"]
+                if chunk.get("done"):
+                    record_response(model, chunk)
+        async for text in self._alimited_stream(model, messages, kwargs, deltas):
+            yield text
+
+
+PROVIDERS = {"openai": OpenAIProvider, "anthropic": AnthropicProvider, "ollama": OllamaProvider}
+
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+def get_provider(name=None):
+    name = name or os.getenv("LLM_PROVIDER", "openai")
+    if name not in _instances:
+        with _instances_lock:
+            if name not in _instances:
+                _instances[name] = PROVIDERS[name]()
+    return _instances[name]
+
+
+def register_provider(name, cls):
+    PROVIDERS[name] = cls
+
+
+#Cached one-shot completion on any backend; identical requests come from the LLM cache.
+#Extra sampling kwargs are not part of the cache key, so such calls skip the cache.
+#validate(text) raising or returning False keeps a reply out of the cache.
+def complete(messages, model=None, provider=None, response_format=None, validate=None, **kwargs):
+    provider = provider if isinstance(provider, Provider) else get_provider(provider)
+    model = model or provider.default_model
+    with span("llm", labels={"model": model}, provider=provider.name) as current:
+        if kwargs:
+            return provider.chat(messages, model, response_format=response_format, **kwargs)
+        current.set(cached=True)
+
+        def call():
+            current.set(cached=False)
+            return provider.chat(messages, model, response_format=response_format, **kwargs)
+        return cached_completion(model, messages, call, response_format, validate=validate)
+
+
+#complete() as a stream of text deltas: same cache entry as complete(), a hit is
+#yielded in one piece and a miss is stored once the stream has finished
+def stream_complete(messages, model=None, provider=None, response_format=None, validate=None):
+    provider = provider if isinstance(provider, Provider) else get_provider(provider)
+    model = model or provider.default_model
+    with span("llm", labels={"model": model}, provider=provider.name, streamed=True) as current:
+        current.set(cached=True)
+
+        def stream():
+            current.set(cached=False)
+            return provider.stream(messages, model, response_format=response_format)
+        yield from cached_stream(model, messages, stream, response_format, validate=validate)
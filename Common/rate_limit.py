@@ -0,0 +1,498 @@
+import os
+import time
+import random
+import asyncio
+import threading
+import collections
+from email.utils import parsedate_to_datetime
+from datetime import datetime
+
+from .telemetry import registry
+
+#Process-wide rate limiting and retries for model calls. Every (provider, model)
+#gets a Limiter that
+#  - spends request and token budgets from two token buckets, sized from the
+#    rate-limit headers the API sends (x-ratelimit-*, anthropic-ratelimit-*) or
+#    from RATE_LIMIT_RPM / RATE_LIMIT_TPM / set_limits(),
+#  - caps calls in flight with an AIMD limit: while the limit is what holds calls
+#    back it grows, +1 per success until the first throttle (slow start) and +1
+#    per limit's worth of successes after that; it is halved when the API says it
+#    is rate limited or overloaded,
+#  - retries 429s, 408/409, 5xx, timeouts and dropped connections with jittered
+#    exponential backoff, waiting at least what Retry-After asks for; a 429 pauses
+#    the whole model, not just the call that got it.
+#
+#  limiter = get_controller().limiter("openai", "gpt-4o-mini")
+#  reply = limiter.call(lambda: client.chat.completions.create(...), tokens=1200)
+#
+#The SDK clients are created with max_retries=0 while this is on (RATE_LIMIT=0
+#turns it off), so every error reaches the limiter exactly once.
+
+RATE_LIMIT = os.getenv("RATE_LIMIT", "1") != "0"
+RETRIES = int(os.getenv("RATE_LIMIT_RETRIES", "5"))
+BACKOFF = float(os.getenv("RATE_LIMIT_BACKOFF", "0.5"))
+MAX_BACKOFF = float(os.getenv("RATE_LIMIT_MAX_BACKOFF", "30"))
+#Starting and largest number of calls in flight per model; the first throttle
+#brings the limit down to half of what was in flight at the time
+CONCURRENCY = int(os.getenv("RATE_LIMIT_CONCURRENCY", "64"))
+MAX_CONCURRENCY = int(os.getenv("RATE_LIMIT_MAX_CONCURRENCY", "256"))
+#Per-minute budgets until the API's headers say otherwise (0 = unknown)
+DEFAULT_RPM = float(os.getenv("RATE_LIMIT_RPM", "0"))
+DEFAULT_TPM = float(os.getenv("RATE_LIMIT_TPM", "0"))
+#Completion tokens assumed when a call does not say how many it may produce
+COMPLETION_ESTIMATE = int(os.getenv("RATE_LIMIT_COMPLETION_TOKENS", "256"))
+
+RETRY_STATUS = {408, 409, 425, 429, 500, 502, 503, 504, 529}
+#Statuses that mean "slow down" rather than "something broke"
+THROTTLE_STATUS = {429, 503, 529}
+
+_limits = {}
+
+
+#Known per-minute budgets of a model, e.g. set_limits("gpt-4o-mini", rpm=500, tpm=200_000)
+def set_limits(model, rpm=None, tpm=None):
+    _limits[model] = (rpm, tpm)
+
+
+def _status(error):
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+#"throttle", "server", "timeout", "connection" for errors worth retrying, else None
+def classify(error):
+    status = _status(error)
+    if status is not None:
+        if status in THROTTLE_STATUS:
+            return "throttle"
+        return "server" if status in RETRY_STATUS else None
+    names = " ".join(cls.__name__ for cls in type(error).__mro__)
+    if "Timeout" in names:
+        return "timeout"
+    if "Connection" in names or "RemoteProtocolError" in names or isinstance(error, ConnectionError):
+        return "connection"
+    return None
+
+
+def _headers(error_or_response):
+    headers = getattr(error_or_response, "headers", None)
+    if headers is None:
+        headers = getattr(getattr(error_or_response, "response", None), "headers", None)
+    return headers or {}
+
+
+#Seconds a Retry-After (or OpenAI's retry-after-ms) header asks for, or None
+def retry_after(headers):
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return max(0.0, float(value) / 1000)
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+#OpenAI resets look like "1s", "6m0s", "20ms"; Anthropic sends an RFC 3339 time
+def _reset_seconds(value):
+    if not value:
+        return None
+    total, number = 0.0, ""
+    units = {"h": 3600, "m": 60, "s": 1, "ms": 0.001}
+    i = 0
+    while i < len(value):
+        char = value[i]
+        if char.isdigit() or char == ".":
+            number += char
+            i += 1
+            continue
+        unit = "ms" if value.startswith("ms", i) else char
+        if unit not in units or not number:
+            break
+        total += float(number) * units[unit]
+        number = ""
+        i += len(unit)
+    else:
+        return total + (float(number) if number else 0.0)
+    try:
+        return max(0.0, datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp() - time.time())
+    except ValueError:
+        return None
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+#(limit, remaining, reset seconds) for "requests" or "tokens" from either API's headers
+def _budget(headers, kind):
+    for prefix in ("x-ratelimit-", "anthropic-ratelimit-"):
+        if prefix == "x-ratelimit-":
+            names = (f"{prefix}limit-{kind}", f"{prefix}remaining-{kind}", f"{prefix}reset-{kind}")
+        else:
+            names = (f"{prefix}{kind}-limit", f"{prefix}{kind}-remaining", f"{prefix}{kind}-reset")
+        limit, remaining = _number(headers.get(names[0])), _number(headers.get(names[1]))
+        if limit is not None or remaining is not None:
+            return limit, remaining, _reset_seconds(headers.get(names[2]))
+    return None
+
+
+#Budget refilling continuously to `capacity` per minute. reserve() always succeeds
+#and returns how long to wait, so callers queue in the order they asked.
+class TokenBucket:
+    def __init__(self, per_minute=0):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    @property
+    def known(self):
+        return self.capacity > 0
+
+    def _refill(self, now):
+        if self.rate:
+            self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount, now):
+        if not self.known:
+            return 0.0
+        self._refill(now)
+        #A single request larger than the whole budget waits for a full bucket only
+        self.level -= min(amount, self.capacity)
+        return -self.level / self.rate if self.level < 0 else 0.0
+
+    #What the server reports wins: other processes spend from the same budget.
+    #The bucket is back to full when the server says it resets.
+    def sync(self, limit, remaining, reset, now):
+        self._refill(now)
+        known = self.known
+        if limit:
+            self.capacity = limit
+        if remaining is not None and self.capacity:
+            self.level = min(self.level, remaining) if known else remaining
+            missing = self.capacity - remaining
+            self.rate = missing / reset if reset and missing > 0 else max(self.rate, self.capacity / 60)
+
+
+class Limiter:
+    def __init__(self, provider, model, concurrency=CONCURRENCY, max_concurrency=MAX_CONCURRENCY, rpm=None, tpm=None):
+        self.provider = provider
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.concurrency = float(concurrency)
+        self.requests = TokenBucket(rpm or 0)
+        self.tokens = TokenBucket(tpm or 0)
+        self.paused_until = 0.0
+        self.in_flight = 0
+        self._cond = threading.Condition()
+        self._waiters = collections.deque()
+        self._last_decrease = 0.0
+        self.slow_start = True
+        self.stats = {"calls": 0, "retries": 0, "throttled": 0, "errors": 0, "waited_s": 0.0}
+
+    #---- concurrency (AIMD) ----
+
+    def _free(self):
+        return self.in_flight < max(1, int(self.concurrency))
+
+    def _acquire(self):
+        with self._cond:
+            while not self._free():
+                self._cond.wait()
+            self.in_flight += 1
+
+    async def _aacquire(self):
+        loop = asyncio.get_running_loop()
+        with self._cond:
+            if self._free() and not self._waiters:
+                self.in_flight += 1
+                return
+            waiter = (loop, loop.create_future())
+            self._waiters.append(waiter)
+        try:
+            await waiter[1]
+        except asyncio.CancelledError:
+            with self._cond:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                    waiter = None
+            #Cancelled just after being handed a slot: give it back
+            if waiter is not None and waiter[1].done() and not waiter[1].cancelled():
+                self._release()
+            raise
+
+    def _release(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._wake()
+
+    #Hands free slots to waiting coroutines first (they cannot block the way threads
+    #can), then to one waiting thread
+    def _wake(self):
+        while self._free() and self._waiters:
+            loop, future = self._waiters.popleft()
+            self.in_flight += 1
+            loop.call_soon_threadsafe(self._hand_over, future)
+        if self._free():
+            self._cond.notify()
+
+    def _hand_over(self, future):
+        if future.cancelled():
+            self._release()
+        else:
+            future.set_result(None)
+
+    #Called before the slot is released, so a full limit means in_flight == limit
+    def _succeeded(self):
+        with self._cond:
+            if self.in_flight >= int(self.concurrency):
+                step = 1 if self.slow_start else 1 / max(self.concurrency, 1)
+                self.concurrency = min(self.max_concurrency, self.concurrency + step)
+                self._wake()
+
+    #One halving per burst: calls that were already in flight fail together
+    def _throttled(self, pause, now):
+        with self._cond:
+            self.stats["throttled"] += 1
+            if pause:
+                self.paused_until = max(self.paused_until, now + pause)
+            if now - self._last_decrease > max(pause or 0, 1.0):
+                self.slow_start = False
+                self.concurrency = max(1.0, min(self.concurrency, self.in_flight) / 2)
+                self._last_decrease = now
+        registry.inc("rate_limit_throttled_total", provider=self.provider, model=self.model)
+
+    #---- budgets ----
+
+    def _reserve(self, tokens):
+        now = time.monotonic()
+        with self._cond:
+            wait = max(self.paused_until - now, 0.0, self.requests.reserve(1, now), self.tokens.reserve(tokens, now))
+            if wait:
+                self.stats["waited_s"] += wait
+        return wait
+
+    def observe(self, headers):
+        if not headers:
+            return
+        now = time.monotonic()
+        with self._cond:
+            for kind, bucket in (("requests", self.requests), ("tokens", self.tokens)):
+                budget = _budget(headers, kind)
+                if budget is not None:
+                    bucket.sync(*budget, now)
+
+    #---- calls ----
+
+    def _backoff(self, attempt, error):
+        kind = classify(error)
+        if kind is None or attempt >= RETRIES:
+            return None
+        headers = _headers(error)
+        self.observe(headers)
+        asked = retry_after(headers)
+        #Full jitter, so callers that failed together do not retry together
+        delay = random.uniform(0, min(MAX_BACKOFF, BACKOFF * 2 ** attempt))
+        if asked is not None:
+            delay = min(asked, MAX_BACKOFF) + delay * 0.1
+        if kind == "throttle":
+            self._throttled(delay, time.monotonic())
+        self.stats["retries"] += 1
+        registry.inc("rate_limit_retries_total", provider=self.provider, model=self.model, reason=kind)
+        return delay
+
+    def call(self, fn, /, *args, tokens=0, **kwargs):
+        self.stats["calls"] += 1
+        attempt = 0
+        while True:
+            wait = self._reserve(tokens)
+            if wait:
+                time.sleep(wait)
+            self._acquire()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                delay = self._backoff(attempt, e)
+                if delay is None:
+                    self.stats["errors"] += 1
+                    raise
+            else:
+                self._succeeded()
+                return result
+            finally:
+                self._release()
+            attempt += 1
+            time.sleep(delay)
+
+    async def acall(self, fn, /, *args, tokens=0, **kwargs):
+        self.stats["calls"] += 1
+        attempt = 0
+        while True:
+            wait = self._reserve(tokens)
+            if wait:
+                await asyncio.sleep(wait)
+            await self._aacquire()
+            try:
+                result = await fn(*args, **kwargs)
+            except Exception as e:
+                delay = self._backoff(attempt, e)
+                if delay is None:
+                    self.stats["errors"] += 1
+                    raise
+            else:
+                self._succeeded()
+                return result
+            finally:
+                self._release()
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    #Streams are retried only until their first delta: once text has reached the
+    #caller a retry would repeat it. The slot is held until the stream is finished.
+    def stream(self, make_stream, tokens=0):
+        self.stats["calls"] += 1
+        attempt = 0
+        while True:
+            wait = self._reserve(tokens)
+            if wait:
+                time.sleep(wait)
+            self._acquire()
+            started = False
+            try:
+                for item in make_stream():
+                    started = True
+                    yield item
+            except Exception as e:
+                delay = None if started else self._backoff(attempt, e)
+                if delay is None:
+                    self.stats["errors"] += 1
+                    raise
+            else:
+                self._succeeded()
+                return
+            finally:
+                self._release()
+            attempt += 1
+            time.sleep(delay)
+
+    async def astream(self, make_stream, tokens=0):
+        self.stats["calls"] += 1
+        attempt = 0
+        while True:
+            wait = self._reserve(tokens)
+            if wait:
+                await asyncio.sleep(wait)
+            await self._aacquire()
+            started = False
+            try:
+                async for item in make_stream():
+                    started = True
+                    yield item
+            except Exception as e:
+                delay = None if started else self._backoff(attempt, e)
+                if delay is None:
+                    self.stats["errors"] += 1
+                    raise
+            else:
+                self._succeeded()
+                return
+            finally:
+                self._release()
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def snapshot(self):
+        return dict(self.stats, provider=self.provider, model=self.model, concurrency=self.concurrency, in_flight=self.in_flight,
+                    rpm=self.requests.capacity, tpm=self.tokens.capacity)
+
+
+#Prompt characters / 4 plus the completion allowance: close enough for budgeting,
+#and the server's remaining-tokens header corrects the drift
+def estimate_tokens(messages, max_tokens=None):
+    chars = 0
+    for message in messages or ():
+        content = message.get("content") if isinstance(message, dict) else getattr(message, "content", None)
+        if isinstance(content, str):
+            chars += len(content)
+        elif isinstance(content, list):
+            chars += sum(len(part.get("text") or "") for part in content if isinstance(part, dict))
+    return chars // 4 + (max_tokens or COMPLETION_ESTIMATE)
+
+
+class RateController:
+    def __init__(self):
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    def limiter(self, provider, model):
+        key = (provider, model)
+        limiter = self._limiters.get(key)
+        if limiter is None:
+            with self._lock:
+                limiter = self._limiters.get(key)
+                if limiter is None:
+                    rpm, tpm = _limits.get(model, (None, None))
+                    limiter = self._limiters[key] = Limiter(provider, model, rpm=rpm or DEFAULT_RPM, tpm=tpm or DEFAULT_TPM)
+        return limiter
+
+    def snapshot(self):
+        return [limiter.snapshot() for limiter in list(self._limiters.values())]
+
+    def reset(self):
+        with self._lock:
+            self._limiters.clear()
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def get_controller():
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = RateController()
+    return _default
+
+
+#Shortcuts for call sites outside Common/providers.py; with RATE_LIMIT=0 they call straight
+#through. Keyword arguments (model=..., messages=...) go to fn.
+def limited(provider, model, fn, /, *args, tokens=0, **kwargs):
+    if not RATE_LIMIT:
+        return fn(*args, **kwargs)
+    return get_controller().limiter(provider, model).call(fn, *args, tokens=tokens, **kwargs)
+
+
+def limited_stream(provider, model, make_stream, tokens=0):
+    if not RATE_LIMIT:
+        return make_stream()
+    return get_controller().limiter(provider, model).stream(make_stream, tokens)
+
+
+async def alimited(provider, model, fn, /, *args, tokens=0, **kwargs):
+    if not RATE_LIMIT:
+        return await fn(*args, **kwargs)
+    return await get_controller().limiter(provider, model).acall(fn, *args, tokens=tokens, **kwargs)
+
+
+def alimited_stream(provider, model, make_stream, tokens=0):
+    if not RATE_LIMIT:
+        return make_stream()
+    return get_controller().limiter(provider, model).astream(make_stream, tokens)
@@ -0,0 +1,19 @@
+import os
+import sqlite3
+
+#Every on-disk cache lives under one directory, overridable from the env file
+CACHE_DIR = os.getenv("AI_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "ai"))
+
+
+def cache_path(filename):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    return os.path.join(CACHE_DIR, filename)
+
+
+def connect(path):
+    #One connection shared between threads (callers hold their own lock), WAL so
+    #several processes can read while one writes
+    conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
@@ -0,0 +1,142 @@
+import os
+import time
+import logging
+from collections import deque
+
+from .chunking import count_tokens
+from .telemetry import record_stream
+
+#Coalesced token streaming. Instead of yielding the whole growing answer on every
+#token, deltas are batched on a time/size interval and emitted either as deltas or,
+#for UIs that need the full value (Gradio), as the text so far once per batch.
+#Each response records time-to-first-token and tokens/sec.
+
+STREAM_INTERVAL = float(os.getenv("STREAM_INTERVAL", "0.05"))
+STREAM_MAX_CHARS = int(os.getenv("STREAM_MAX_CHARS", "256"))
+
+logger = logging.getLogger(__name__)
+#Most recent finished responses, newest last
+recent_stats = deque(maxlen=1000)
+
+
+class StreamStats:
+    def __init__(self, model=None, name=None):
+        self.model = model
+        self.name = name
+        self.started = time.perf_counter()
+        self.first_token_at = None
+        self.finished = None
+        self.chunks = 0
+        self.emits = 0
+        self.tokens = 0
+
+    @property
+    def ttft(self):
+        return None if self.first_token_at is None else self.first_token_at - self.started
+
+    @property
+    def tokens_per_sec(self):
+        if self.first_token_at is None or self.finished is None or self.finished <= self.first_token_at:
+            return None
+        return self.tokens / (self.finished - self.first_token_at)
+
+    def as_dict(self):
+        return {"name": self.name, "model": self.model, "ttft": self.ttft, "tokens": self.tokens,
+                "tokens_per_sec": self.tokens_per_sec, "chunks": self.chunks, "emits": self.emits,
+                "total": None if self.finished is None else self.finished - self.started}
+
+
+#Batches deltas: the first one goes out at once (it sets time-to-first-token), the
+#rest when interval seconds have passed or max_chars are waiting
+class _Batcher:
+    def __init__(self, interval, max_chars, stats):
+        self.interval = interval
+        self.max_chars = max_chars
+        self.stats = stats or StreamStats()
+        self.parts = []
+        self.size = 0
+        self.last_emit = 0.0
+        self.emitted = []
+
+    def add(self, delta):
+        if not delta:
+            return None
+        now = time.perf_counter()
+        self.stats.chunks += 1
+        if self.stats.first_token_at is None:
+            self.stats.first_token_at = now
+        self.parts.append(delta)
+        self.size += len(delta)
+        if self.stats.emits == 0 or self.size >= self.max_chars or now - self.last_emit >= self.interval:
+            self.last_emit = now
+            return self.flush()
+        return None
+
+    def flush(self):
+        if not self.parts:
+            return None
+        batch = "".join(self.parts)
+        self.parts, self.size = [], 0
+        self.emitted.append(batch)
+        self.stats.emits += 1
+        return batch
+
+    def finish(self):
+        stats = self.stats
+        stats.finished = time.perf_counter()
+        stats.tokens = count_tokens("".join(self.emitted), stats.model)
+        recent_stats.append(stats)
+        record_stream(stats)
+        logger.info("stream %s", stats.as_dict())
+
+
+def coalesce(deltas, interval=STREAM_INTERVAL, max_chars=STREAM_MAX_CHARS, stats=None):
+    batcher = _Batcher(interval, max_chars, stats)
+    try:
+        for delta in deltas:
+            batch = batcher.add(delta)
+            if batch:
+                yield batch
+        batch = batcher.flush()
+        if batch:
+            yield batch
+    finally:
+        batcher.finish()
+
+
+async def acoalesce(deltas, interval=STREAM_INTERVAL, max_chars=STREAM_MAX_CHARS, stats=None):
+    batcher = _Batcher(interval, max_chars, stats)
+    try:
+        async for delta in deltas:
+            batch = batcher.add(delta)
+            if batch:
+                yield batch
+        batch = batcher.flush()
+        if batch:
+            yield batch
+    finally:
+        batcher.finish()
+
+
+#mode="delta" yields only the new text, mode="cumulative" the full text so far
+def stream_text(deltas, mode="cumulative", interval=STREAM_INTERVAL, max_chars=STREAM_MAX_CHARS, stats=None):
+    batches = coalesce(deltas, interval, max_chars, stats)
+    if mode == "delta":
+        yield from batches
+        return
+    text = ""
+    for batch in batches:
+        text += batch
+        yield text
+
+
+async def astream_text(deltas, mode="cumulative", interval=STREAM_INTERVAL, max_chars=STREAM_MAX_CHARS, stats=None):
+    batches = acoalesce(deltas, interval, max_chars, stats)
+    if mode == "delta":
+        async for batch in batches:
+            yield batch
+        return
+    text = ""
+    async for batch in batches:
+        text += batch
+        yield text
@@ -0,0 +1,331 @@
+import os
+import json
+import math
+import time
+import uuid
+import logging
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+
+#Stage timing, token/cost accounting and latency histograms for every pipeline.
+#
+#  with span("fetch", url=url):                 # nested spans form a trace
+#      ...
+#  record_usage(model, prompt_tokens, completion_tokens)
+#  print(prometheus_text())                      # or start_metrics_server(9464)
+#
+#Every finished span feeds the stage_seconds histogram (labelled by stage plus any
+#labels= given) and, when TELEMETRY_JSONL is set, is appended to that file as one
+#JSON line. Attributes go to the JSON line only, so high-cardinality values such as
+#URLs never become metric labels.
+
+TELEMETRY_ENABLED = os.getenv("TELEMETRY", "1") != "0"
+TELEMETRY_JSONL = os.getenv("TELEMETRY_JSONL")
+TELEMETRY_PORT = os.getenv("TELEMETRY_PORT")
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, math.inf)
+
+#USD per million (input, output) tokens; dated snapshots match by prefix
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1-nano": (0.10, 0.40),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1": (2.00, 8.00),
+    "claude-3-5-haiku": (0.80, 4.00),
+    "claude-sonnet-4": (3.00, 15.00),
+    "claude-opus-4": (15.00, 75.00),
+    "dall-e-3": (0.0, 0.0),
+}
+
+logger = logging.getLogger(__name__)
+#Most recent finished spans, newest last
+recent_spans = deque(maxlen=2000)
+
+
+def set_price(model, input_per_million, output_per_million):
+    MODEL_PRICES[model] = (input_per_million, output_per_million)
+
+
+def price_for(model):
+    if not model:
+        return None
+    if model in MODEL_PRICES:
+        return MODEL_PRICES[model]
+    matches = [name for name in MODEL_PRICES if model.startswith(name)]
+    return MODEL_PRICES[max(matches, key=len)] if matches else None
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.help = {}
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, buckets=DEFAULT_BUCKETS, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {"buckets": buckets, "counts": [0] * len(buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(histogram["buckets"]):
+                if value <= bound:
+                    histogram["counts"][i] += 1
+                    break
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    def describe(self, name, text):
+        self.help[name] = text
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def snapshot(self):
+        with self._lock:
+            counters = [{"type": "counter", "name": name, "labels": dict(labels), "value": value}
+                        for (name, labels), value in sorted(self.counters.items())]
+            histograms = []
+            for (name, labels), h in sorted(self.histograms.items()):
+                cumulative, total = [], 0
+                for bound, count in zip(h["buckets"], h["counts"]):
+                    total += count
+                    cumulative.append(["+Inf" if bound == math.inf else bound, total])
+                histograms.append({"type": "histogram", "name": name, "labels": dict(labels),
+                                   "buckets": cumulative, "sum": h["sum"], "count": h["count"]})
+        return counters + histograms
+
+
+registry = Registry()
+registry.describe("stage_seconds", "Duration of pipeline stages")
+registry.describe("llm_tokens_total", "LLM tokens by model and kind (prompt, completion, cached)")
+registry.describe("llm_cost_usd_total", "Estimated LLM spend in USD by model")
+registry.describe("llm_requests_total", "LLM requests by model")
+registry.describe("llm_ttft_seconds", "Time to first streamed token")
+registry.describe("llm_tokens_per_second", "Streamed generation speed")
+registry.describe("page_cache_total", "Page cache lookups by result (hit, revalidated, miss)")
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels_text(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+#Prometheus text exposition format (version 0.0.4)
+def prometheus_text():
+    lines = []
+    typed = set()
+    for metric in registry.snapshot():
+        name = metric["name"]
+        if name not in typed:
+            typed.add(name)
+            if name in registry.help:
+                lines.append(f"# HELP {name} {registry.help[name]}")
+            lines.append(f"# TYPE {name} {metric['type']}")
+        labels = tuple(metric["labels"].items())
+        if metric["type"] == "counter":
+            lines.append(f"{name}{_labels_text(labels)} {metric['value']}")
+            continue
+        for bound, count in metric["buckets"]:
+            lines.append(f"{name}_bucket{_labels_text(labels + (('le', bound),))} {count}")
+        lines.append(f"{name}_sum{_labels_text(labels)} {metric['sum']}")
+        lines.append(f"{name}_count{_labels_text(labels)} {metric['count']}")
+    return "\n".join(lines) + "\n"
+
+
+#Metrics snapshot as JSON lines, one series per line, stamped with the export time
+def export_jsonl(path):
+    now = time.time()
+    with open(path, "a", encoding="utf-8") as f:
+        for metric in registry.snapshot():
+            f.write(json.dumps(dict(metric, ts=now)) + "\n")
+
+
+#---- spans ----
+
+_current = contextvars.ContextVar("telemetry_span", default=None)
+_sink_lock = threading.Lock()
+_sink = None
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start", "duration", "attrs", "labels")
+
+    def __init__(self, name, parent, labels, attrs):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex[:16]
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.start = time.time()
+        self.duration = None
+        self.labels = labels or {}
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def as_dict(self):
+        return {"type": "span", "name": self.name, "trace_id": self.trace_id, "span_id": self.span_id,
+                "parent_id": self.parent_id, "start": self.start, "duration": self.duration,
+                "labels": self.labels, "attrs": self.attrs}
+
+
+def current_span():
+    return _current.get()
+
+
+def _write_span(record):
+    global _sink
+    with _sink_lock:
+        if _sink is None:
+            _sink = open(TELEMETRY_JSONL, "a", encoding="utf-8", buffering=1)
+        _sink.write(json.dumps(record, default=str) + "\n")
+
+
+@contextmanager
+def span(name, labels=None, **attrs):
+    if not TELEMETRY_ENABLED:
+        yield Span(name, None, labels, attrs)
+        return
+    current = Span(name, _current.get(), labels, attrs)
+    token = _current.set(current)
+    start = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.attrs["error"] = type(e).__name__
+        raise
+    finally:
+        current.duration = time.perf_counter() - start
+        try:
+            _current.reset(token)
+        except ValueError:
+            #A generator resumed from another thread/context; the parent link is kept anyway
+            pass
+        registry.observe("stage_seconds", current.duration, stage=name, **current.labels)
+        record = current.as_dict()
+        recent_spans.append(record)
+        if TELEMETRY_JSONL:
+            _write_span(record)
+
+
+#Wraps fn so it runs under the caller's current span, for work handed to a thread
+#pool (threads do not inherit context variables)
+def with_current_span(fn):
+    parent = _current.get()
+
+    def run(*args, **kwargs):
+        token = _current.set(parent)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current.reset(token)
+    return run
+
+
+#---- model usage ----
+
+def record_usage(model, prompt_tokens=0, completion_tokens=0, cached_tokens=0):
+    if not TELEMETRY_ENABLED:
+        return
+    model = model or "unknown"
+    registry.inc("llm_requests_total", model=model)
+    registry.inc("llm_tokens_total", prompt_tokens or 0, model=model, kind="prompt")
+    registry.inc("llm_tokens_total", completion_tokens or 0, model=model, kind="completion")
+    if cached_tokens:
+        registry.inc("llm_tokens_total", cached_tokens, model=model, kind="cached")
+    prices = price_for(model)
+    if prices:
+        cost = ((prompt_tokens or 0) * prices[0] + (completion_tokens or 0) * prices[1]) / 1_000_000
+        registry.inc("llm_cost_usd_total", cost, model=model)
+    current = _current.get()
+    if current is not None:
+        current.attrs["prompt_tokens"] = current.attrs.get("prompt_tokens", 0) + (prompt_tokens or 0)
+        current.attrs["completion_tokens"] = current.attrs.get("completion_tokens", 0) + (completion_tokens or 0)
+
+
+#Token counts from an OpenAI, Anthropic or Ollama response (or final stream chunk);
+#None when the response carries no usage
+def usage_from(response):
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        if hasattr(usage, "prompt_tokens"):
+            details = getattr(usage, "prompt_tokens_details", None)
+            return usage.prompt_tokens, usage.completion_tokens, getattr(details, "cached_tokens", 0) or 0
+        if hasattr(usage, "input_tokens"):
+            return usage.input_tokens, usage.output_tokens, getattr(usage, "cache_read_input_tokens", 0) or 0
+    try:
+        if response.get("eval_count") is not None:
+            return response.get("prompt_eval_count") or 0, response["eval_count"], 0
+    except (AttributeError, TypeError):
+        pass
+    return None
+
+
+def record_response(model, response):
+    usage = usage_from(response)
+    if usage:
+        record_usage(model, *usage)
+
+
+def record_stream(stats):
+    if not TELEMETRY_ENABLED:
+        return
+    if stats.ttft is not None:
+        registry.observe("llm_ttft_seconds", stats.ttft, model=stats.model, stream=stats.name)
+    if stats.tokens_per_sec is not None:
+        registry.observe("llm_tokens_per_second", stats.tokens_per_sec,
+                         buckets=(5, 10, 20, 40, 80, 160, 320, math.inf), model=stats.model, stream=stats.name)
+
+
+#---- export ----
+
+_server = None
+
+
+#Serves prometheus_text() at /metrics on a daemon thread; the port comes from the
+#argument or TELEMETRY_PORT, and nothing starts when neither is set
+def start_metrics_server(port=None, host="0.0.0.0"):
+    global _server
+    port = port or TELEMETRY_PORT
+    if not port or _server is not None:
+        return _server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    _server = ThreadingHTTPServer((host, int(port)), MetricsHandler)
+    threading.Thread(target=_server.serve_forever, name="metrics", daemon=True).start()
+    logger.info("metrics on http://%s:%s/metrics", host, port)
+    return _server
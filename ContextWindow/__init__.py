@@ -0,0 +1 @@
+#Chatbots with managed context: the StrideBot store assistant and the GPT/Claude debate
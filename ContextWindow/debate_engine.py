@@ -0,0 +1,106 @@
+import os, sys, asyncio
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Common.providers import get_provider
+from Common.telemetry import span
+from ContextWindow.transcript import ChatView, Transcript
+
+#Conversations between any number of models on any backends. The conversation is
+#stored once in a Transcript; each participant has its own ChatView of it (its own
+#turns as assistant, everyone else's as user) that grows by one message per turn.
+#Turns are streamed: every delta is handed out the moment it arrives. Debates are
+#plain coroutines, so hundreds run side by side on one event loop while the shared
+#rate limiter (Common/rate_limit.py) keeps each backend within its limits.
+#
+#  debate = Debate([Participant("gpt", "Argue.", "openai"), Participant("claude", "Agree.", "anthropic"),
+#                   Participant("llama", "Summarize.", "ollama")], opening=[("gpt", "Hi there")])
+#  async for speaker, delta in debate.stream(rounds=3):
+#      ...                                  # delta is None when speaker's turn is over
+#  transcripts = await run_debates(make_debate, 200, rounds=3, max_concurrency=50)
+
+#Provider name -> ChatView style; unknown backends get plain chat messages
+VIEW_STYLES = {"openai": "openai", "anthropic": "anthropic"}
+
+
+class Participant:
+    #kwargs go to every request of this participant, e.g. max_tokens=500 or temperature
+    def __init__(self, name, system_prompt, provider="openai", model=None, **kwargs):
+        self.name = name
+        self.system_prompt = system_prompt
+        self.provider = provider
+        self.model = model or get_provider(provider).default_model
+        self.kwargs = kwargs
+        #Anthropic requires max_tokens; the provider fills in its default otherwise
+        if provider == "anthropic":
+            self.kwargs.setdefault("max_tokens", 500)
+
+    def view(self, label_others=False):
+        return ChatView(self.name, self.system_prompt, VIEW_STYLES.get(self.provider, "plain"), label_others)
+
+
+class Debate:
+    def __init__(self, participants, opening=()):
+        names = [participant.name for participant in participants]
+        if len(set(names)) != len(names):
+            raise ValueError(f"participant names must be unique: {names}")
+        self.participants = list(participants)
+        self.transcript = Transcript()
+        for speaker, text in opening:
+            self.transcript.append(speaker, text)
+        #Two speakers can tell each other apart by role alone
+        label_others = len(self.participants) > 2
+        for participant in self.participants:
+            self.transcript.add_view(participant.view(label_others))
+
+    @property
+    def turns(self):
+        return self.transcript.turns
+
+    #One streamed turn; the full text joins the transcript once the stream has ended
+    async def turn_stream(self, participant):
+        provider = get_provider(participant.provider)
+        request = self.transcript.views[participant.name].request()
+        parts = []
+        with span("debate_turn", labels={"model": participant.model}, speaker=participant.name) as current:
+            async for delta in provider.astream(model=participant.model, **request, **participant.kwargs):
+                parts.append(delta)
+                yield delta
+            current.set(chars=sum(map(len, parts)))
+        self.transcript.append(participant.name, "".join(parts))
+
+    #(speaker, delta) as the tokens arrive, (speaker, None) at the end of each turn
+    async def stream(self, rounds=3, order=None):
+        order = order or self.participants
+        for _ in range(rounds):
+            for participant in order:
+                async for delta in self.turn_stream(participant):
+                    yield participant.name, delta
+                yield participant.name, None
+
+    #echo prints every turn as it streams in, for a single debate on a terminal
+    async def run(self, rounds=3, echo=False):
+        speaking = None
+        async for speaker, delta in self.stream(rounds):
+            if not echo:
+                continue
+            if delta is None:
+                print("\n")
+                speaking = None
+                continue
+            if speaking != speaker:
+                print(f"{speaker}:")
+                speaking = speaker
+            print(delta, end="", flush=True)
+        return self.transcript
+
+
+#Runs n independent debates from make_debate(i) at most max_concurrency at a time.
+#Returns their transcripts in order; a failed debate leaves its exception in its slot.
+async def run_debates(make_debate, n, rounds=3, max_concurrency=100):
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def one(i):
+        async with semaphore:
+            return await make_debate(i).run(rounds)
+
+    return await asyncio.gather(*(one(i) for i in range(n)), return_exceptions=True)
@@ -1,20 +1,15 @@
-import os
-from openai import OpenAI
-import anthropic
-from dotenv  import load_dotenv
+import os, sys, asyncio, argparse
 
-#Loading env variables and declaring model constants & getting api keys
-load_dotenv(override=True)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ContextWindow.debate_engine import Debate, Participant, run_debates
+
+#Declaring model constants & getting api keys (the env file is loaded by Common)
 GPT_MODEL = 'gpt-4o-mini'
 CLAUDE_MODEL = 'claude-sonnet-4-20250514'
 
 openai_api_key = os.getenv("OPENAI_API_KEY")
 claude_api_key = os.getenv("CLAUDE_API_KEY")
 
-#llm instances for openai and anthropic
-openai = OpenAI()
-claude = anthropic.Anthropic()
-
 gpt_system_prompt = "You are a chatbot who is very argumentative; \
 you disagree with anything in the conversation and you challenge everything, in a snarky way."
 
@@ -22,49 +17,65 @@ claude_system_prompt = "You are a very polite, courteous chatbot. You try to agr
 everything the other person says, or find common ground. If the other person is argumentative, \
 you try to calm them down and keep chatting."
 
-gpt_messages = ["Hi there"]
-claude_messages = ["Hi"]
+#Personas handed out in order to --participant entries beyond the first two
+EXTRA_SYSTEM_PROMPTS = [
+    "You are a calm referee. You summarize where the others disagree and ask the question that would settle it.",
+    "You are a curious newcomer. You ask for concrete examples whenever someone makes a claim.",
+    "You are a dry comedian. You find the absurd side of whatever is being discussed, in one or two lines.",
+]
 
-#Calling chat gpt as the assistant and setting role of system to gpt and user as claude
-def call_gpt():
-    messages = [{"role": "system", "content": {gpt_system_prompt}}]
-    for gpt, claude in zip(gpt_messages, claude_messages):
-        messages.append({"role": "assistant", "content": gpt})
-        messages.append({"role": "user", "content": claude})
-        response = openai.chat.completions.create(
-            model = GPT_MODEL,
-            api_key = openai_api_key,
-            messages=messages            
-        )
-    return response.choices[0].message.content
+def default_participants():
+    return [Participant("gpt", gpt_system_prompt, "openai", GPT_MODEL),
+            Participant("claude", claude_system_prompt, "anthropic", CLAUDE_MODEL, max_tokens=500)]
 
-#Calling claude as the assistant and setting role of system to claude and user as gpt 
-def call_claude():
-    messages = []
-    for gpt, claude in zip(gpt_messages, claude_messages):
-        messages.append({"role": "user", "content": gpt})
-        messages.append({"role": "assistant", "content": claude})
-        #Adding the additional gpt message
-        messages.append({"role": "user", "content": gpt_messages[-1]})
-        response = claude.messages.create(
-            model=CLAUDE_MODEL,
-            system=claude_system_prompt,
-            messages=messages,
-            max_tokens=500
-        )
-    return response.content[0].text
+#NAME:PROVIDER[:MODEL] entries; the first two get the GPT and Claude personas
+def parse_participants(specs):
+    prompts = [gpt_system_prompt, claude_system_prompt] + EXTRA_SYSTEM_PROMPTS
+    participants = []
+    for i, spec in enumerate(specs):
+        name, provider, model = (spec.split(":", 2) + [None])[:3]
+        participants.append(Participant(name, prompts[i % len(prompts)], provider, model))
+    return participants
 
-print(f"GPT:\n{gpt_messages[0]}")
-print(f"Claude:\n{claude_messages[0]}")
+#The conversation is stored once; every participant sees its own turns as assistant and
+#everyone else's as user, and each view only grows by the new turn
+def new_debate(participants=None):
+    participants = participants or default_participants()
+    return Debate(participants, opening=[(participants[0].name, "Hi there"), (participants[1].name, "Hi")])
 
-for i in range(5):
-    gpt_next = call_gpt()
-    print(f"GPT:\n{gpt_next}\n")
-    gpt_messages.append(gpt_next)
+async def adebate(rounds=5, echo=True, participants=None):
+    debate = new_debate(participants)
+    if echo:
+        for speaker, text in debate.turns:
+            print(f"{speaker}:\n{text}\n")
+    return await debate.run(rounds, echo)
 
-    claude_next = call_claude()
-    print(f"Claude:\n{claude_next}\n")
-    claude_messages.append(claude_next)
+#Blocking wrapper; every turn is streamed and the transcript is returned at the end
+def debate(rounds=5, echo=True, participants=None):
+    return asyncio.run(adebate(rounds, echo, participants))
 
+def main():
+    parser = argparse.ArgumentParser(description="Let GPT and Claude (or any other models) argue for a few rounds")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--participant", action="append", default=[], metavar="NAME:PROVIDER[:MODEL]",
+                        help="repeat for each speaker, e.g. gpt:openai claude:anthropic llama:ollama:llama3.2")
+    parser.add_argument("--debates", type=int, default=1, help="independent debates run at the same time")
+    parser.add_argument("--concurrency", type=int, default=100, help="debates in flight at once")
+    args = parser.parse_args()
+    if args.participant and len(args.participant) < 2:
+        parser.error("a debate needs at least two participants")
+    participants = parse_participants(args.participant) if args.participant else None
+    if args.debates == 1:
+        debate(args.rounds, participants=participants)
+        return
 
+    #Participants are cheap; each debate gets its own so nothing is shared but the transcript code
+    make = lambda i: new_debate(parse_participants(args.participant) if participants else None)
+    results = asyncio.run(run_debates(make, args.debates, args.rounds, args.concurrency))
+    failed = [r for r in results if isinstance(r, Exception)]
+    print(f"{len(results) - len(failed)}/{len(results)} debates finished", file=sys.stderr)
+    for error in failed[:5]:
+        print(f"  {type(error).__name__}: {error}", file=sys.stderr)
 
+if __name__ == "__main__":
+    main()
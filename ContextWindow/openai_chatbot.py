@@ -1,36 +1,45 @@
-import os
-from dotenv import load_dotenv
-from openai import OpenAI
-import gradio as gr
+import os, sys
 
-#Loading the env variables
-load_dotenv(override=True)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Common.context_window import ContextWindow
+from Common.providers import get_provider
+from Common.streaming import StreamStats, stream_text
 
 #Getting the model and api key from env
 GPT_MODEL = os.getenv("GPT_MODEL") 
 openai_api_key = os.getenv("OPENAI_API_KEY")
 
-#Creating an instance of openai
-openai = OpenAI()
+#Shared pooled client; CHAT_PROVIDER=ollama (or anthropic) runs StrideBot on another backend
+provider = get_provider(os.getenv("CHAT_PROVIDER"))
+GPT_MODEL = GPT_MODEL if provider.name == "openai" else None
 
 #Defining the system prompt
 system_prompt = "You are StrideBot, a friendly and knowledgeable shoe store assistant. Greet customers warmly, ask about their needs, and help them find the right shoes for any occasion (casual, formal, athletic, kids, etc.). Provide style suggestions, sizing guidance, and info on store policies. Be conversational, supportive, and professional. If unsure, suggest asking an in-store associate. Do not invent prices or promotions."
 
+#Only the latest turns are sent word for word, older ones are folded into a rolling summary
+#(CONTEXT_RECENT_TOKENS sets how much history stays verbatim)
+context = ContextWindow(model=GPT_MODEL, summary_model=GPT_MODEL, summary_provider=provider)
+
 #Creating a chat function with history and the current message
-def chat(message, history):
-    messages = [{"role": "system", "content": system_prompt}] + history + [{"role": "system", "content": message}]
+#gr.Request is resolved from the module globals once build_ui() has imported gradio
+def chat(message, history, request: "gr.Request" = None):
+    session_id = request.session_hash if request else "default"
+    messages = context.build(system_prompt, history, message, session_id)
+
+    #Tokens are batched (STREAM_INTERVAL / STREAM_MAX_CHARS) so the UI is updated a few
+    #times a second instead of re-sending the whole answer on every token
+    stats = StreamStats(GPT_MODEL or provider.default_model, "stridebot")
+    yield from stream_text(provider.stream(messages, GPT_MODEL), stats=stats)
 
-    stream = openai.chat.completions.create(
-        model=GPT_MODEL,
-        messages=messages,
-        stream=True
-    )
 
-    response = ""
-    for chunk in stream:
-        response += chunk.choices[0].delta.content or ''
-        yield response
+#Gradio code; only imported when the UI is built, so importing this module stays cheap
+def build_ui():
+    global gr
+    import gradio as gr
+    return gr.ChatInterface(fn=chat, type="messages")
 
+def main():
+    build_ui().launch()
 
-#Gradio code
-gr.ChatInterface(fn=chat, type="messages").launch()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import uuid
+
+#Incremental transcript for bot-to-bot conversations. Every turn is stored once and
+#appended to each participant's view, with roles from that participant's point of
+#view, so a turn costs exactly one request and nothing is rebuilt. The views also
+#mark their stable prefix (system prompt + earlier history) for prompt caching.
+#
+#style is "openai", "anthropic" or "plain" (system message, no provider extras, e.g.
+#Ollama). With more than two participants label_others=True prefixes everyone
+#else's turns with their name, since they all arrive as the "user" role.
+
+#Anthropic caches up to an explicit breakpoint; OpenAI caches stable prefixes on its
+#own, and a per-conversation prompt_cache_key keeps the requests on the same cache
+CACHE_CONTROL = {"type": "ephemeral"}
+
+
+class ChatView:
+    def __init__(self, name, system_prompt, style="openai", label_others=False):
+        self.name = name
+        self.system_prompt = system_prompt
+        self.style = style
+        self.label_others = label_others
+        self.cache_key = f"{name}-{uuid.uuid4().hex}"
+        self._marked = None
+        if style == "anthropic":
+            self.messages = []
+            self.system = [{"type": "text", "text": system_prompt, "cache_control": CACHE_CONTROL}]
+        else:
+            self.messages = [{"role": "system", "content": system_prompt}]
+
+    def add(self, speaker, text):
+        role = "assistant" if speaker == self.name else "user"
+        if self.label_others and role == "user":
+            text = f"{speaker}: {text}"
+        if self.style != "anthropic":
+            self.messages.append({"role": role, "content": text})
+            return
+        #Anthropic wants alternating roles, so back-to-back turns share one message
+        block = {"type": "text", "text": text}
+        if self.messages and self.messages[-1]["role"] == role:
+            self.messages[-1]["content"].append(block)
+        elif not self.messages and role == "assistant":
+            self.messages.append({"role": "user", "content": [{"type": "text", "text": "(conversation start)"}]})
+            self.messages.append({"role": role, "content": [block]})
+        else:
+            self.messages.append({"role": role, "content": [block]})
+
+    #Keyword arguments for Provider.chat / stream; only the cache breakpoint moves
+    def request(self):
+        if self.style == "openai":
+            return {"messages": self.messages, "extra_body": {"prompt_cache_key": self.cache_key}}
+        if self.style != "anthropic":
+            return {"messages": self.messages}
+        if self.messages:
+            last = self.messages[-1]["content"][-1]
+            if self._marked is not last:
+                if self._marked is not None:
+                    self._marked.pop("cache_control", None)
+                last["cache_control"] = CACHE_CONTROL
+                self._marked = last
+        return {"messages": self.messages, "system": self.system}
+
+
+class Transcript:
+    def __init__(self):
+        self.turns = []
+        self.views = {}
+
+    def add_view(self, view):
+        for speaker, text in self.turns:
+            view.add(speaker, text)
+        self.views[view.name] = view
+        return view
+
+    def append(self, speaker, text):
+        self.turns.append((speaker, text))
+        for view in self.views.values():
+            view.add(speaker, text)
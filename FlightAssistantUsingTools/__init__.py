@@ -0,0 +1 @@
+# FlightAI assistants and the inventory, booking journal, image cache and intent router behind them
@@ -0,0 +1,251 @@
+import os
+import sys
+import json
+import time
+import uuid
+import queue
+import logging
+import threading
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Common.storage import cache_path
+
+# Durable booking log: one JSON record per line, appended and never rewritten in
+# place. Bookings from concurrent sessions are group-committed: the writer thread
+# takes everything queued since the last fsync, writes it in one go and fsyncs
+# once, then wakes all of those callers. append() returns only after its record
+# is on disk, so a confirmation that was shown can not be lost.
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_PATH = os.getenv("BOOKING_JOURNAL")
+MAX_BATCH = int(os.getenv("BOOKING_MAX_BATCH", "512"))
+#Extra time (seconds) the writer waits to grow a batch; 0 batches whatever is queued
+MAX_WAIT = float(os.getenv("BOOKING_MAX_WAIT", "0"))
+
+
+def new_booking_id():
+    return "FA-" + uuid.uuid4().hex[:12].upper()
+
+
+class _Waiter:
+    __slots__ = ("event", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.error = None
+
+
+class BookingJournal:
+    def __init__(self, path=None, max_batch=MAX_BATCH, max_wait=MAX_WAIT):
+        self.path = path or JOURNAL_PATH or cache_path("bookings.jsonl")
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        #Booking id -> (offset, length) of its latest record
+        self._index = {}
+        self.records = 0
+        self.commits = 0
+        self.skipped = 0
+        self._closed = False
+        self._closing = threading.Lock()
+        self._recover()
+        #Unbuffered, so a failed batch leaves nothing behind in a buffer to be written later
+        self._file = open(self.path, "ab", buffering=0)
+        self._reader = os.open(self.path, os.O_RDONLY)
+        self._writer = threading.Thread(target=self._run, name="booking-journal", daemon=True)
+        self._writer.start()
+
+    # Rebuilds the id index from the file. A torn last line (crash mid-write) is cut
+    # off; a complete line that is not a booking record is skipped and logged, so the
+    # confirmed bookings after it are kept.
+    def _recover(self):
+        if not os.path.exists(self.path):
+            open(self.path, "ab").close()
+            return
+        offset = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                    if not isinstance(record, dict) or "id" not in record:
+                        raise ValueError("not a booking record")
+                except ValueError as e:
+                    self.skipped += 1
+                    logger.warning("booking journal %s: skipping line at byte %d: %s", self.path, offset, e)
+                else:
+                    self._index[record["id"]] = (offset, len(line))
+                offset += len(line)
+        if offset != os.path.getsize(self.path):
+            with open(self.path, "r+b") as f:
+                f.truncate(offset)
+
+    # ---- writes ----
+
+    def append(self, record):
+        record = dict(record)
+        record.setdefault("id", new_booking_id())
+        record.setdefault("ts", time.time())
+        waiter = _Waiter()
+        #Checked and queued together, so nothing can land behind close()'s stop marker
+        with self._closing:
+            if self._closed:
+                raise RuntimeError("booking journal is closed")
+            self._queue.put((record, waiter))
+        waiter.event.wait()
+        if waiter.error is not None:
+            raise waiter.error
+        return record["id"]
+
+    def book(self, **fields):
+        return self.append(dict(fields, status="confirmed"))
+
+    # Appends the booking again with status "cancelled"; the latest record wins
+    def cancel(self, booking_id):
+        record = self.lookup(booking_id)
+        if record is None or record.get("status") == "cancelled":
+            return None
+        record.update(status="cancelled", ts=time.time())
+        self.append(record)
+        return record
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                try:
+                    remaining = deadline - time.monotonic()
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)
+                    break
+                batch.append(item)
+            self._commit(batch)
+
+    def _commit(self, batch):
+        error = None
+        try:
+            lines = [(json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8") for record, _ in batch]
+            with self._lock:
+                #Not tell(): after a cut-back batch the position can be past the end
+                offset = os.lseek(self._file.fileno(), 0, os.SEEK_END)
+                self._write(b"".join(lines), offset)
+                for (record, _), line in zip(batch, lines):
+                    self._index[record["id"]] = (offset, len(line))
+                    offset += len(line)
+                self.records += len(batch)
+                self.commits += 1
+        except Exception as e:
+            error = e
+        for _, waiter in batch:
+            waiter.error = error
+            waiter.event.set()
+
+    # Writes and fsyncs one batch. If either fails, the file is cut back to where the
+    # batch started: bytes left behind would be glued to the next batch's first line.
+    def _write(self, data, offset):
+        fd = self._file.fileno()
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+            os.fsync(fd)
+        except BaseException:
+            try:
+                os.ftruncate(fd, offset)
+            except OSError:
+                logger.exception("booking journal %s: could not cut back a failed batch", self.path)
+            raise
+
+    # ---- reads ----
+
+    def lookup(self, booking_id):
+        with self._lock:
+            position = self._index.get(booking_id)
+            if position is None:
+                return None
+            line = os.pread(self._reader, position[1], position[0])
+        return json.loads(line)
+
+    def __len__(self):
+        return len(self._index)
+
+    # ---- maintenance ----
+
+    # Rewrites the log with only the latest record per booking (optionally without
+    # cancelled ones). The new file is fsynced and swapped in atomically; appends
+    # wait on the lock meanwhile.
+    def compact(self, drop_cancelled=False):
+        with self._lock:
+            before = os.path.getsize(self.path)
+            temp_path = self.path + ".compact"
+            index = {}
+            offset = 0
+            with open(temp_path, "wb") as out:
+                for booking_id, (start, length) in sorted(self._index.items(), key=lambda item: item[1][0]):
+                    line = os.pread(self._reader, length, start)
+                    if drop_cancelled and json.loads(line).get("status") == "cancelled":
+                        continue
+                    out.write(line)
+                    index[booking_id] = (offset, length)
+                    offset += length
+                out.flush()
+                os.fsync(out.fileno())
+            os.replace(temp_path, self.path)
+            self._fsync_dir()
+            self._file.close()
+            os.close(self._reader)
+            self._file = open(self.path, "ab", buffering=0)
+            self._reader = os.open(self.path, os.O_RDONLY)
+            self._index = index
+        return {"bytes_before": before, "bytes_after": offset, "bookings": len(index)}
+
+    def _fsync_dir(self):
+        try:
+            fd = os.open(os.path.dirname(os.path.abspath(self.path)), os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+    def stats(self):
+        return {
+            "bookings": len(self._index), "records": self.records, "commits": self.commits, "skipped": self.skipped,
+            "records_per_commit": self.records / self.commits if self.commits else 0.0,
+        }
+
+    def close(self):
+        with self._closing:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._writer.join()
+        with self._lock:
+            self._file.close()
+            os.close(self._reader)
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def get_journal():
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = BookingJournal()
+        return _default
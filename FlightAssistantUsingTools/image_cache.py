@@ -0,0 +1,160 @@
+import os
+import re
+import sys
+import base64
+import hashlib
+import argparse
+import threading
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Common.providers import get_provider
+from Common.rate_limit import limited
+from Common.storage import cache_path
+
+# Destination images for confirmed bookings. The prompt depends only on the city,
+# so each city is drawn once and kept on disk as encoded PNG bytes; callers get a
+# file path (what gr.Image serves directly) or the raw bytes, never a decoded
+# PIL image. A downscaled JPEG variant is made from the full image for small screens.
+
+IMAGE_MODEL = os.getenv("IMAGE_MODEL", "dall-e-3")
+IMAGE_SIZE = os.getenv("IMAGE_SIZE", "1024x1024")
+SMALL_SIZE = int(os.getenv("IMAGE_SMALL_SIZE", "384"))
+PREWARM_WORKERS = int(os.getenv("IMAGE_PREWARM_WORKERS", "4"))
+VARIANTS = ("full", "small")
+
+
+def image_prompt(city):
+    return f"An image representing a vacation in {city}, showing tourist spots and everything unique about {city}, in a simple art style"
+
+
+# Image models have their own rate limits; a 429 while prewarming is waited out
+def generate_image(city):
+    image_response = limited("openai", IMAGE_MODEL, get_provider("openai").client.images.generate,
+        model=IMAGE_MODEL,
+        prompt=image_prompt(city),
+        size=IMAGE_SIZE,
+        n=1,
+        response_format="b64_json"
+    )
+    return base64.b64decode(image_response.data[0].b64_json)
+
+
+def downscale(data, size=SMALL_SIZE):
+    from PIL import Image
+    image = Image.open(BytesIO(data))
+    image.thumbnail((size, size))
+    out = BytesIO()
+    image.convert("RGB").save(out, "JPEG", quality=85, optimize=True)
+    return out.getvalue()
+
+
+class ImageCache:
+    def __init__(self, directory=None, generate=generate_image):
+        self.directory = directory or os.getenv("IMAGE_CACHE_DIR") or cache_path("images")
+        os.makedirs(self.directory, exist_ok=True)
+        self.generate = generate
+        self._lock = threading.Lock()
+        #One lock per city so concurrent bookings for the same city draw it once
+        self._city_locks = {}
+        self.hits = 0
+        self.misses = 0
+
+    # File name carries the city and a hash of everything that shapes the image, so a
+    # new model, size or prompt never serves a stale picture
+    def _base(self, city):
+        city = " ".join(city.split()).lower()
+        digest = hashlib.sha256(f"{IMAGE_MODEL}\n{IMAGE_SIZE}\n{image_prompt(city)}".encode("utf-8")).hexdigest()[:16]
+        slug = re.sub(r"[^a-z0-9]+", "-", city).strip("-") or "city"
+        return os.path.join(self.directory, f"{slug}-{digest}")
+
+    def _path(self, city, variant):
+        return self._base(city) + (".png" if variant == "full" else f"-{SMALL_SIZE}.jpg")
+
+    def _write(self, path, data):
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+    # Path to the cached image, drawing (and downscaling) it on first use
+    def path(self, city, variant="full"):
+        city = " ".join(city.split()).lower()
+        if variant not in VARIANTS:
+            raise ValueError(f"Unknown image variant: {variant}")
+        path = self._path(city, variant)
+        if os.path.exists(path):
+            self.hits += 1
+            return path
+        with self._lock:
+            city_lock = self._city_locks.setdefault(self._base(city), threading.Lock())
+        with city_lock:
+            if os.path.exists(path):
+                self.hits += 1
+                return path
+            full_path = self._path(city, "full")
+            if os.path.exists(full_path):
+                with open(full_path, "rb") as f:
+                    data = f.read()
+            else:
+                self.misses += 1
+                data = self.generate(city)
+                self._write(full_path, data)
+            if variant == "small":
+                self._write(path, downscale(data))
+        return path
+
+    def get_bytes(self, city, variant="full"):
+        with open(self.path(city, variant), "rb") as f:
+            return f.read()
+
+    def cached(self, city, variant="full"):
+        return os.path.exists(self._path(city, variant))
+
+    # Draws every missing city up front; failures are reported, not raised
+    def prewarm(self, cities, variants=("full",), workers=PREWARM_WORKERS):
+        def warm(city):
+            try:
+                for variant in variants:
+                    self.path(city, variant)
+                return city, None
+            except Exception as e:
+                return city, e
+
+        missing = [city for city in cities if not all(self.cached(city, v) for v in variants)]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            failed = {city: error for city, error in executor.map(warm, missing) if error is not None}
+        for city, error in failed.items():
+            print(f"Image prewarm failed for {city}: {error}")
+        return {"cities": len(cities), "generated": len(missing) - len(failed), "failed": len(failed)}
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def get_image_cache():
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = ImageCache()
+        return _default
+
+
+def main():
+    from FlightAssistantUsingTools.inventory import get_inventory
+    parser = argparse.ArgumentParser(description="Draw destination images for every city in the inventory")
+    parser.add_argument("--small", action="store_true", help="also build the downscaled variant")
+    parser.add_argument("--workers", type=int, default=PREWARM_WORKERS)
+    args = parser.parse_args()
+    variants = VARIANTS if args.small else ("full",)
+    cities = sorted(get_inventory().cities())
+    print(get_image_cache().prewarm(cities, variants, args.workers))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+import re
+import time
+import logging
+import difflib
+import threading
+
+# Local fast path for the two questions most FlightAI traffic asks: the price of a
+# ticket to a city and the dates flights leave. When a message is clearly one of
+# those (a flight noun, one known city, a price/date keyword, nothing that needs
+# the model such as booking, a date range, a quantity or something other than the
+# flight itself) it is answered from a template straight from the inventory;
+# anything else returns None and goes through the normal tool loop.
+
+logger = logging.getLogger(__name__)
+
+#The question has to be about the flight itself, not food, hotels or the local time
+FLIGHT_WORDS = re.compile(r"\b(tickets?|flights?|fares?|fly|flying)\b")
+PRICE_WORDS = re.compile(r"\b(price|prices|priced|cost|costs|fare|fares|how much|expensive|cheap)\b")
+DATE_WORDS = re.compile(r"\b(when|dates?|available|availability|schedule|slots?|departures?|departing|timings?|times?)\b")
+#Anything here means the user wants more than a lookup
+NEEDS_MODEL = re.compile(
+    r"\b(book|booking|reserve|cancel|change|refund|baggage|luggage|visa|compare|cheapest|between|before|after|"
+    r"until|from|one way|not|don't|dont|without|"
+    #Other things a city has, and "time" in a non-flight sense
+    r"hotels?|food|meals?|vegetarian|vegan|drinks?|visit|visiting|weather|time in|time zone|best time|local time|"
+    #Quantities: the template only knows the price of one ticket
+    r"\d+|two|three|four|five|six|seven|eight|nine|ten|couple|pair|group|family|people|persons?|passengers?|"
+    r"adults?|child|children|kids?|infants?|us)\b"
+)
+WORD = re.compile(r"[^\W\d_]+")
+MAX_WORDS = 30
+FUZZY_CUTOFF = 0.8
+LOG_EVERY = 100
+
+
+class IntentRouter:
+    def __init__(self, inventory, fuzzy=True):
+        self.inventory = inventory
+        self.fuzzy = fuzzy
+        self._lock = threading.Lock()
+        self._cities = None
+        self._longest = 1
+        self._single_words = []
+        self.requests = 0
+        self.hits = 0
+        self.hit_seconds = 0.0
+        self.fallbacks = 0
+        self.fallback_seconds = 0.0
+
+    def _refresh(self):
+        cities = self.inventory.cities()
+        if cities is not self._cities:
+            self._cities = cities
+            self._longest = max((len(city.split()) for city in cities), default=1)
+            self._single_words = sorted(city for city in cities if " " not in city)
+        return cities
+
+    # Cities named in the message: exact word n-grams first, then close single-word
+    # spellings ("tokio", "londn") when nothing matched exactly
+    def find_cities(self, message):
+        cities = self._refresh()
+        words = WORD.findall(message.lower())
+        found = set()
+        for size in range(self._longest, 0, -1):
+            for i in range(len(words) - size + 1):
+                candidate = " ".join(words[i:i + size])
+                if candidate in cities:
+                    found.add(candidate)
+        if not found and self.fuzzy:
+            for word in words:
+                if len(word) >= 5:
+                    found.update(difflib.get_close_matches(word, self._single_words, n=1, cutoff=FUZZY_CUTOFF))
+        return found
+
+    # Returns {"intent": "price" | "dates" | "both", "city": ...} or None
+    def route(self, message):
+        text = " ".join((message or "").lower().split())
+        if not text or len(text.split()) > MAX_WORDS or NEEDS_MODEL.search(text):
+            return None
+        if not FLIGHT_WORDS.search(text):
+            return None
+        price, dates = bool(PRICE_WORDS.search(text)), bool(DATE_WORDS.search(text))
+        if not price and not dates:
+            return None
+        cities = self.find_cities(text)
+        if len(cities) != 1:
+            return None
+        intent = "both" if price and dates else "price" if price else "dates"
+        return {"intent": intent, "city": cities.pop()}
+
+    def render(self, intent, city):
+        name = city.title()
+        price = self.inventory.price(city)
+        if price is None:
+            return None
+        parts = []
+        if intent in ("price", "both"):
+            parts.append(f"A return ticket to {name} costs {price}.")
+        if intent in ("dates", "both"):
+            dates = [d["departs"] for d in self.inventory.departures(city)]
+            if not dates:
+                parts.append(f"There are no seats left on flights to {name}.")
+            elif len(dates) == 1:
+                parts.append(f"The next available flight to {name} leaves on {dates[0]}.")
+            else:
+                parts.append(f"Flights to {name} are available on {', '.join(dates[:-1])} and {dates[-1]}.")
+        return " ".join(parts)
+
+    # Answer for the message, or None when it should go to the model
+    def answer(self, message):
+        start = time.perf_counter()
+        decision = self.route(message)
+        reply = self.render(decision["intent"], decision["city"]) if decision else None
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.requests += 1
+            if reply is not None:
+                self.hits += 1
+                self.hit_seconds += elapsed
+            if self.requests % LOG_EVERY == 0:
+                logger.info("intent router: %s", self.stats())
+        return reply
+
+    # The caller reports how long the full tool loop took, so the savings are
+    # measured against real model latency rather than a guess
+    def record_fallback(self, seconds):
+        with self._lock:
+            self.fallbacks += 1
+            self.fallback_seconds += seconds
+
+    def stats(self):
+        hit_ms = self.hit_seconds / self.hits * 1000 if self.hits else 0.0
+        fallback_ms = self.fallback_seconds / self.fallbacks * 1000 if self.fallbacks else None
+        saved = self.hits * (fallback_ms - hit_ms) / 1000 if fallback_ms is not None else None
+        return {
+            "requests": self.requests,
+            "hits": self.hits,
+            "hit_rate": self.hits / self.requests if self.requests else 0.0,
+            "avg_hit_ms": hit_ms,
+            "avg_fallback_ms": fallback_ms,
+            "latency_saved_s": saved,
+        }
@@ -0,0 +1,261 @@
+import os
+import sys
+import time
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Common.storage import cache_path, connect
+
+# Flight inventory shared by the FlightAI assistants: routes and departure slots in
+# SQLite, per-slot seat counts decremented atomically, and a small read-through
+# cache in front of the per-city lookups the tools make on every turn
+
+INVENTORY_DB = os.getenv("INVENTORY_DB")
+DEFAULT_SEATS = int(os.getenv("INVENTORY_SEATS", "50"))
+CACHE_TTL = float(os.getenv("INVENTORY_CACHE_TTL", "5"))
+CACHE_SIZE = int(os.getenv("INVENTORY_CACHE_SIZE", "1024"))
+DATE_FORMAT = "%Y-%m-%d %H:%M"
+
+# Seed data, loaded into an empty database on first use
+DEFAULT_ROUTES = {
+    "london": {"price": "₹58,000", "dates": ["2025-10-05 01:35", "2025-10-06 14:25", "2025-10-07 07:00"]},
+    "paris": {"price": "₹62,000", "dates": ["2025-10-10 02:00", "2025-10-12 15:30", "2025-10-15 20:00"]},
+    "tokyo": {"price": "₹75,000", "dates": ["2025-10-08 05:00", "2025-10-11 11:15", "2025-10-14 22:45"]},
+    "new york": {"price": "₹70,000", "dates": ["2025-10-03 03:50", "2025-10-07 17:20", "2025-10-09 23:10"]},
+    "dubai": {"price": "₹22,000", "dates": ["2025-10-05 06:30", "2025-10-06 13:00", "2025-10-08 19:45"]},
+    "singapore": {"price": "₹28,000", "dates": ["2025-10-04 08:15", "2025-10-06 14:50", "2025-10-09 21:00"]}
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS routes (
+    city TEXT PRIMARY KEY,
+    price TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS slots (
+    city TEXT NOT NULL REFERENCES routes(city),
+    departs TEXT NOT NULL,
+    seats INTEGER NOT NULL CHECK (seats >= 0),
+    PRIMARY KEY (city, departs)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS slots_by_departure ON slots(departs, city);
+"""
+
+
+def normalize_city(city):
+    return " ".join((city or "").split()).lower()
+
+
+# Departure times are stored as "YYYY-MM-DD HH:MM" so string order is time order;
+# returns None for anything that does not parse
+def normalize_departure(value):
+    if isinstance(value, datetime):
+        return value.strftime(DATE_FORMAT)
+    value = (value or "").strip().replace("T", " ")
+    for fmt in (DATE_FORMAT, "%Y-%m-%d %H:%M:%S", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(value, fmt).strftime(DATE_FORMAT)
+        except ValueError:
+            continue
+    return None
+
+
+# Inclusive [start, end] bounds, None where no bound is given; a bare date as end
+# includes that whole day. A bound that does not parse raises ValueError.
+def departure_range(start=None, end=None):
+    low = normalize_departure(start) if start else None
+    high = normalize_departure(end) if end else None
+    for given, parsed in ((start, low), (end, high)):
+        if given and parsed is None:
+            raise ValueError(f"Unrecognised date {given!r}, use YYYY-MM-DD or YYYY-MM-DD HH:MM")
+    if high and len(str(end).strip()) == 10:
+        high = high[:10] + " 23:59"
+    return low, high
+
+
+class FlightInventory:
+    def __init__(self, path=None, cache_ttl=CACHE_TTL, cache_size=CACHE_SIZE):
+        self.path = path or INVENTORY_DB or cache_path("flights.db")
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self._conn = connect(self.path)
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._cities = None
+        self.hits = 0
+        self.misses = 0
+
+    # ---- loading ----
+
+    def add_route(self, city, price):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO routes (city, price) VALUES (?, ?) ON CONFLICT(city) DO UPDATE SET price = excluded.price",
+                (normalize_city(city), price)
+            )
+            self._cache.pop(normalize_city(city), None)
+            self._cities = None
+
+    def add_slot(self, city, departs, seats=DEFAULT_SEATS):
+        self.add_slots(city, [departs], seats)
+
+    def add_slots(self, city, departures, seats=DEFAULT_SEATS):
+        city = normalize_city(city)
+        rows = [(city, d, seats) for d in map(normalize_departure, departures) if d]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO slots (city, departs, seats) VALUES (?, ?, ?) "
+                    "ON CONFLICT(city, departs) DO UPDATE SET seats = excluded.seats",
+                    rows
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._cache.pop(city, None)
+        return len(rows)
+
+    def load(self, routes, seats=DEFAULT_SEATS):
+        for city, info in routes.items():
+            self.add_route(city, info["price"])
+            self.add_slots(city, info["dates"], seats)
+
+    def is_empty(self):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM routes LIMIT 1").fetchone() is None
+
+    # ---- reads ----
+
+    # Read-through: a city's price and open slots come from memory until the entry
+    # expires or a booking on that city invalidates it
+    def _route(self, city):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._cache.get(city)
+            if entry and entry[0] > now:
+                self._cache.move_to_end(city)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            row = self._conn.execute("SELECT price FROM routes WHERE city = ?", (city,)).fetchone()
+            if row is None:
+                route = None
+            else:
+                slots = self._conn.execute(
+                    "SELECT departs, seats FROM slots WHERE city = ? ORDER BY departs", (city,)
+                ).fetchall()
+                route = {"price": row[0], "slots": slots}
+            self._cache[city] = (now + self.cache_ttl, route)
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            return route
+
+    # All route names, cached like the per-city entries
+    def cities(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._cities is None or self._cities[0] <= now:
+                rows = self._conn.execute("SELECT city FROM routes").fetchall()
+                self._cities = (now + self.cache_ttl, frozenset(row[0] for row in rows))
+            return self._cities[1]
+
+    def price(self, city):
+        route = self._route(normalize_city(city))
+        return route["price"] if route else None
+
+    # Departures for a city, optionally limited to [start, end]; an unparseable bound
+    # raises ValueError rather than being ignored
+    def departures(self, city, start=None, end=None, available_only=True):
+        low, high = departure_range(start, end)
+        route = self._route(normalize_city(city))
+        if route is None:
+            return None
+        return [
+            {"departs": departs, "seats": seats}
+            for departs, seats in route["slots"]
+            if (not available_only or seats > 0) and (low is None or departs >= low) and (high is None or departs <= high)
+        ]
+
+    # Every city with a departure in [start, end] (either may be None), answered from
+    # the departure index
+    def departures_between(self, start=None, end=None, available_only=True):
+        low, high = departure_range(start, end)
+        conditions, params = [], []
+        if low is not None:
+            conditions.append("departs >= ?")
+            params.append(low)
+        if high is not None:
+            conditions.append("departs <= ?")
+            params.append(high)
+        if available_only:
+            conditions.append("seats > 0")
+        query = "SELECT city, departs, seats FROM slots"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY departs", params).fetchall()
+        return [{"city": city, "departs": departs, "seats": seats} for city, departs, seats in rows]
+
+    def seats(self, city, departs):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT seats FROM slots WHERE city = ? AND departs = ?",
+                (normalize_city(city), normalize_departure(departs))
+            ).fetchone()
+        return row[0] if row else None
+
+    # ---- bookings ----
+
+    # Takes seats only if enough are left; the check and the decrement are one
+    # UPDATE, so concurrent sessions (or processes) can never oversell a slot.
+    # Returns "booked", "sold_out" or "no_slot"
+    def reserve(self, city, departs, seats=1):
+        city, departs = normalize_city(city), normalize_departure(departs)
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE slots SET seats = seats - ? WHERE city = ? AND departs = ? AND seats >= ?",
+                (seats, city, departs, seats)
+            )
+            self._cache.pop(city, None)
+            if cursor.rowcount == 1:
+                return "booked"
+            exists = self._conn.execute(
+                "SELECT 1 FROM slots WHERE city = ? AND departs = ?", (city, departs)
+            ).fetchone()
+        return "sold_out" if exists else "no_slot"
+
+    def release(self, city, departs, seats=1):
+        city, departs = normalize_city(city), normalize_departure(departs)
+        with self._lock:
+            self._conn.execute(
+                "UPDATE slots SET seats = seats + ? WHERE city = ? AND departs = ?", (seats, city, departs)
+            )
+            self._cache.pop(city, None)
+
+    def stats(self):
+        with self._lock:
+            routes = self._conn.execute("SELECT COUNT(*) FROM routes").fetchone()[0]
+            slots = self._conn.execute("SELECT COUNT(*) FROM slots").fetchone()[0]
+        return {"routes": routes, "slots": slots, "cache_hits": self.hits, "cache_misses": self.misses}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def get_inventory():
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = FlightInventory()
+            if _default.is_empty():
+                _default.load(DEFAULT_ROUTES)
+        return _default
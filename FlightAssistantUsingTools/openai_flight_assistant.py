@@ -1,15 +1,23 @@
 import os
+import sys
 import json
-import gradio as gr
-from openai import OpenAI
-from dotenv import load_dotenv
+import time
+import threading
 
-load_dotenv(override=True)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Common.context_window import ContextWindow
+from Common.providers import get_provider
+from Common.rate_limit import estimate_tokens, limited
+from Common.telemetry import record_response, span, start_metrics_server
+from FlightAssistantUsingTools.inventory import get_inventory
+from FlightAssistantUsingTools.intent_router import IntentRouter
 
 model = os.getenv("GPT_MODEL")
 openai_api_key = os.getenv("OPENAI_API_KEY")
 
-openai = OpenAI()
+# Pooled OpenAI client shared with the rest of the process, created on first use
+def openai():
+    return get_provider("openai").client
 
 system_prompt = (
     "You are a helpful assistant for flightAI. "
@@ -18,35 +26,21 @@ system_prompt = (
     "If you don't know the answer, just say so."
 )
 
-# Tools data
-ticket_prices = {
-    "london": "₹58,000",
-    "paris": "₹62,000",
-    "tokyo": "₹75,000",
-    "new york": "₹70,000",
-    "dubai": "₹22,000",
-    "singapore": "₹28,000"
-}
-
-dates_available = {
-    "london": {"price": "₹58,000", "dates": ["2025-10-05 01:35", "2025-10-06 14:25", "2025-10-07 07:00"]},
-    "paris": {"price": "₹62,000", "dates": ["2025-10-10 02:00", "2025-10-12 15:30", "2025-10-15 20:00"]},
-    "tokyo": {"price": "₹75,000", "dates": ["2025-10-08 05:00", "2025-10-11 11:15", "2025-10-14 22:45"]},
-    "new york": {"price": "₹70,000", "dates": ["2025-10-03 03:50", "2025-10-07 17:20", "2025-10-09 23:10"]},
-    "dubai": {"price": "₹22,000", "dates": ["2025-10-05 06:30", "2025-10-06 13:00", "2025-10-08 19:45"]},
-    "singapore": {"price": "₹28,000", "dates": ["2025-10-04 08:15", "2025-10-06 14:50", "2025-10-09 21:00"]}
-}
+# Tools data: routes, departures and seat counts live in the shared inventory,
+# opened on the first tool call (get_inventory())
 
 # Functions
 def get_ticket_price(destination_city):
     print(f"Tool get_ticket_price called for {destination_city}")
-    city = destination_city.lower()
-    return ticket_prices.get(city, "Unknown")
+    return get_inventory().price(destination_city) or "Unknown"
 
 def get_available_dandt(destination_city):
     print(f"Tool get_available_dandt called for {destination_city}")
-    city = destination_city.lower()
-    return dates_available.get(city, "NA")
+    inventory = get_inventory()
+    price = inventory.price(destination_city)
+    if price is None:
+        return "NA"
+    return {"price": price, "dates": [d["departs"] for d in inventory.departures(destination_city)]}
 
 # Tool definitions
 price_function = {
@@ -91,14 +85,15 @@ def handle_tool_call(message):
     arguments = json.loads(tool_call.function.arguments)
     city = arguments.get("destination_city")
 
-    if func_name == "get_ticket_price":
-        result = get_ticket_price(city)
-        content = {"destination_city": city, "price": result}
-    elif func_name == "get_available_dandt":
-        result = get_available_dandt(city)
-        content = {"destination_city": city, "dates_info": result}
-    else:
-        content = {"error": "Unknown tool"}
+    with span("tool", labels={"tool": func_name}):
+        if func_name == "get_ticket_price":
+            result = get_ticket_price(city)
+            content = {"destination_city": city, "price": result}
+        elif func_name == "get_available_dandt":
+            result = get_available_dandt(city)
+            content = {"destination_city": city, "dates_info": result}
+        else:
+            content = {"error": "Unknown tool"}
 
     return {
         "role": "tool",
@@ -106,15 +101,53 @@ def handle_tool_call(message):
         "tool_call_id": tool_call.id
     }
 
-# Chat handler
-def chat(message, history):
-    messages = [{"role": "system", "content": system_prompt}] + history + [{"role": "user", "content": message}]
+# Optional: price and date questions about one known city are answered locally, without a
+# model call (FLIGHT_FAST_PATH=1 turns it on)
+FAST_PATH = os.getenv("FLIGHT_FAST_PATH", "0") == "1"
+_router = None
+_router_lock = threading.Lock()
+
+def get_router():
+    global _router
+    if not FAST_PATH:
+        return None
+    with _router_lock:
+        if _router is None:
+            _router = IntentRouter(get_inventory())
+        return _router
+
+# Long sessions keep the recent turns verbatim and fold older ones into a summary
+context = ContextWindow(model=model, summary_model=model, summary_provider="openai")
 
-    response = openai.chat.completions.create(
-        model=model,
-        messages=messages,
-        tools=tools
-    )
+# Chat handler
+# gr.Request is resolved from the module globals once build_ui() has imported gradio
+def chat(message, history, request: "gr.Request" = None):
+    router = get_router()
+    if router:
+        with span("fast_path") as current:
+            answer = router.answer(message)
+            current.set(hit=answer is not None)
+        if answer is not None:
+            return answer
+        start = time.perf_counter()
+        reply = answer_with_tools(message, history, request)
+        router.record_fallback(time.perf_counter() - start)
+        return reply
+    return answer_with_tools(message, history, request)
+
+def answer_with_tools(message, history, request=None):
+    session_id = request.session_hash if request else "default"
+    messages = context.build(system_prompt, history, message, session_id)
+
+    # Model turns share the process-wide rate limiter, which retries 429s and 5xx
+    with span("model_turn", labels={"model": model}):
+        response = limited("openai", model, openai().chat.completions.create,
+            model=model,
+            messages=messages,
+            tools=tools,
+            tokens=estimate_tokens(messages)
+        )
+        record_response(model, response)
 
     reply = response.choices[0].message
 
@@ -123,13 +156,27 @@ def chat(message, history):
         messages.append(reply)
         messages.append(tool_response)
 
-        final_response = openai.chat.completions.create(
-            model=model,
-            messages=messages
-        )
+        with span("model_turn", labels={"model": model}):
+            final_response = limited("openai", model, openai().chat.completions.create,
+                model=model,
+                messages=messages,
+                tokens=estimate_tokens(messages)
+            )
+            record_response(model, final_response)
         return final_response.choices[0].message.content
     else:
         return reply.content
 
+# Gradio is only imported when the UI is built, so importing this module stays cheap
+def build_ui():
+    global gr
+    import gradio as gr
+    return gr.ChatInterface(fn=chat, type="messages")
+
+def main():
+    start_metrics_server()
+    build_ui().launch()
+
 # Launch Gradio
-gr.ChatInterface(fn=chat, type="messages").launch()
+if __name__ == "__main__":
+    main()
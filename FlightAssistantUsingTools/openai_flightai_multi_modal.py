@@ -1,113 +1,109 @@
 import os
+import sys
 import json
-from dotenv import load_dotenv
-from openai import OpenAI
-import gradio as gr
+import logging
+from concurrent.futures import ThreadPoolExecutor
 
-# Image gen imports
-import base64
-from PIL import Image
-from io import BytesIO
-from datetime import datetime
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Common.context_window import ContextWindow
+from Common.providers import get_provider
+from Common.rate_limit import estimate_tokens, limited_stream
+from Common.streaming import StreamStats, stream_text
+from Common.telemetry import record_response, registry, span, start_metrics_server, with_current_span
+from FlightAssistantUsingTools.inventory import get_inventory, normalize_city, normalize_departure
+from FlightAssistantUsingTools.booking_journal import get_journal
+from FlightAssistantUsingTools.image_cache import get_image_cache
 
-load_dotenv(override=True)
+logger = logging.getLogger(__name__)
 
 model = os.getenv("GPT_MODEL")
 openai_api_key = os.getenv("OPENAI_API_KEY")
 
-openai = OpenAI()
+# Pooled OpenAI client shared with the rest of the process, created on first use
+def openai():
+    return get_provider("openai").client
+
+# Tool calls from one model turn run side by side; images are drawn in the background
+tool_pool = ThreadPoolExecutor(max_workers=int(os.getenv("FLIGHT_TOOL_WORKERS", "8")))
+image_pool = ThreadPoolExecutor(max_workers=int(os.getenv("FLIGHT_IMAGE_WORKERS", "2")))
 
 system_message = "You are a helpful assistant for an Airline called FlightAI. "
 system_message += "Give short, courteous answers, no more than 1 sentence. "
 system_message += "Always be accurate. If you don't know the answer, say so."
 
-# Tools data
-ticket_prices = {
-    "london": "₹58,000",
-    "paris": "₹62,000",
-    "tokyo": "₹75,000",
-    "new york": "₹70,000",
-    "dubai": "₹22,000",
-    "singapore": "₹28,000"
-}
-
-dates_available = {
-    "london": {"price": "₹58,000", "dates": ["2025-10-05 01:35", "2025-10-06 14:25", "2025-10-07 07:00"]},
-    "paris": {"price": "₹62,000", "dates": ["2025-10-10 02:00", "2025-10-12 15:30", "2025-10-15 20:00"]},
-    "tokyo": {"price": "₹75,000", "dates": ["2025-10-08 05:00", "2025-10-11 11:15", "2025-10-14 22:45"]},
-    "new york": {"price": "₹70,000", "dates": ["2025-10-03 03:50", "2025-10-07 17:20", "2025-10-09 23:10"]},
-    "dubai": {"price": "₹22,000", "dates": ["2025-10-05 06:30", "2025-10-06 13:00", "2025-10-08 19:45"]},
-    "singapore": {"price": "₹28,000", "dates": ["2025-10-04 08:15", "2025-10-06 14:50", "2025-10-09 21:00"]}
-}
-
-# ✅ Normalize date format
-def format_dates(dates_list):
-    formatted = []
-    for d in dates_list:
-        try:
-            dt = datetime.strptime(d, "%Y-%m-%d %H:%M")
-            formatted.append(dt.strftime("%Y-%m-%d %H:%M"))
-        except ValueError:
-            continue
-    return formatted
-
-for city, info in dates_available.items():
-    dates_available[city]["dates"] = format_dates(info["dates"])
+# Tools data: routes, departures and seat counts live in the shared inventory (get_inventory());
+# confirmed bookings go to an append-only journal looked up by booking id (get_journal()).
+# Both are opened on first use, so importing this module touches no files or threads.
 
 # ---------------- TOOLS ---------------- #
 
 def get_ticket_price(destination_city):
     print(f"Tool get_ticket_price is called for {destination_city}")
-    city = destination_city.lower()
-    return ticket_prices.get(city, "Unknown")
+    return get_inventory().price(destination_city) or "Unknown"
 
-def get_available_dates(destination_city):
+def get_available_dates(destination_city, from_date=None, to_date=None):
     print(f"Tool get_available_dates is called for {destination_city}")
-    city = destination_city.lower()
-    available = dates_available.get(city, None)
-
-    if not available:
-        return {"status": "failed", "message": "No flights found"}
+    inventory = get_inventory()
+    city = normalize_city(destination_city)
+    try:
+        departures = inventory.departures(city, from_date, to_date)
+    except ValueError as e:
+        return {"status": "failed", "message": str(e)}
+
+    if departures is None:
+        return {"status": "failed", "message": f"No flights found for {city}"}
+    if not departures:
+        return {"status": "failed", "message": "No flights found in that date range" if from_date or to_date else "No flights found"}
 
     return {
         "status": "success",
         "city": city,
-        "price": available["price"],
-        "available_slots": available["dates"]
+        "price": inventory.price(city),
+        "available_slots": [d["departs"] for d in departures]
     }
 
 def book_ticket(destination_city, chosen_date_time):
     print(f"Tool book_ticket is called for {destination_city} - {chosen_date_time}")
-    city = destination_city.lower()
-    available = dates_available.get(city, None)
+    inventory = get_inventory()
+    city = normalize_city(destination_city)
+    price = inventory.price(city)
 
-    if not available:
+    if price is None:
         return {"status": "failed", "message": f"No flights found for {city}"}
 
-    if chosen_date_time not in available["dates"]:
+    # ✅ Seat is taken atomically, two sessions can't both get the last one
+    result = inventory.reserve(city, chosen_date_time)
+    if result != "booked":
+        options = [d["departs"] for d in inventory.departures(city)]
+        reason = "Sold out" if result == "sold_out" else "Invalid slot"
         return {
             "status": "failed",
-            "message": f"Invalid slot. Available options are: {available['dates']}"
+            "message": f"{reason}. Available options are: {options}"
         }
+    chosen_date_time = normalize_departure(chosen_date_time)
 
-    ticket_text = f"""
---- FlightAI Ticket Confirmation ---
-Destination: {city.title()}
-Date & Time: {chosen_date_time}
-Price: {available['price']}
-Status: Confirmed
-"""
-
-    with open("ticket.txt", "w", encoding="utf-8") as f:
-        f.write(ticket_text)
+    # ✅ Returns once the booking is durably on disk; if it can't be written, give the seat back
+    try:
+        booking_id = get_journal().book(city=city, date=chosen_date_time, price=price)
+    except OSError as e:
+        inventory.release(city, chosen_date_time)
+        return {"status": "failed", "message": f"Booking could not be saved: {e}"}
 
     return {
         "status": "success",
         "message": "Ticket booked successfully",
+        "booking_id": booking_id,
         "city": city,
         "date": chosen_date_time
     }
 
+def get_booking(booking_id):
+    print(f"Tool get_booking is called for {booking_id}")
+    booking = get_journal().lookup((booking_id or "").strip().upper())
+    if not booking:
+        return {"status": "failed", "message": f"No booking found with id {booking_id}"}
+    return {"status": "success", **booking}
+
 # ---------------- TOOL DEFINITIONS ---------------- #
 
 price_function = {
@@ -134,6 +130,14 @@ date_function = {
             "destination_city": {
                 "type": "string",
                 "description": "The city for which the customer wants to know the available dates"
+            },
+            "from_date": {
+                "type": "string",
+                "description": "Optional earliest departure (YYYY-MM-DD or YYYY-MM-DD HH:MM)"
+            },
+            "to_date": {
+                "type": "string",
+                "description": "Optional latest departure (YYYY-MM-DD or YYYY-MM-DD HH:MM)"
             }
         },
         "required": ["destination_city"]
@@ -153,117 +157,205 @@ ticket_function = {
     }
 }
 
+booking_function = {
+    "name": "get_booking",
+    "description": "Look up a booking confirmation by its booking id.",
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "booking_id": {"type": "string", "description": "The booking id given at confirmation, e.g. FA-1A2B3C4D5E6F"}
+        },
+        "required": ["booking_id"]
+    }
+}
+
 tools = [
     {"type": "function", "function": price_function},
     {"type": "function", "function": date_function},
-    {"type": "function", "function": ticket_function}
+    {"type": "function", "function": ticket_function},
+    {"type": "function", "function": booking_function}
 ]
 
 # ---------------- TOOL HANDLER ---------------- #
 
 def handle_tool_call(tool_call):
-    func_name = tool_call.function.name
-    arguments = json.loads(tool_call.function.arguments)
-
-    if func_name == "get_ticket_price":
-        city = arguments.get("destination_city")
-        result = get_ticket_price(city)
-        content = {"destination_city": city, "price": result}
-
-    elif func_name == "get_available_dates":    
-        city = arguments.get("destination_city")
-        result = get_available_dates(city)
-        content = result
-
-    elif func_name == "book_ticket":
-        city = arguments.get("destination_city")
-        date = arguments.get("chosen_date_time")
-        result = book_ticket(city, date)
-        content = result
-
-    else:
-        content = {"error": "Unknown tool"}
+    func_name = tool_call["name"]
+    try:
+        arguments = json.loads(tool_call["arguments"] or "{}")
+    except json.JSONDecodeError:
+        arguments = {}
+
+    # Every tool call is timed into the per-tool latency histogram
+    with span("tool", labels={"tool": func_name}):
+        if func_name == "get_ticket_price":
+            city = arguments.get("destination_city")
+            result = get_ticket_price(city)
+            content = {"destination_city": city, "price": result}
+
+        elif func_name == "get_available_dates":    
+            city = arguments.get("destination_city")
+            result = get_available_dates(city, arguments.get("from_date"), arguments.get("to_date"))
+            content = result
+
+        elif func_name == "book_ticket":
+            city = arguments.get("destination_city")
+            date = arguments.get("chosen_date_time")
+            result = book_ticket(city, date)
+            content = result
+
+        elif func_name == "get_booking":
+            content = get_booking(arguments.get("booking_id"))
+
+        else:
+            content = {"error": "Unknown tool"}
 
     return {
         "role": "tool",
         "content": json.dumps(content),
-        "tool_call_id": tool_call.id
+        "tool_call_id": tool_call["id"]
     }, content
 
 # ---------------- IMAGE GENERATION ---------------- #
 
+# Destination images are drawn once per city and served from disk as a file path
+# "small" serves the downscaled variant
+IMAGE_VARIANT = os.getenv("FLIGHT_IMAGE_VARIANT", "full")
+
 def artist(city):
-    image_response = openai.images.generate(
-        model="dall-e-3",
-        prompt=f"An image representing a vacation in {city}, showing tourist spots and everything unique about {city}, in a simple art style",
-        size="1024x1024",
-        n=1,
-        response_format="b64_json"
-    )
-
-    image_base64 = image_response.data[0].b64_json
-    image_data = base64.b64decode(image_base64)
-    return Image.open(BytesIO(image_data))
+    image_cache = get_image_cache()
+    with span("image", labels={"variant": IMAGE_VARIANT}, city=city, cached=image_cache.cached(city, IMAGE_VARIANT)):
+        return image_cache.path(city, IMAGE_VARIANT)
 
 # ---------------- CHAT LOGIC ---------------- #
 
-def chat(history):
-    messages = [{"role": "system", "content": system_message}] + history
+# Long sessions keep the recent turns verbatim and fold older ones into a summary
+context = ContextWindow(model=model, summary_model=model, summary_provider="openai")
+
+# Streams one model turn: text deltas are yielded as they arrive, tool call
+# fragments are stitched together into tool_calls (keyed by their index)
+def stream_turn(messages, tool_calls):
+    with span("model_turn", labels={"model": model}):
+        yield from _stream_turn(messages, tool_calls)
 
-    response = openai.chat.completions.create(
-        model=model,
-        messages=messages,
-        tools=tools
-    )
+# The rate limiter retries the request until its first chunk arrives and holds
+# a concurrency slot until the stream ends
+def _stream_turn(messages, tool_calls):
+    def chunks():
+        yield from openai().chat.completions.create(
+            model=model,
+            messages=messages,
+            tools=tools,
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+    for chunk in limited_stream("openai", model, chunks, tokens=estimate_tokens(messages)):
+        if getattr(chunk, "usage", None):
+            record_response(model, chunk)
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta
+        for call in delta.tool_calls or []:
+            entry = tool_calls.setdefault(call.index, {"id": "", "name": "", "arguments": ""})
+            if call.id:
+                entry["id"] = call.id
+            if call.function and call.function.name:
+                entry["name"] += call.function.name
+            if call.function and call.function.arguments:
+                entry["arguments"] += call.function.arguments
+        if delta.content:
+            yield delta.content
+
+def stream_turn_text(messages, tool_calls):
+    # Coalesced updates: the chat refreshes per batch of tokens, not per token
+    yield from stream_text(stream_turn(messages, tool_calls), stats=StreamStats(model, "flightai"))
+
+# gr.Request is resolved from the module globals once build_ui() has imported gradio
+def chat(history, request: "gr.Request" = None):
+    session_id = request.session_hash if request else "default"
+    messages = context.build(system_message, history, session_id=session_id)
 
     image = None
+    pending_image = None
     tool_outputs = []
-
-    while response.choices[0].message.tool_calls is not None:
-        tool_calls = response.choices[0].message.tool_calls
-        print("DEBUG: Tool calls found:", tool_calls)
-
-        messages.append(response.choices[0].message)
-
-        for tool_call in tool_calls:
-            tool_response, content = handle_tool_call(tool_call)
+    reply = ""
+
+    while True:
+        tool_calls = {}
+        reply = ""
+        for reply in stream_turn_text(messages, tool_calls):
+            if pending_image is not None and image is None and pending_image.done() and not pending_image.exception():
+                image = pending_image.result()
+            yield history + [{"role": "assistant", "content": reply}], image
+
+        if not tool_calls:
+            break
+
+        calls = [tool_calls[index] for index in sorted(tool_calls)]
+        messages.append({
+            "role": "assistant",
+            "content": reply or None,
+            "tool_calls": [
+                {"id": call["id"], "type": "function", "function": {"name": call["name"], "arguments": call["arguments"]}}
+                for call in calls
+            ]
+        })
+
+        # ✅ All tool calls of this turn run concurrently, replies keep the call order
+        for call, (tool_response, content) in zip(calls, tool_pool.map(with_current_span(handle_tool_call), calls)):
             messages.append(tool_response)
             tool_outputs.append(content)
 
-            # ✅ Image generation only after confirmed booking
-            if content.get("status") == "success" and tool_call.function.name == "book_ticket":
-                city = content.get("city")
-                image = artist(city)
-
-        response = openai.chat.completions.create(
-            model=model,
-            messages=messages,
-            tools=tools
-        )
+            # ✅ Image generation only after confirmed booking, without holding up the reply
+            if content.get("status") == "success" and call["name"] == "book_ticket":
+                pending_image = image_pool.submit(with_current_span(artist), content.get("city"))
+                image = None
 
-    reply = response.choices[0].message.content
     history += [{"role": "assistant", "content": reply}]
+    yield history, image
 
-    return history, image
+    # The text is already on screen, the image follows as soon as it is drawn
+    if pending_image is not None and image is None:
+        try:
+            image = pending_image.result()
+        except Exception:
+            # The "image" span already carries the error type; the traceback goes to the log
+            logger.warning("image generation failed", exc_info=True)
+            registry.inc("flight_image_failures_total")
+            return
+        yield history, image
 
 # ---------------- GRADIO UI ---------------- #
 
-with gr.Blocks() as ui:
-    with gr.Row():
-        chatbot = gr.Chatbot(height=500, type="messages")
-        image_output = gr.Image(height=500)
-    with gr.Row():
-        entry = gr.Textbox(label="Chat with our AI Assistant:")
-    with gr.Row():
-        clear = gr.ClearButton()
-
-    def do_entry(message, history):
-        history += [{"role": "user", "content": message}]
-        return "", history
-
-    entry.submit(do_entry, inputs=[entry, chatbot], outputs=[entry, chatbot]).then(
-        chat, inputs=chatbot, outputs=[chatbot, image_output]
-    )
-    clear.click(lambda: None, inputs=None, outputs=chatbot, queue=False)
-
-ui.launch(inbrowser=True)
+def do_entry(message, history):
+    history += [{"role": "user", "content": message}]
+    return "", history
+
+# Gradio is only imported when the UI is built, so importing this module stays cheap
+def build_ui():
+    global gr
+    import gradio as gr
+    with gr.Blocks() as ui:
+        with gr.Row():
+            chatbot = gr.Chatbot(height=500, type="messages")
+            image_output = gr.Image(height=500, type="filepath")
+        with gr.Row():
+            entry = gr.Textbox(label="Chat with our AI Assistant:")
+        with gr.Row():
+            clear = gr.ClearButton()
+
+        entry.submit(do_entry, inputs=[entry, chatbot], outputs=[entry, chatbot]).then(
+            chat, inputs=chatbot, outputs=[chatbot, image_output]
+        )
+        clear.click(lambda: None, inputs=None, outputs=chatbot, queue=False)
+    return ui
+
+def main():
+    start_metrics_server()
+    image_cache = get_image_cache()
+    # Optionally draw every destination at startup so no booking waits for DALL·E
+    if os.getenv("FLIGHT_IMAGE_PREWARM", "0") == "1":
+        image_pool.submit(image_cache.prewarm, sorted(get_inventory().cities()), (IMAGE_VARIANT,))
+    build_ui().launch(inbrowser=True, allowed_paths=[image_cache.directory])
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+#Gradio front end for the brochure generator; python -m Gradio.web_scraping_ui_gradio launches it
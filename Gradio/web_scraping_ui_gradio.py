@@ -1,34 +1,38 @@
-import os, requests
-from openai import OpenAI
-from dotenv import load_dotenv
-from bs4 import BeautifulSoup
-import gradio as gr
+import os, sys
 
-#Loading env variables and getting api key
-load_dotenv(override=True)
-api_key = os.getenv("OPENAI_API_KEY")
-MODEL = os.getenv("GPT_MODEL")
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Common.extract import extract
+from Common.page_cache import get_page, aget_page
+from Common.providers import get_provider
+from Common.streaming import StreamStats, astream_text, stream_text
+from Common.telemetry import span, start_metrics_server
 
-#Calling an instance of openai
-openai = OpenAI()
+#Env file is loaded by Common; getting api key
+api_key = os.getenv("OPENAI_API_KEY")
+#Backend is picked from the env file (BROCHURE_PROVIDER / LLM_PROVIDER), OpenAI by default
+provider = get_provider(os.getenv("BROCHURE_PROVIDER"))
+MODEL = os.getenv("BROCHURE_MODEL") or provider.default_model
+#Async handlers keep an in-flight brochure off the worker threads; the queue limits
+#how many run at once and how many may wait
+ASYNC_HANDLER = os.getenv("BROCHURE_ASYNC", "1") != "0"
+CONCURRENCY_LIMIT = int(os.getenv("BROCHURE_CONCURRENCY", "200"))
+QUEUE_SIZE = int(os.getenv("BROCHURE_QUEUE_SIZE", "1000"))
 
-#Scraping the website
+#Scraping the website through the shared page cache and extraction engine
 class Website:
     url: str
     text: str
     title: str
-    def __init__(self, url):
+    def __init__(self, url, page=None):
         self.url = url
-        response = requests.get(url)
-        self.body = response.content
-        soup = BeautifulSoup(self.body, 'html.parser')
-        self.title = soup.title.string if soup.title else "No title found"
-        if soup.body:
-            for irrelevant in soup.body(["script", "style", "img", "input"]):
-                irrelevant.decompose()
-            self.text = soup.body.get_text(separator="\n", strip=True)
-        else:
-            self.text = ""
+        if page is None:
+            page = get_page(url, extract)
+        self.title = page["title"]
+        self.text = page["text"]
+
+    @classmethod
+    async def fetch(cls, url):
+        return cls(url, await aget_page(url, extract))
 
     def get_all_contents(self):
         return f"Webpage Title:\n{self.title}\nWebpage Contents:\n{self.text}\n\n"
@@ -42,34 +46,65 @@ def stream_gpt(user_prompt):
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": user_prompt}
     ]
-    response = openai.chat.completions.create(
-        model=MODEL,
-        messages=messages,
-        stream=True
-    )
-    result = ""
-    for chunk in response:
-        result += chunk.choices[0].delta.content or ""
-        yield result
+    #Coalesced updates: the markdown is refreshed per batch of tokens, not per token
+    yield from stream_text(provider.stream(messages, MODEL), stats=StreamStats(MODEL, "brochure"))
+
+async def stream_gpt_async(user_prompt):
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
+    async for text in astream_text(provider.astream(messages, MODEL), stats=StreamStats(MODEL, "brochure")):
+        yield text
+
+def brochure_prompt(company_name, website, tone):
+    user_prompt = f"Please generate a company brochure for {company_name} and keep your tone {tone}\. Here is their landing page:\n"
+    user_prompt += website.get_all_contents()
+    return user_prompt
 
 #Using this function we will call the stream function
 def stream_brochure(company_name, url, tone="normal"):
     yield ""
-    user_prompt = f"Please generate a company brochure for {company_name} and keep your tone {tone}\. Here is their landing page:\n"
-    user_prompt += Website(url).get_all_contents()
-    result = stream_gpt(user_prompt)
-    yield from result
+    with span("stream_brochure", url=url):
+        website = Website(url)
+        with span("prompt"):
+            user_prompt = brochure_prompt(company_name, website, tone)
+        with span("generate", labels={"model": MODEL}):
+            yield from stream_gpt(user_prompt)
+
+#Same flow on the event loop: async fetch, parse off-loop, AsyncOpenAI (or other backend) stream
+async def stream_brochure_async(company_name, url, tone="normal"):
+    yield ""
+    with span("stream_brochure", url=url):
+        website = await Website.fetch(url)
+        with span("prompt"):
+            user_prompt = brochure_prompt(company_name, website, tone)
+        with span("generate", labels={"model": MODEL}):
+            async for text in stream_gpt_async(user_prompt):
+                yield text
+
+#Gradio is only imported when the UI is built, so the handlers can be imported cheaply
+def build_ui():
+    import gradio as gr
+    view = gr.Interface(
+        fn=stream_brochure_async if ASYNC_HANDLER else stream_brochure,
+        inputs=[
+            gr.Textbox(label="Company name:"),
+            gr.Textbox(label="Landing page URL including http:// or https://"),
+            gr.Textbox(label="Tone:")],
+        outputs=[gr.Markdown(label="Brochure:")],
+        flagging_mode="never"
+    )
+    view.queue(default_concurrency_limit=CONCURRENCY_LIMIT, max_size=QUEUE_SIZE)
+    return view
+
+def main():
+    #Prometheus metrics on TELEMETRY_PORT when it is set
+    start_metrics_server()
+    build_ui().launch()
 
-view = gr.Interface(
-    fn=stream_brochure,
-    inputs=[
-        gr.Textbox(label="Company name:"),
-        gr.Textbox(label="Landing page URL including http:// or https://"),
-        gr.Textbox(label="Tone:")],
-    outputs=[gr.Markdown(label="Brochure:")],
-    flagging_mode="never"
-)
-view.launch()
+if __name__ == "__main__":
+    main()
 
 
 
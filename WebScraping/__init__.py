@@ -0,0 +1 @@
+#Website summaries and company brochures; run a script directly or with python -m WebScraping.<module>
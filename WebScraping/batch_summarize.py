@@ -0,0 +1,199 @@
+import os, sys, json, time, asyncio, logging, argparse
+from functools import partial
+from types import SimpleNamespace
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Common.extract import extract
+from Common.fetcher import fetch_page, aclose
+from Common.providers import PROVIDERS
+from WebScraping.summarizer import summarize_website
+
+logger = logging.getLogger(__name__)
+
+#Bulk summarization: URLs from a file go through three stages, each with its own
+#worker pool - async fetching, parsing in worker processes, LLM calls on threads.
+#Every finished URL is appended to a JSONL file, so a rerun after a crash skips
+#everything already summarized.
+#
+#  python WebScraping/batch_summarize.py urls.txt summaries.jsonl --provider ollama
+
+
+#One URL per line, or JSONL lines with a "url" field; blanks and # comments are
+#skipped, and so is a JSONL line that does not parse or has no url (with a warning)
+def read_urls(path):
+    seen = set()
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("{"):
+                try:
+                    url = json.loads(line)["url"]
+                except (ValueError, KeyError, TypeError) as e:
+                    logger.warning("%s:%d: skipping line without a url: %r", path, number, e)
+                    continue
+            else:
+                url = line
+            if url not in seen:
+                seen.add(url)
+                yield url
+
+
+#URLs that already have an "ok" record; a torn last line from a crash is cut off
+def load_completed(path):
+    completed = set()
+    if not os.path.exists(path):
+        return completed
+    with open(path, "rb+") as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end != len(data):
+            f.truncate(end)
+    for line in data[:end].splitlines():
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if record.get("status") == "ok":
+            completed.add(record["url"])
+    return completed
+
+
+class JsonlWriter:
+    def __init__(self, path, fsync_every=50):
+        self.f = open(path, "a", encoding="utf-8")
+        self.fsync_every = fsync_every
+        self.pending = 0
+
+    def write(self, record):
+        self.f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.f.flush()
+        self.pending += 1
+        if self.pending >= self.fsync_every:
+            self.sync()
+
+    def sync(self):
+        os.fsync(self.f.fileno())
+        self.pending = 0
+
+    def close(self):
+        self.sync()
+        self.f.close()
+
+
+def error_record(item, stage, error):
+    return {"url": item["url"], "status": "error", "stage": stage,
+            "error": f"{type(error).__name__}: {error}", "elapsed": time.time() - item["started"]}
+
+
+async def run(args):
+    summarize = partial(summarize_website, provider=args.provider, model=args.model, token_aware=args.token_aware)
+    completed = load_completed(args.output)
+    writer = JsonlWriter(args.output)
+    loop = asyncio.get_running_loop()
+    parse_pool = ProcessPoolExecutor(max_workers=args.parse_workers)
+    llm_pool = ThreadPoolExecutor(max_workers=args.llm_workers)
+
+    #Bounded queues keep memory flat however long the URL list is
+    fetch_q = asyncio.Queue(maxsize=args.fetch_workers * 2)
+    parse_q = asyncio.Queue(maxsize=args.parse_workers * 2)
+    llm_q = asyncio.Queue(maxsize=args.llm_workers * 2)
+    out_q = asyncio.Queue()
+    counts = {"ok": 0, "error": 0, "skipped": 0}
+
+    async def produce():
+        for url in read_urls(args.input):
+            if url in completed:
+                counts["skipped"] += 1
+                continue
+            await fetch_q.put({"url": url, "started": time.time()})
+
+    async def fetch_worker():
+        while True:
+            item = await fetch_q.get()
+            try:
+                response = await fetch_page(item["url"])
+                response.raise_for_status()
+                item["body"] = response.content
+                item["charset"] = response.charset_encoding
+                await parse_q.put(item)
+            except Exception as e:
+                await out_q.put(error_record(item, "fetch", e))
+            finally:
+                fetch_q.task_done()
+
+    async def parse_worker():
+        while True:
+            item = await parse_q.get()
+            try:
+                page = await loop.run_in_executor(parse_pool, partial(extract, charset=item.pop("charset")), item.pop("body"))
+                item.update(title=page["title"], text=page["text"])
+                await llm_q.put(item)
+            except Exception as e:
+                await out_q.put(error_record(item, "parse", e))
+            finally:
+                parse_q.task_done()
+
+    async def llm_worker():
+        while True:
+            item = await llm_q.get()
+            try:
+                website = SimpleNamespace(url=item["url"], title=item["title"], text=item.pop("text"))
+                summary = await loop.run_in_executor(llm_pool, summarize, website)
+                await out_q.put({"url": item["url"], "status": "ok", "title": item["title"],
+                                 "summary": summary, "elapsed": time.time() - item["started"]})
+            except Exception as e:
+                await out_q.put(error_record(item, "llm", e))
+            finally:
+                llm_q.task_done()
+
+    async def write_results():
+        while True:
+            record = await out_q.get()
+            writer.write(record)
+            counts[record["status"]] += 1
+            done = counts["ok"] + counts["error"]
+            if done % args.progress_every == 0:
+                print(f"done {done} (ok {counts['ok']}, errors {counts['error']}, skipped {counts['skipped']})", file=sys.stderr)
+            out_q.task_done()
+
+    workers = [asyncio.create_task(fetch_worker()) for _ in range(args.fetch_workers)]
+    workers += [asyncio.create_task(parse_worker()) for _ in range(args.parse_workers)]
+    workers += [asyncio.create_task(llm_worker()) for _ in range(args.llm_workers)]
+    workers.append(asyncio.create_task(write_results()))
+    try:
+        await produce()
+        #Stages drain in order: nothing new reaches a queue once the one before it is empty
+        for queue in (fetch_q, parse_q, llm_q, out_q):
+            await queue.join()
+    finally:
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        writer.close()
+        parse_pool.shutdown()
+        llm_pool.shutdown()
+        await aclose()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize a list of URLs into a resumable JSONL file")
+    parser.add_argument("input", help="file with one URL per line (or JSONL with a url field)")
+    parser.add_argument("output", help="JSONL file results are appended to")
+    parser.add_argument("--provider", choices=list(PROVIDERS), default=None, help="defaults to SUMMARIZE_PROVIDER / LLM_PROVIDER")
+    parser.add_argument("--model", default=None)
+    parser.add_argument("--fetch-workers", type=int, default=32)
+    parser.add_argument("--parse-workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--llm-workers", type=int, default=8)
+    parser.add_argument("--token-aware", action="store_true", help="map-reduce pages over the model's token budget")
+    parser.add_argument("--progress-every", type=int, default=100)
+    args = parser.parse_args()
+    counts = asyncio.run(run(args))
+    print(f"finished: ok {counts['ok']}, errors {counts['error']}, skipped {counts['skipped']}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,33 +1,53 @@
-import os, requests, json
-from dotenv import load_dotenv
-from openai import OpenAI
-from bs4 import BeautifulSoup
+import os, sys, json, asyncio, argparse
+from concurrent.futures import ThreadPoolExecutor
 
-#Loading env variables and getting api key
-load_dotenv(override=True)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Common.chunking import fits, map_reduce
+from Common.crawler import Crawler
+from Common.extract import extract
+from Common.fetcher import aclose
+from Common.json_stream import JsonArrayStream
+from Common.links import LINK_CACHE_TTL, LINK_TOP_K, LinkFilter, clean_selection, get_link_cache, rank_links, url_key
+from Common.page_cache import get_page, aget_page
+from Common.providers import complete as provider_complete, get_provider, stream_complete
+from Common.telemetry import span, with_current_span
+
+#Env file is loaded by Common; getting api key
 api_key = os.getenv("OPENAI_API_KEY")
-MODEL = os.getenv("GPT_MODEL")
+#Any backend from Common/providers.py, e.g. BROCHURE_PROVIDER=ollama for cheap bulk runs
+PROVIDER = os.getenv("BROCHURE_PROVIDER") or os.getenv("LLM_PROVIDER", "openai")
+MODEL = os.getenv("BROCHURE_MODEL") or get_provider(PROVIDER).default_model
+#How many linked pages the concurrent crawl downloads at the same time
+MAX_CONCURRENT_FETCHES = int(os.getenv("BROCHURE_MAX_CONCURRENT_FETCHES", "8"))
+#How many ranked links the model gets to choose from (0 sends every raw link)
+LINK_CANDIDATES = int(os.getenv("BROCHURE_LINK_CANDIDATES", str(LINK_TOP_K)))
+#Stream the link answer and start downloading each picked page as soon as its entry is complete
+STREAM_LINKS = os.getenv("BROCHURE_STREAM_LINKS", "1") != "0"
+#Pages read per site in whole-site (crawl) mode
+CRAWL_PAGES = int(os.getenv("BROCHURE_CRAWL_PAGES", "20"))
 
-#Calling an instance of openai
-openai = OpenAI()
+#Identical model + messages (+ response_format) are answered from the completion cache
+def complete(messages, response_format=None, validate=None):
+    return provider_complete(messages, MODEL, PROVIDER, response_format, validate)
 
-#Scraping the website and getting all the info
+#Pages come from the on-disk page cache; a fresh or 304-revalidated entry is not parsed again
 class Website:
-    def __init__(self, url):
+    def __init__(self, url, page=None):
         self.url = url
-        response = requests.get(url)
-        self.body = response.content
-        soup = BeautifulSoup(self.body, 'html.parser')
-        self.title = soup.title.string if soup.title else "No title found"
-        if soup.body:
-            for irrelevant in soup.body(["script", "style", "img", "input"]):
-                irrelevant.decompose()
-            self.text = soup.body.get_text(separator="\n", strip=True)
-        else:
-            self.text = ""
-        
-        links = [link.get('href') for link in soup.find_all('a')]
-        self.links = [link for link in links if link]
+        if page is None:
+            page = get_page(url, extract)
+        self.title = page["title"]
+        self.text = page["text"]
+        self.links = page["links"]
+
+    #Async constructor: download without blocking the loop, parse on a worker thread
+    @classmethod
+    async def fetch(cls, url):
+        return cls(url, await aget_page(url, extract))
+
+    #Same-site page links resolved to absolute URLs, most promising first
+    def candidate_links(self, top_k=LINK_CANDIDATES):
+        return rank_links(self.url, self.links, top_k)
 
     def get_contents(self):
         return f"Webpage title:\n{self.title}\nWebpage Contents:\n{self.text}\n\n"
@@ -46,59 +66,205 @@ link_system_prompt += """
 }
 """
 
-def get_links_user_prompt(website):
+#Only the ranked, de-duplicated candidates go into the prompt instead of every raw href
+def get_links_user_prompt(website, candidates=None):
     user_prompt = f"Here are the list of links on the website of {website.url} - "
     user_prompt += "please decide which of these are relevant web links for a brochure about the company, respond with the full https URL in JSON format. \
     Do not include Terms of Service, Privacy, email links.\n"
-    user_prompt += "Links (some might be relative links):\n"
-    user_prompt += "\n".join(website.links)
+    if LINK_CANDIDATES:
+        user_prompt += "Links (most promising first):\n"
+        user_prompt += "\n".join(website.candidate_links() if candidates is None else candidates)
+    else:
+        user_prompt += "Links (some might be relative links):\n"
+        user_prompt += "\n".join(website.links)
     return user_prompt
 
-def get_links(url):
-    website = Website(url)
-    response = openai.chat.completions.create(
-        model=MODEL,
-        messages=[
+#Pass the already downloaded landing page as website to avoid fetching it twice.
+#The selection is cached per site (LINK_CACHE_TTL=0 turns that off).
+#With on_link the answer is streamed and on_link(link) is called for every usable
+#entry the moment it is complete; the return value is the same either way, since
+#the full answer is parsed and cleaned again once the stream has ended.
+def get_links(url, website=None, on_link=None):
+    with span("get_links", url=url, streamed=on_link is not None) as current:
+        if LINK_CACHE_TTL > 0:
+            cached = get_link_cache().get(url, MODEL)
+            current.set(cached=cached is not None)
+            if cached is not None:
+                for link in cached["links"] if on_link else ():
+                    on_link(link)
+                return cached
+        website = website or Website(url)
+        candidates = website.candidate_links() if LINK_CANDIDATES else None
+        current.set(raw_links=len(website.links), candidates=len(candidates) if candidates is not None else None)
+        if candidates == []:
+            return {"links": []}
+        messages = [
             {"role":"system", "content":link_system_prompt},
-            {"role":"user", "content":get_links_user_prompt(website)}
-        ],
-        response_format={"type":"json_object"}
-    )
-    result = response.choices[0].message.content
-    return json.loads(result)
+            {"role":"user", "content":get_links_user_prompt(website, candidates)}
+        ]
+        if on_link is None:
+            result = complete(messages, response_format={"type":"json_object"}, validate=json.loads)
+        else:
+            result = stream_links(messages, website.url, on_link)
+        links = {"links": clean_selection(website.url, json.loads(result).get("links", []))}
+        if LINK_CACHE_TTL > 0:
+            get_link_cache().put(url, MODEL, links)
+        return links
+
+def stream_links(messages, base_url, on_link):
+    parser = JsonArrayStream("links")
+    link_filter = LinkFilter(base_url)
+    parts = []
+    for text in stream_complete(messages, MODEL, PROVIDER, response_format={"type":"json_object"}, validate=json.loads):
+        parts.append(text)
+        for item in parser.feed(text):
+            link = link_filter.accept(item)
+            if link is not None:
+                on_link(link)
+    return "".join(parts)
 
 # links = get_links("https://huggingface.co")
 
-#Creating the brochure for the website
-def get_all_details(url):
+#Assembling the pages in the order the links were returned so the prompt is reproducible
+def format_details(landing, links, pages):
     result = "Landing page:\n"
-    result += Website(url).get_contents()
-    links = get_links(url)
-    for link in links["links"]:
+    result += landing.get_contents()
+    for link, page in zip(links["links"], pages):
         result += f"\n\n{link['type']}\n"
-        result += Website(link["url"]).get_contents()
-        return result
-    
+        result += page.get_contents()
+    return result
+
+#Creating the brochure for the website
+#concurrent=True fetches the linked pages in parallel on the shared pooled client
+def get_all_details(url, concurrent=True, max_concurrency=MAX_CONCURRENT_FETCHES, pipelined=STREAM_LINKS):
+    landing = Website(url)
+    if concurrent and pipelined:
+        return get_all_details_pipelined(url, landing, max_concurrency)
+    links = get_links(url, landing)
+    urls = [link["url"] for link in links["links"]]
+    with span("fetch_links", pages=len(urls)):
+        if concurrent and len(urls) > 1:
+            with ThreadPoolExecutor(max_workers=min(max_concurrency, len(urls))) as executor:
+                pages = list(executor.map(with_current_span(Website), urls))
+        else:
+            pages = [Website(link_url) for link_url in urls]
+    return format_details(landing, links, pages)
+
+#Page downloads overlap with the link answer: each page is submitted while the model
+#is still writing the rest of the JSON. Pages of entries the final answer does not
+#keep are dropped, missing ones are fetched now, so the result matches get_all_details.
+def get_all_details_pipelined(url, landing, max_concurrency=MAX_CONCURRENT_FETCHES):
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        started = {}
+
+        def start(link):
+            if link["url"] not in started:
+                started[link["url"]] = executor.submit(with_current_span(Website), link["url"])
+
+        links = get_links(url, landing, on_link=start)
+        with span("fetch_links", pages=len(links["links"]), started_early=len(started)):
+            for link in links["links"]:
+                start(link)
+            pages = [started[link["url"]].result() for link in links["links"]]
+    return format_details(landing, links, pages)
+
+#Same crawl for callers already inside an event loop
+async def get_all_details_async(url, max_concurrency=MAX_CONCURRENT_FETCHES):
+    landing = await Website.fetch(url)
+    links = await asyncio.to_thread(get_links, url, landing)
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def fetch_link(link):
+        async with semaphore:
+            return await Website.fetch(link["url"])
+
+    with span("fetch_links", pages=len(links["links"])):
+        pages = await asyncio.gather(*(fetch_link(link) for link in links["links"]))
+    return format_details(landing, links, pages)
+
+#Whole-site mode: the pages get_links picks seed a polite crawl (Common/crawler.py)
+#that also follows the sitemap and the links of every page, up to max_pages pages.
+#Picked pages come first with their type, the rest follow by depth, so the text is
+#in the same order on every run however the downloads finished.
+async def get_site_details_async(url, max_pages=CRAWL_PAGES, crawler=None):
+    crawler = crawler or Crawler(max_pages=max_pages)
+    landing = await Website.fetch(url)
+    links = await asyncio.to_thread(get_links, url, landing)
+    picked = {url_key(link["url"]): (rank, link["type"]) for rank, link in enumerate(links["links"])}
+    start_page = {"url": url, "title": landing.title, "text": landing.text, "links": landing.links}
+    with span("crawl", seeds=len(picked)) as current:
+        pages = await crawler.crawl_site(url, [link["url"] for link in links["links"]], start_page, max_pages)
+        current.set(pages=len(pages))
+    pages = sorted(pages[1:], key=lambda page: (url_key(page["url"]) not in picked,
+                                                picked.get(url_key(page["url"]), (0,))[0], page["depth"], page["url"]))
+    result = "Landing page:\n"
+    result += landing.get_contents()
+    for page in pages:
+        kind = picked.get(url_key(page["url"]), (0, f"page {page['url']}"))[1]
+        result += f"\n\n{kind}\n"
+        result += Website(page["url"], page).get_contents()
+    return result
+
+def get_site_details(url, max_pages=CRAWL_PAGES, crawler=None):
+    async def run():
+        try:
+            return await get_site_details_async(url, max_pages, crawler)
+        finally:
+            await aclose()
+
+    return asyncio.run(run())
+
+
 system_prompt = "You are an assistant that analyzes the contents of several relevant pages from a company website \
 and creates a short brochure about the company for prospective customers, investors and recruits.\
 Include details of company culture, customers and careers/jobs if you have the information."
 
-def get_brochure_user_prompt(company_name, url):
+notes_system_prompt = "You are an assistant that condenses part of the text of a company website into concise notes \
+for writing a brochure. Keep facts about the company, its products, customers, culture and careers/jobs; drop navigation text."
+
+#Map step of the token-aware mode: each chunk of the crawled pages becomes brochure notes
+def condense_details(company_name, details, chunk_tokens=None, parallelism=None):
+    def notes_for(chunk, index, total):
+        return complete([
+            {"role":"system", "content":notes_system_prompt},
+            {"role":"user", "content":f"Company: {company_name}\nPart {index + 1} of {total} of its website pages:\n{chunk}"}
+        ])
+
+    return map_reduce(details, MODEL, notes_for, "\n\n".join, chunk_tokens, parallelism)
+
+#token_aware=True replaces the 5,000 character cut with budget-sized chunks condensed in
+#parallel; the brochure call itself is the reduce step. crawl=True reads the whole
+#site instead of the picked pages and is always token aware.
+def get_brochure_user_prompt(company_name, url, concurrent=True, token_aware=False, chunk_tokens=None, parallelism=None, crawl=False):
     user_prompt = f"You are looking at a company called: {company_name}\n"
     user_prompt += f"Here are the contents of its landing page and other relevant pages; use this information to build a short brochure of the company.\n"
-    user_prompt += get_all_details(url)
-    user_prompt = user_prompt[:5_000] # Truncate if more than 5,000 characters
-    return user_prompt
+    details = get_site_details(url) if crawl else get_all_details(url, concurrent)
+    if not token_aware and not crawl:
+        user_prompt += details
+        user_prompt = user_prompt[:5_000] # Truncate if more than 5,000 characters
+        return user_prompt
+    if not fits(details, MODEL, chunk_tokens):
+        with span("condense"):
+            details = condense_details(company_name, details, chunk_tokens, parallelism)
+    return user_prompt + details
 
-def create_brochure(company_name, url):
-    response = openai.chat.completions.create(
-        model=MODEL,
-        messages=[
+def create_brochure(company_name, url, concurrent=True, token_aware=False, chunk_tokens=None, parallelism=None, crawl=False):
+    with span("create_brochure", url=url, company=company_name):
+        user_prompt = get_brochure_user_prompt(company_name, url, concurrent, token_aware, chunk_tokens, parallelism, crawl)
+        return complete([
             {"role":"system", "content":system_prompt},
-            {"role":"user", "content":get_brochure_user_prompt(company_name, url)}
-        ]
-    )
-    return response.choices[0].message.content
+            {"role":"user", "content":user_prompt}
+        ])
     
-brochure = create_brochure("hugging_face", "https://huggingface.co")
-print(brochure)
+def main():
+    parser = argparse.ArgumentParser(description="Write a company brochure from its website")
+    parser.add_argument("company", nargs="?", default="hugging_face")
+    parser.add_argument("url", nargs="?", default="https://huggingface.co")
+    parser.add_argument("--sequential", action="store_true", help="fetch the linked pages one at a time")
+    parser.add_argument("--token-aware", action="store_true")
+    parser.add_argument("--crawl", action="store_true", help="read the whole site politely, not just the picked pages")
+    args = parser.parse_args()
+    print(create_brochure(args.company, args.url, not args.sequential, args.token_aware, crawl=args.crawl))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import os, sys, time, asyncio, argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Common.crawler import Crawler, HOST_CONCURRENCY, HOST_DELAY, MAX_DEPTH, MAX_PAGES, SITE_CONCURRENCY
+from Common.fetcher import aclose
+from WebScraping.batch_summarize import JsonlWriter, load_completed, read_urls
+
+#Whole-site ingestion for a portfolio of companies: every site is crawled politely
+#(per-host limits, robots.txt, sitemap) and written as one JSONL record with all of
+#its pages the moment it finishes. Many sites run at once; a rerun skips the ones
+#already written.
+#
+#  python WebScraping/site_ingest.py portfolio.txt sites.jsonl --max-pages 30
+
+
+async def ingest_site(crawler, url, pick_links):
+    seeds = ()
+    if pick_links:
+        from WebScraping.openai_website_brochure import get_links
+        seeds = [link["url"] for link in (await asyncio.to_thread(get_links, url))["links"]]
+    return await crawler.crawl_site(url, seeds)
+
+
+async def run(args):
+    crawler = Crawler(max_pages=args.max_pages, max_depth=args.max_depth, host_concurrency=args.host_concurrency,
+                      host_delay=args.host_delay, use_sitemap=not args.no_sitemap)
+    completed = load_completed(args.output)
+    writer = JsonlWriter(args.output, fsync_every=10)
+    semaphore = asyncio.Semaphore(args.sites)
+    counts = {"ok": 0, "error": 0, "skipped": 0, "pages": 0}
+
+    async def one(url):
+        async with semaphore:
+            started = time.time()
+            try:
+                pages = await ingest_site(crawler, url, args.pick_links)
+            except Exception as e:
+                record = {"url": url, "status": "error", "error": f"{type(e).__name__}: {e}", "elapsed": time.time() - started}
+            else:
+                record = {"url": url, "status": "ok", "elapsed": time.time() - started,
+                          "pages": [{"url": p["url"], "depth": p["depth"], "title": p["title"], "text": p["text"]} for p in pages]}
+                counts["pages"] += len(pages)
+            writer.write(record)
+            counts[record["status"]] += 1
+            done = counts["ok"] + counts["error"]
+            if done % args.progress_every == 0:
+                print(f"sites {done} (ok {counts['ok']}, errors {counts['error']}, pages {counts['pages']})", file=sys.stderr)
+
+    urls = []
+    for url in read_urls(args.input):
+        if url in completed:
+            counts["skipped"] += 1
+        else:
+            urls.append(url)
+    try:
+        await asyncio.gather(*(one(url) for url in urls))
+    finally:
+        writer.close()
+        await aclose()
+    counts.update(disallowed=crawler.stats["disallowed"], retries=crawler.stats["retries"])
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crawl whole company sites into a resumable JSONL file")
+    parser.add_argument("input", help="file with one site URL per line (or JSONL with a url field)")
+    parser.add_argument("output", help="JSONL file site records are appended to")
+    parser.add_argument("--max-pages", type=int, default=MAX_PAGES, help="pages per site")
+    parser.add_argument("--max-depth", type=int, default=MAX_DEPTH, help="links away from the start page")
+    parser.add_argument("--host-concurrency", type=int, default=HOST_CONCURRENCY, help="requests in flight per host")
+    parser.add_argument("--host-delay", type=float, default=HOST_DELAY, help="seconds between requests to one host")
+    parser.add_argument("--sites", type=int, default=SITE_CONCURRENCY, help="sites crawled at the same time")
+    parser.add_argument("--no-sitemap", action="store_true", help="only follow links")
+    parser.add_argument("--pick-links", action="store_true", help="seed each crawl with the pages the model picks (one call per site)")
+    parser.add_argument("--progress-every", type=int, default=10)
+    args = parser.parse_args()
+    counts = asyncio.run(run(args))
+    print(f"finished: ok {counts['ok']}, errors {counts['error']}, skipped {counts['skipped']}, pages {counts['pages']}, "
+          f"disallowed {counts['disallowed']}, retries {counts['retries']}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import os, sys, argparse
+from types import SimpleNamespace
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Common.chunking import fits, map_reduce
+from Common.extract import extract
+from Common.page_cache import get_page
+from Common.providers import complete, get_provider
+from Common.telemetry import span
+
+#Website summarization on any model backend. openai_summarize.py and
+#ollama_summarize.py are thin wrappers that pick the backend; SUMMARIZE_PROVIDER /
+#SUMMARIZE_MODEL in the env file choose the default here.
+PROVIDER = os.getenv("SUMMARIZE_PROVIDER") or os.getenv("LLM_PROVIDER", "openai")
+MODEL = os.getenv("SUMMARIZE_MODEL")
+
+#Pages come from the on-disk page cache when they are still fresh
+class Website:
+    def __init__(self, url):
+        self.url = url
+        page = get_page(url, extract)
+        self.title = page["title"]
+        self.text = page["text"]
+
+#Declaring the prompts for the messages
+system_prompt = "You are an assistant that analyzes the contents of a website \
+and provides a short summary, ignoring text that might be navigation related. \
+Respond in markdown."
+
+def user_prompt_for(website):
+    user_prompt = f"You are looking at a website titled {website.title}"
+    user_prompt += "\nThe contents of this website is as follows; \
+please provide a short summary of this website in markdown. \
+If it includes news or announcements, then summarize these too.\n\n"
+    user_prompt += website.text
+    return user_prompt
+
+#Adding the messages together according to the roles
+def messages_for(website):
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt_for(website)}
+    ]
+
+#Prompt for combining the partial summaries of an oversized page
+def reduce_messages_for(website, summaries):
+    user_prompt = f"You are looking at a website titled {website.title}"
+    user_prompt += "\nThe website was too long to read at once, so here are summaries of its parts in order; \
+combine them into one short summary of the whole website in markdown.\n\n"
+    user_prompt += "\n\n".join(summaries)
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
+
+#token_aware=True splits text over the model's token budget into chunks, summarizes
+#them in parallel and combines the results instead of sending the whole page
+def summarize(url, provider=None, model=None, token_aware=False, chunk_tokens=None, parallelism=None):
+    with span("summarize", url=url):
+        return summarize_website(Website(url), provider, model, token_aware, chunk_tokens, parallelism)
+
+#Anything with title and text works here, e.g. a page parsed by the batch runner
+def summarize_website(website, provider=None, model=None, token_aware=False, chunk_tokens=None, parallelism=None):
+    provider = get_provider(provider or PROVIDER)
+    model = model or MODEL or provider.default_model
+    if not token_aware or fits(website.text, model, chunk_tokens):
+        with span("prompt"):
+            messages = messages_for(website)
+        return complete(messages, model, provider)
+
+    def summarize_chunk(chunk, index, total):
+        part = SimpleNamespace(title=f"{website.title} (part {index + 1} of {total})", text=chunk)
+        return complete(messages_for(part), model, provider)
+
+    return map_reduce(
+        website.text, model, summarize_chunk,
+        lambda summaries: complete(reduce_messages_for(website, summaries), model, provider),
+        chunk_tokens, parallelism,
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize a website")
+    parser.add_argument("url")
+    parser.add_argument("--provider", default=None, help="openai, anthropic or ollama")
+    parser.add_argument("--model", default=None)
+    parser.add_argument("--token-aware", action="store_true")
+    args = parser.parse_args()
+    print(summarize(args.url, args.provider, args.model, args.token_aware))
+
+if __name__ == "__main__":
+    main()